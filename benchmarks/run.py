@@ -0,0 +1,332 @@
+import sys
+import json
+import time
+import socket
+import logging
+import argparse
+import itertools
+import platform
+import tempfile
+import threading
+import socketserver
+
+from pathlib import Path
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from importlib.metadata import PackageNotFoundError, version
+from typing import Any, Callable, Dict, List, Optional
+
+import bitvoker.ai as ai_module
+import bitvoker.database as db_module
+
+from apprise.decorators import notify
+from bitvoker.config import ConfigSnapshot
+from bitvoker.handler import Handler
+from bitvoker.matcher import Match
+from bitvoker.pipeline import pipeline
+
+
+BENCHMARKS: Dict[str, Callable[[int], Dict]] = {}
+
+FAKE_AI_LATENCY_SECONDS = 0.0
+HANDLER_CLIENTS = 8
+
+
+@notify(on="bench")
+def _fake_destination(body, title, notify_type, *args, **kwargs):
+    # an in-process apprise plugin, so delivery costs what apprise itself costs and nothing goes over the network
+    return True
+
+
+class FakeAIProvider:
+    def process_message(self, prompt, max_retries=3):
+        if FAKE_AI_LATENCY_SECONDS:
+            time.sleep(FAKE_AI_LATENCY_SECONDS)
+        return f"summary: {prompt[-80:]}"
+
+
+def benchmark(name: str):
+    def register(function):
+        BENCHMARKS[name] = function
+        return function
+
+    return register
+
+
+def _percentile(sorted_samples: List[float], percent: float) -> float:
+    if not sorted_samples:
+        return 0.0
+    index = min(len(sorted_samples) - 1, int(round(percent / 100 * (len(sorted_samples) - 1))))
+    return sorted_samples[index]
+
+
+def _result(name: str, samples: List[float], total_seconds: float, operations: Optional[int] = None) -> Dict:
+    operations = operations if operations is not None else len(samples)
+    samples = sorted(samples)
+    return {
+        "name": name,
+        "operations": operations,
+        "total_seconds": round(total_seconds, 6),
+        "ops_per_second": round(operations / total_seconds, 2) if total_seconds else 0.0,
+        "mean_us": round(sum(samples) / len(samples) * 1e6, 2) if samples else 0.0,
+        "p50_us": round(_percentile(samples, 50) * 1e6, 2),
+        "p95_us": round(_percentile(samples, 95) * 1e6, 2),
+        "p99_us": round(_percentile(samples, 99) * 1e6, 2),
+    }
+
+
+def _measure(name: str, operation: Callable[[], object], iterations: int, warmup: int = 10) -> Dict:
+    for _ in range(warmup):
+        operation()
+    samples = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        op_started = time.perf_counter()
+        operation()
+        samples.append(time.perf_counter() - op_started)
+    return _result(name, samples, time.perf_counter() - started)
+
+
+def _rule(index: int, sources: Optional[List[str]] = None, send_ai: bool = False) -> Dict:
+    return {
+        "name": f"rule-{index}",
+        "enabled": True,
+        "preprompt": "summarize",
+        "match": {
+            "sources": sources or [],
+            "og_text_regex": rf"\bservice-{index}\b.*(failed|error)",
+            "ai_text_regex": None,
+        },
+        "notify": {
+            "destinations": [],
+            "send_og_text": {"enabled": True, "og_text_regex": None, "ai_text_regex": None},
+            "send_ai_text": {"enabled": send_ai, "og_text_regex": None, "ai_text_regex": None},
+        },
+    }
+
+
+def _config(rules: List[Dict]) -> ConfigSnapshot:
+    return ConfigSnapshot(
+        {
+            "ai": {"provider": "meta_ai"},
+            "message_token": "",
+            "rules": rules,
+            "destinations": [{"name": "bench", "url": "bench://localhost", "enabled": True}],
+        }
+    )
+
+
+def _notification(index: int) -> Dict:
+    return {
+        "timestamp": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "original": f"service-{index % 50} failed: connection refused after {index} retries " * 3,
+        "ai": "summary: connection refused",
+        "client": f"10.0.{index % 4}.{index % 250}",
+        "matched_rule_name": f"rule-{index % 10}",
+        "destinations": ["bench"],
+        "delivery": {"bench": {"success": True, "latency_ms": 1.5}},
+        "status": "sent",
+        "ai_latency_ms": 10.0,
+        "delivery_latency_ms": 1.5,
+    }
+
+
+def _use_temporary_storage(directory: str, name: str) -> None:
+    db_module._storage = db_module.SQLiteStorage(str(Path(directory) / f"{name}.db"))
+    db_module.init_db()
+
+
+def _match_benchmark(rule_count: int, iterations: int) -> Dict:
+    match = Match(_config([_rule(i) for i in range(rule_count)]))
+    # the last rule is the one that matches, so every rule is evaluated
+    message = f"service-{rule_count - 1} failed: connection refused"
+    return _measure(f"match_rules_{rule_count}", lambda: match.process("10.0.0.1", message), iterations)
+
+
+@benchmark("match_rules_10")
+def match_rules_10(iterations: int) -> Dict:
+    return _match_benchmark(10, iterations * 10)
+
+
+@benchmark("match_rules_100")
+def match_rules_100(iterations: int) -> Dict:
+    return _match_benchmark(100, iterations)
+
+
+@benchmark("match_rules_1000")
+def match_rules_1000(iterations: int) -> Dict:
+    return _match_benchmark(1000, max(1, iterations // 2))
+
+
+@benchmark("match_sources_hostnames")
+def match_sources_hostnames(iterations: int) -> Dict:
+    # rules restricted to a hostname have to resolve it for every message from a client that is not listed by ip
+    match = Match(_config([_rule(i, sources=["localhost"]) for i in range(10)]))
+    message = "service-9 failed: connection refused"
+    return _measure("match_sources_hostnames", lambda: match.process("10.0.0.1", message), iterations)
+
+
+@benchmark("sqlite_insert")
+def sqlite_insert(iterations: int) -> Dict:
+    with tempfile.TemporaryDirectory() as directory:
+        _use_temporary_storage(directory, "insert")
+        notifications = [_notification(i) for i in range(iterations)]
+        rows = iter(notifications)
+        return _measure("sqlite_insert", lambda: db_module.insert_notification(**next(rows)), iterations, warmup=0)
+
+
+@benchmark("sqlite_insert_batch")
+def sqlite_insert_batch(iterations: int) -> Dict:
+    batch_size = 100
+    with tempfile.TemporaryDirectory() as directory:
+        _use_temporary_storage(directory, "insert_batch")
+        batch = [_notification(i) for i in range(batch_size)]
+        result = _measure(
+            "sqlite_insert_batch", lambda: db_module.insert_notifications(batch), max(1, iterations // 10), warmup=0
+        )
+    # throughput is reported in rows, latency per batch
+    result["operations"] *= batch_size
+    result["ops_per_second"] = round(result["operations"] / result["total_seconds"], 2)
+    return result
+
+
+@benchmark("sqlite_query")
+def sqlite_query(iterations: int) -> Dict:
+    with tempfile.TemporaryDirectory() as directory:
+        _use_temporary_storage(directory, "query")
+        db_module.insert_notifications([_notification(i) for i in range(10000)])
+        queries: List[Dict[str, Any]] = [
+            {"limit": 100},
+            {"limit": 100, "preview": True},
+            {"limit": 100, "rule": "rule-3"},
+            {"limit": 100, "client": "10.0.1.1", "status": "sent"},
+        ]
+        rotation = itertools.cycle(queries)
+        return _measure("sqlite_query", lambda: db_module.get_notifications(**next(rotation)), iterations)
+
+
+def _send(port: int, message: bytes) -> float:
+    started = time.perf_counter()
+    with socket.create_connection(("127.0.0.1", port)) as client:
+        client.sendall(message)
+        client.shutdown(socket.SHUT_WR)
+        # the handler closes the connection once the message is stored
+        while client.recv(4096):
+            pass
+    return time.perf_counter() - started
+
+
+@benchmark("handler_end_to_end")
+def handler_end_to_end(iterations: int) -> Dict:
+    with tempfile.TemporaryDirectory() as directory:
+        _use_temporary_storage(directory, "handler")
+        pipeline.refresh(_config([_rule(i, send_ai=True) for i in range(10)]))
+        socketserver.ThreadingTCPServer.daemon_threads = True
+        server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), Handler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        port = server.server_address[1]
+        messages = [f"service-{i % 10} failed: connection refused on attempt {i}".encode() for i in range(iterations)]
+        try:
+            with ThreadPoolExecutor(max_workers=HANDLER_CLIENTS) as executor:
+                started = time.perf_counter()
+                samples = list(executor.map(lambda message: _send(port, message), messages))
+                total_seconds = time.perf_counter() - started
+        finally:
+            server.shutdown()
+            server.server_close()
+        stored = len(db_module.get_notifications(limit=iterations))
+        if stored != iterations:
+            raise RuntimeError(f"handler benchmark stored {stored} of {iterations} messages")
+        return _result("handler_end_to_end", samples, total_seconds)
+
+
+def run(names: List[str], iterations: int) -> Dict:
+    get_cached_provider, storage, context = ai_module.get_cached_provider, db_module._storage, pipeline._context
+    ai_module.get_cached_provider = lambda ai_config: FakeAIProvider()
+    results = []
+    try:
+        for name in names:
+            print(f"running {name} ...", file=sys.stderr)
+            results.append(BENCHMARKS[name](iterations))
+    finally:
+        ai_module.get_cached_provider, db_module._storage, pipeline._context = get_cached_provider, storage, context
+    try:
+        bitvoker_version = version("bitvoker")
+    except PackageNotFoundError:
+        bitvoker_version = "unknown"
+    return {
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "bitvoker_version": bitvoker_version,
+        "python_version": platform.python_version(),
+        "platform": platform.platform(),
+        "iterations": iterations,
+        "fake_ai_latency_seconds": FAKE_AI_LATENCY_SECONDS,
+        "results": results,
+    }
+
+
+def compare(report: Dict, baseline: Dict, max_regression: Optional[float] = None) -> bool:
+    previous = {result["name"]: result for result in baseline.get("results", [])}
+    ok = True
+    for result in report["results"]:
+        before = previous.get(result["name"])
+        if before is None or not before["ops_per_second"]:
+            print(f"{result['name']:<26} {result['ops_per_second']:>12.2f} ops/s  (no baseline)", file=sys.stderr)
+            continue
+        change = (result["ops_per_second"] - before["ops_per_second"]) / before["ops_per_second"] * 100
+        regressed = max_regression is not None and change < -max_regression
+        ok = ok and not regressed
+        print(
+            f"{result['name']:<26} {result['ops_per_second']:>12.2f} ops/s  {change:+7.1f}%"
+            f"{'  REGRESSION' if regressed else ''}",
+            file=sys.stderr,
+        )
+    return ok
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    global FAKE_AI_LATENCY_SECONDS
+    parser = argparse.ArgumentParser(description="benchmark the bitvoker match, ai, notify and persist pipeline")
+    parser.add_argument("-n", "--iterations", type=int, default=1000, help="base number of operations per benchmark")
+    parser.add_argument("-k", "--filter", default="", help="only run benchmarks whose name contains this string")
+    parser.add_argument("-o", "--output", help="write the json report to this file instead of stdout")
+    parser.add_argument("--compare", help="json report of a previous run to compare against")
+    parser.add_argument(
+        "--max-regression", type=float, help="exit with an error if a benchmark is this many percent slower"
+    )
+    parser.add_argument("--ai-latency", type=float, default=0.0, help="seconds the fake ai provider sleeps per call")
+    parser.add_argument("--list", action="store_true", help="list benchmarks and exit")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        print("\n".join(BENCHMARKS))
+        return 0
+
+    names = [name for name in BENCHMARKS if args.filter in name]
+    if not names:
+        parser.error(f"no benchmark matches '{args.filter}'")
+
+    # logging every message would measure the log handler rather than the pipeline
+    logging.disable(logging.WARNING)
+    FAKE_AI_LATENCY_SECONDS = args.ai_latency
+    try:
+        report = run(names, args.iterations)
+    finally:
+        logging.disable(logging.NOTSET)
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n", encoding="utf-8")
+    else:
+        print(output)
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        if not compare(report, baseline, args.max_regression):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
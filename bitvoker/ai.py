@@ -1,4 +1,6 @@
+import copy
 import requests
+import threading
 
 from meta_ai_api import MetaAI
 
@@ -9,6 +11,9 @@ from bitvoker.constants import MAX_META_PROMPT_LENGTH
 
 logger = setup_logger(__name__)
 
+_provider_cache = {"ai_config": None, "provider": None}
+_provider_lock = threading.Lock()
+
 
 class MetaAIProvider:
     def __init__(self):
@@ -98,14 +103,9 @@ def process_with_ai(message, preprompt, ai_config, max_retries=3):
         return None
 
     try:
-        provider = get_provider(ai_config)
+        provider = get_cached_provider(ai_config)
         prompt = f"{preprompt}: {message}"
-        result = provider.process_message(prompt, max_retries)
-
-        if isinstance(provider, OllamaProvider) and hasattr(provider, "session"):
-            provider.session.close()
-
-        return result
+        return provider.process_message(prompt, max_retries)
     except Exception as e:
         logger.error(f"error processing message with ai: {e}")
         raise
@@ -122,3 +122,15 @@ def get_provider(ai_config):
     else:
         logger.info("using meta-ai as ai provider")
         return MetaAIProvider()
+
+
+def get_cached_provider(ai_config):
+    # providers hold sessions and run health checks on creation, so one is kept until the ai section changes
+    with _provider_lock:
+        if _provider_cache["provider"] is not None and _provider_cache["ai_config"] == ai_config:
+            return _provider_cache["provider"]
+        # the replaced provider is left to the garbage collector, messages still in flight may be using it
+        provider = get_provider(ai_config)
+        _provider_cache["ai_config"] = copy.deepcopy(ai_config)
+        _provider_cache["provider"] = provider
+        return provider
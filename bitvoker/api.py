@@ -2,10 +2,13 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from bitvoker.router import api_router
+from bitvoker.ratelimit import RateLimitMiddleware
 
 
 app = FastAPI()
 
+# added first so cors wraps it, a browser can then read the 429 it gets back
+app.add_middleware(RateLimitMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
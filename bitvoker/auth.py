@@ -4,14 +4,20 @@ import hmac
 import hashlib
 import secrets
 
+from typing import Dict
+
 from bitvoker.logger import setup_logger
 
 
 logger = setup_logger(__name__)
 
 TOKEN_EXPIRY = 86400
+TOKEN_CACHE_SIZE = 1024
 _secret_key = secrets.token_hex(32)
 
+# token -> issue time of tokens whose signature already checked out, so polling clients skip the hmac
+_verified_tokens: Dict[str, int] = {}
+
 
 def get_credentials():
     username = os.environ.get("BITVOKER_USERNAME", "")
@@ -41,6 +47,12 @@ def create_token(username):
 def verify_token(token):
     if not token:
         return False
+    token_time = _verified_tokens.get(token)
+    if token_time is not None:
+        if time.time() - token_time <= TOKEN_EXPIRY:
+            return True
+        _verified_tokens.pop(token, None)
+        return False
     parts = token.split(":")
     if len(parts) != 3:
         return False
@@ -52,4 +64,9 @@ def verify_token(token):
     if time.time() - token_time > TOKEN_EXPIRY:
         return False
     expected = hmac.new(_secret_key.encode(), f"{username}:{timestamp}".encode(), hashlib.sha256).hexdigest()
-    return hmac.compare_digest(signature, expected)
+    if not hmac.compare_digest(signature, expected):
+        return False
+    if len(_verified_tokens) >= TOKEN_CACHE_SIZE:
+        _verified_tokens.clear()
+    _verified_tokens[token] = token_time
+    return True
@@ -0,0 +1,127 @@
+import time
+import socket
+
+from typing import Any, Dict, List, Optional
+
+from bitvoker.config import ConfigSnapshot
+from bitvoker.constants import NOTIFICATION_PREVIEW_LENGTH
+from bitvoker.database import iter_notification_batches
+from bitvoker.logger import setup_logger
+from bitvoker.matcher import Match
+
+
+logger = setup_logger(__name__)
+
+BACKTEST_BATCH_SIZE = 1000
+BACKTEST_MAX_SAMPLES = 50
+
+
+class BacktestMatch(Match):
+    # replays history against candidate rules, so nothing here may reach the live metrics or re-resolve a
+    # hostname for every stored row
+    def __init__(self, config: ConfigSnapshot):
+        self._resolved: Dict[str, Optional[List[str]]] = {}
+        super().__init__(config)
+
+    def _resolve_host(self, host: str) -> List[str]:
+        if host not in self._resolved:
+            try:
+                self._resolved[host] = super()._resolve_host(host)
+            except (socket.gaierror, socket.herror):
+                self._resolved[host] = None
+        ips = self._resolved[host]
+        if ips is None:
+            raise socket.gaierror(f"could not resolve {host}")
+        return ips
+
+    def _count_timeout(self, pattern: str) -> None:
+        pass
+
+    def _disable_pattern(self, pattern: str, timeouts: int, searches: int) -> None:
+        for compiled_rule in self._pattern_rules.get(pattern, []):
+            if not compiled_rule.disabled:
+                compiled_rule.disabled = (
+                    f"regex '{pattern}' took longer than {self._regex_timeout_ms} ms in {timeouts} of {searches}"
+                    " searches"
+                )
+
+
+def _sample(row: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": row["id"],
+        "timestamp": row["timestamp"],
+        "client": row["client"],
+        "original": row["original"][:NOTIFICATION_PREVIEW_LENGTH],
+        "previous_rule": row["matched_rule_name"],
+    }
+
+
+def run_backtest(
+    config_data: Dict[str, Any],
+    start_date: str = "",
+    end_date: str = "",
+    after_id: int = 0,
+    max_rows: int = 0,
+    samples: int = 5,
+    timeout_seconds: float = 30,
+    batch_size: int = BACKTEST_BATCH_SIZE,
+) -> Dict[str, Any]:
+    started = time.perf_counter()
+    match = BacktestMatch(ConfigSnapshot(config_data))
+    samples = min(samples, BACKTEST_MAX_SAMPLES)
+    selected: Dict[str, int] = {r.name: 0 for r in match.compiled_rules}
+    hits: Dict[str, List[Dict[str, Any]]] = {r.name: [] for r in match.compiled_rules}
+    scanned = unmatched = changed = 0
+    last_id = None
+    complete = True
+
+    # a run cut short by max_rows or the timeout reports last_id, passing it back as after_id picks up from there
+    for batch in iter_notification_batches(start_date, end_date, batch_size, after_id):
+        for row in batch:
+            if (max_rows and scanned >= max_rows) or time.perf_counter() - started >= timeout_seconds:
+                complete = False
+                break
+            scanned += 1
+            last_id = row["id"]
+            # only what decides the rule, ai_text_regex conditions need a model call and are not replayed, and
+            # structured fields are not stored, so rules on fields never match here
+            rule = match._find_matching_rule(row["client"], row["original"])
+            name = rule.get("name", "unnamed_rule") if rule is not None else ""
+            if name != row["matched_rule_name"]:
+                changed += 1
+            if rule is None:
+                unmatched += 1
+                continue
+            selected[name] += 1
+            if len(hits[name]) < samples:
+                hits[name].append(_sample(row))
+        if not complete:
+            break
+
+    rules = []
+    for compiled_rule in match.compiled_rules:
+        stats = compiled_rule.stats.to_dict()
+        match_config = compiled_rule.rule.get("match", {})
+        rules.append(
+            {
+                "name": compiled_rule.name,
+                "error": compiled_rule.error or compiled_rule.disabled,
+                "selected": selected[compiled_rule.name],
+                "matches": stats["matches"],
+                "regex_ms_total": stats["regex_ms_total"],
+                "ai_text_regex_skipped": bool(match_config.get("ai_text_regex")),
+                "fields_not_replayed": bool(match_config.get("fields")),
+                "samples": hits[compiled_rule.name],
+            }
+        )
+    duration_ms = round((time.perf_counter() - started) * 1000, 1)
+    logger.info(f"backtest evaluated {len(rules)} rules over {scanned} stored messages in {duration_ms} ms")
+    return {
+        "scanned": scanned,
+        "unmatched": unmatched,
+        "changed": changed,
+        "complete": complete,
+        "last_id": last_id,
+        "duration_ms": duration_ms,
+        "rules": rules,
+    }
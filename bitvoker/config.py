@@ -1,30 +1,212 @@
 import os
+import copy
 import yaml
+import itertools
+import threading
 
 from typing import Dict, Any, List, Optional
 
 from bitvoker.logger import setup_logger
+from bitvoker.regex_guard import pattern_problem, rule_patterns
 from bitvoker.constants import CONFIG_FILENAME
 
 
 logger = setup_logger(__name__)
 
+RETENTION_DEFAULTS = {
+    "enabled": False,
+    "max_age_days": 0,
+    "max_rows": 0,
+    "rollup": False,
+    "batch_size": 500,
+    "interval_seconds": 3600,
+    "vacuum_rebuild": False,
+}
+
+DATABASE_DEFAULTS = {
+    "backend": "sqlite",
+    "postgres": {},
+}
+
+DATABASE_BACKENDS = ["sqlite", "postgres"]
+
+SYSLOG_DEFAULTS = {
+    "enabled": False,
+}
+
+INGEST_DEFAULTS: Dict[str, Any] = {
+    "queue_size": 1000,
+    "workers": 8,
+    "policy": "block",
+    "block_timeout_seconds": 5,
+}
+
+INGEST_POLICIES = ["block", "drop_newest", "drop_oldest", "ai_bypass"]
+
+TRACING_DEFAULTS = {
+    "enabled": True,
+    "slow_threshold_ms": 1000,
+    "ring_size": 200,
+    "persist": False,
+}
+
+MATCHING_DEFAULTS = {
+    "regex_timeout_ms": 100,
+    "regex_max_chars": 0,
+    "timeout_window": 100,
+    "timeout_disable_ratio": 0.5,
+}
+
+TCP_DEFAULTS = {
+    "max_message_bytes": 1048576,
+    "oversize_policy": "truncate",
+}
+
+TCP_OVERSIZE_POLICIES = ["reject", "truncate"]
+
+RATE_LIMIT_DEFAULTS = {
+    "enabled": True,
+    "requests_per_second": 20,
+    "burst": 100,
+    "login_attempts_per_minute": 10,
+    "ingest_requests_per_second": 50,
+    "ingest_burst": 200,
+}
+
+METRICS_DEFAULTS = {
+    "scrape_token": "",
+}
+
+_snapshots: Dict[str, "ConfigSnapshot"] = {}
+_snapshots_lock = threading.Lock()
+_snapshot_versions = itertools.count(1)
+
+
+class ConfigSnapshot:
+    # a read-only view of one configuration version; message handling keeps a reference to the snapshot it
+    # started with, so a reload swaps in a new object instead of mutating anything a handler might be reading
+    def __init__(self, config_data: Dict[str, Any], version: int = 0):
+        self.version = version
+        self.config_data = copy.deepcopy(config_data)
+        self.ai_config = self.config_data.get("ai", {})
+        self.message_token = self.config_data.get("message_token", "")
+        self.rules = tuple(self.config_data.get("rules", []))
+        self.enabled_rules = tuple(r for r in self.rules if r.get("enabled", False))
+        self.destinations = tuple(self.config_data.get("destinations", []))
+        self.enabled_destinations = tuple(d for d in self.destinations if d.get("enabled", False))
+        self.enabled_destinations_by_name = {d.get("name"): d for d in self.enabled_destinations}
+        self.enabled_destination_names = [d["name"] for d in self.enabled_destinations]
+        self.retention_config = {**RETENTION_DEFAULTS, **(self.config_data.get("retention") or {})}
+        self.database_config = {**DATABASE_DEFAULTS, **(self.config_data.get("database") or {})}
+        self.syslog_config = {**SYSLOG_DEFAULTS, **(self.config_data.get("syslog") or {})}
+        self.ingest_config = {**INGEST_DEFAULTS, **(self.config_data.get("ingest") or {})}
+        self.tracing_config = {**TRACING_DEFAULTS, **(self.config_data.get("tracing") or {})}
+        self.matching_config = {**MATCHING_DEFAULTS, **(self.config_data.get("matching") or {})}
+        self.tcp_config = {**TCP_DEFAULTS, **(self.config_data.get("tcp") or {})}
+        self.rate_limit_config = {**RATE_LIMIT_DEFAULTS, **(self.config_data.get("rate_limit") or {})}
+        self.metrics_config = {**METRICS_DEFAULTS, **(self.config_data.get("metrics") or {})}
+
+    def get_ai_config(self) -> Dict[str, Any]:
+        return self.ai_config
+
+    def get_rules(self) -> List[Dict[str, Any]]:
+        return list(self.rules)
+
+    def get_destinations(self) -> List[Dict[str, Any]]:
+        return list(self.destinations)
+
+    def get_retention_config(self) -> Dict[str, Any]:
+        return self.retention_config
+
+    def get_database_config(self) -> Dict[str, Any]:
+        return self.database_config
+
+    def get_syslog_config(self) -> Dict[str, Any]:
+        return self.syslog_config
+
+    def get_ingest_config(self) -> Dict[str, Any]:
+        return self.ingest_config
+
+    def get_tracing_config(self) -> Dict[str, Any]:
+        return self.tracing_config
+
+    def get_matching_config(self) -> Dict[str, Any]:
+        return self.matching_config
+
+    def get_tcp_config(self) -> Dict[str, Any]:
+        return self.tcp_config
+
+    def get_rate_limit_config(self) -> Dict[str, Any]:
+        return self.rate_limit_config
+
+    def get_metrics_config(self) -> Dict[str, Any]:
+        return self.metrics_config
+
+    def get_enabled_destinations(self) -> List[Dict[str, Any]]:
+        return list(self.enabled_destinations)
+
+    def get_enabled_rules(self) -> List[Dict[str, Any]]:
+        return list(self.enabled_rules)
+
+    def get_default_rule(self) -> Optional[Dict[str, Any]]:
+        for rule in self.rules:
+            if rule.get("name") == "default-rule":
+                return rule
+        logger.warning("default rule not found")
+        return None
+
+
+def publish_config_snapshot(config_path: str, config_data: Dict[str, Any]) -> ConfigSnapshot:
+    config_path = str(config_path)
+    with _snapshots_lock:
+        current = _snapshots.get(config_path)
+        if current is not None and current.config_data == config_data:
+            return current
+        snapshot = ConfigSnapshot(config_data, next(_snapshot_versions))
+        _snapshots[config_path] = snapshot
+    logger.debug(f"configuration snapshot version {snapshot.version} published for {config_path}")
+    return snapshot
+
+
+def get_config_snapshot(config_path: Optional[str] = None) -> ConfigSnapshot:
+    config_path = str(config_path or CONFIG_FILENAME)
+    with _snapshots_lock:
+        snapshot = _snapshots.get(config_path)
+    if snapshot is None:
+        Config(config_path)
+        with _snapshots_lock:
+            snapshot = _snapshots.get(config_path) or ConfigSnapshot({})
+    return snapshot
+
+
+def get_config_data(config_path: Optional[str] = None) -> Dict[str, Any]:
+    return copy.deepcopy(get_config_snapshot(config_path).config_data)
+
+
+def diff_config(old: Dict[str, Any], new: Dict[str, Any]) -> List[str]:
+    return sorted(key for key in set(old) | set(new) if old.get(key) != new.get(key))
+
 
 class Config:
-    def __init__(self, config_path=None):
+    def __init__(self, config_path=None, config_data=None):
         self.config_path = config_path or CONFIG_FILENAME
         self.config_data = {}
-        self.load_config()
+        if config_data is None:
+            self.load_config()
+        else:
+            self.config_data = copy.deepcopy(config_data)
 
     def load_config(self):
         try:
             if os.path.exists(self.config_path):
                 with open(self.config_path, "r", encoding="utf-8") as f:
                     self.config_data = yaml.safe_load(f) or {}
+                publish_config_snapshot(self.config_path, self.config_data)
                 logger.info(f"configuration loaded from {self.config_path}")
             else:
                 logger.warning(f"config file {self.config_path} not found, using empty configuration")
                 self.config_data = {}
+                publish_config_snapshot(self.config_path, self.config_data)
         except (yaml.YAMLError, IOError) as e:
             logger.error(f"failed to load configuration: {str(e)}")
             self.config_data = {}
@@ -38,6 +220,7 @@ class Config:
             os.makedirs(os.path.dirname(self.config_path), exist_ok=True)
             with open(self.config_path, "w", encoding="utf-8") as f:
                 yaml.safe_dump(self.config_data, f, sort_keys=False)
+            publish_config_snapshot(self.config_path, self.config_data)
             logger.info("configuration saved")
             return True
         except (yaml.YAMLError, IOError) as e:
@@ -53,6 +236,33 @@ class Config:
     def get_destinations(self) -> List[Dict[str, Any]]:
         return self.config_data.get("destinations", [])
 
+    def get_retention_config(self) -> Dict[str, Any]:
+        return {**RETENTION_DEFAULTS, **(self.config_data.get("retention") or {})}
+
+    def get_database_config(self) -> Dict[str, Any]:
+        return {**DATABASE_DEFAULTS, **(self.config_data.get("database") or {})}
+
+    def get_syslog_config(self) -> Dict[str, Any]:
+        return {**SYSLOG_DEFAULTS, **(self.config_data.get("syslog") or {})}
+
+    def get_ingest_config(self) -> Dict[str, Any]:
+        return {**INGEST_DEFAULTS, **(self.config_data.get("ingest") or {})}
+
+    def get_tracing_config(self) -> Dict[str, Any]:
+        return {**TRACING_DEFAULTS, **(self.config_data.get("tracing") or {})}
+
+    def get_matching_config(self) -> Dict[str, Any]:
+        return {**MATCHING_DEFAULTS, **(self.config_data.get("matching") or {})}
+
+    def get_tcp_config(self) -> Dict[str, Any]:
+        return {**TCP_DEFAULTS, **(self.config_data.get("tcp") or {})}
+
+    def get_rate_limit_config(self) -> Dict[str, Any]:
+        return {**RATE_LIMIT_DEFAULTS, **(self.config_data.get("rate_limit") or {})}
+
+    def get_metrics_config(self) -> Dict[str, Any]:
+        return {**METRICS_DEFAULTS, **(self.config_data.get("metrics") or {})}
+
     def get_enabled_destinations(self) -> List[Dict[str, Any]]:
         return [c for c in self.get_destinations() if c.get("enabled", False)]
 
@@ -131,6 +341,19 @@ class Config:
             logger.error(f"invalid rule '{rule_name_for_log}': match.ai_text_regex must be a string or empty (null)")
             return False
 
+        fields = match_config.get("fields")
+        if fields is not None and not (
+            isinstance(fields, dict)
+            and all(
+                isinstance(name, str) and (value is None or isinstance(value, str)) for name, value in fields.items()
+            )
+        ):
+            logger.error(
+                f"invalid rule '{rule_name_for_log}': match.fields must map field names to regex strings or empty"
+                " (null)"
+            )
+            return False
+
         notify_config = rule.get("notify", {})
         if (
             not isinstance(notify_config, dict)
@@ -177,6 +400,12 @@ class Config:
                         f" found type: {type(field_value)}"
                     )
                     return False
+
+        for pattern in rule_patterns(rule):
+            problem = pattern_problem(pattern)
+            if problem:
+                logger.error(f"invalid rule '{rule_name_for_log}': {problem}")
+                return False
         return True
 
     def validate_config(self, config: Dict[str, Any]) -> bool:
@@ -250,6 +479,160 @@ class Config:
                         f" must have {field} field"
                     )
                     return False
+
+        retention = config.get("retention", {})
+        if not isinstance(retention, dict):
+            logger.error("invalid config: retention section must be a dictionary")
+            return False
+
+        for field in ["enabled", "rollup", "vacuum_rebuild"]:
+            if field in retention and not isinstance(retention[field], bool):
+                logger.error(f"invalid config: retention.{field} must be true or false")
+                return False
+
+        for field in ["max_age_days", "max_rows", "batch_size", "interval_seconds"]:
+            value = retention.get(field, RETENTION_DEFAULTS[field])
+            minimum = 1 if field in ["batch_size", "interval_seconds"] else 0
+            if isinstance(value, bool) or not isinstance(value, int) or value < minimum:
+                logger.error(f"invalid config: retention.{field} must be an integer of at least {minimum}")
+                return False
+
+        database = config.get("database", {})
+        if not isinstance(database, dict):
+            logger.error("invalid config: database section must be a dictionary")
+            return False
+
+        backend = database.get("backend", DATABASE_DEFAULTS["backend"])
+        if backend not in DATABASE_BACKENDS:
+            logger.error(f"invalid config: database.backend must be one of {DATABASE_BACKENDS}")
+            return False
+
+        postgres = database.get("postgres", {})
+        if not isinstance(postgres, dict):
+            logger.error("invalid config: database.postgres section must be a dictionary")
+            return False
+
+        if backend == "postgres" and not postgres.get("dsn"):
+            logger.error("invalid config: database.postgres must have dsn field when backend is postgres")
+            return False
+
+        syslog = config.get("syslog", {})
+        if not isinstance(syslog, dict):
+            logger.error("invalid config: syslog section must be a dictionary")
+            return False
+
+        if "enabled" in syslog and not isinstance(syslog["enabled"], bool):
+            logger.error("invalid config: syslog.enabled must be true or false")
+            return False
+
+        ingest = config.get("ingest", {})
+        if not isinstance(ingest, dict):
+            logger.error("invalid config: ingest section must be a dictionary")
+            return False
+
+        if ingest.get("policy", INGEST_DEFAULTS["policy"]) not in INGEST_POLICIES:
+            logger.error(f"invalid config: ingest.policy must be one of {INGEST_POLICIES}")
+            return False
+
+        for field in ["queue_size", "workers"]:
+            value = ingest.get(field, INGEST_DEFAULTS[field])
+            if isinstance(value, bool) or not isinstance(value, int) or value < 1:
+                logger.error(f"invalid config: ingest.{field} must be an integer of at least 1")
+                return False
+
+        timeout = ingest.get("block_timeout_seconds", INGEST_DEFAULTS["block_timeout_seconds"])
+        if isinstance(timeout, bool) or not isinstance(timeout, (int, float)) or timeout <= 0:
+            logger.error("invalid config: ingest.block_timeout_seconds must be a positive number")
+            return False
+
+        tracing = config.get("tracing", {})
+        if not isinstance(tracing, dict):
+            logger.error("invalid config: tracing section must be a dictionary")
+            return False
+
+        for field in ["enabled", "persist"]:
+            if field in tracing and not isinstance(tracing[field], bool):
+                logger.error(f"invalid config: tracing.{field} must be true or false")
+                return False
+
+        threshold = tracing.get("slow_threshold_ms", TRACING_DEFAULTS["slow_threshold_ms"])
+        if isinstance(threshold, bool) or not isinstance(threshold, (int, float)) or threshold < 0:
+            logger.error("invalid config: tracing.slow_threshold_ms must be a number of at least 0")
+            return False
+
+        ring_size = tracing.get("ring_size", TRACING_DEFAULTS["ring_size"])
+        if isinstance(ring_size, bool) or not isinstance(ring_size, int) or ring_size < 1:
+            logger.error("invalid config: tracing.ring_size must be an integer of at least 1")
+            return False
+
+        matching = config.get("matching", {})
+        if not isinstance(matching, dict):
+            logger.error("invalid config: matching section must be a dictionary")
+            return False
+
+        regex_timeout = matching.get("regex_timeout_ms", MATCHING_DEFAULTS["regex_timeout_ms"])
+        if isinstance(regex_timeout, bool) or not isinstance(regex_timeout, (int, float)) or regex_timeout <= 0:
+            logger.error("invalid config: matching.regex_timeout_ms must be a positive number")
+            return False
+
+        regex_max_chars = matching.get("regex_max_chars", MATCHING_DEFAULTS["regex_max_chars"])
+        if isinstance(regex_max_chars, bool) or not isinstance(regex_max_chars, int) or regex_max_chars < 0:
+            logger.error("invalid config: matching.regex_max_chars must be an integer of at least 0")
+            return False
+
+        timeout_window = matching.get("timeout_window", MATCHING_DEFAULTS["timeout_window"])
+        if isinstance(timeout_window, bool) or not isinstance(timeout_window, int) or timeout_window < 1:
+            logger.error("invalid config: matching.timeout_window must be an integer of at least 1")
+            return False
+
+        ratio = matching.get("timeout_disable_ratio", MATCHING_DEFAULTS["timeout_disable_ratio"])
+        if isinstance(ratio, bool) or not isinstance(ratio, (int, float)) or not 0 <= ratio <= 1:
+            logger.error("invalid config: matching.timeout_disable_ratio must be a number between 0 and 1")
+            return False
+
+        tcp = config.get("tcp", {})
+        if not isinstance(tcp, dict):
+            logger.error("invalid config: tcp section must be a dictionary")
+            return False
+
+        max_message_bytes = tcp.get("max_message_bytes", TCP_DEFAULTS["max_message_bytes"])
+        if isinstance(max_message_bytes, bool) or not isinstance(max_message_bytes, int) or max_message_bytes < 1:
+            logger.error("invalid config: tcp.max_message_bytes must be an integer of at least 1")
+            return False
+
+        if tcp.get("oversize_policy", TCP_DEFAULTS["oversize_policy"]) not in TCP_OVERSIZE_POLICIES:
+            logger.error(f"invalid config: tcp.oversize_policy must be one of {TCP_OVERSIZE_POLICIES}")
+            return False
+
+        rate_limit = config.get("rate_limit", {})
+        if not isinstance(rate_limit, dict):
+            logger.error("invalid config: rate_limit section must be a dictionary")
+            return False
+
+        if "enabled" in rate_limit and not isinstance(rate_limit["enabled"], bool):
+            logger.error("invalid config: rate_limit.enabled must be true or false")
+            return False
+
+        for field in ["requests_per_second", "ingest_requests_per_second"]:
+            rate = rate_limit.get(field, RATE_LIMIT_DEFAULTS[field])
+            if isinstance(rate, bool) or not isinstance(rate, (int, float)) or rate <= 0:
+                logger.error(f"invalid config: rate_limit.{field} must be a positive number")
+                return False
+
+        for field in ["burst", "login_attempts_per_minute", "ingest_burst"]:
+            value = rate_limit.get(field, RATE_LIMIT_DEFAULTS[field])
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or value < 1:
+                logger.error(f"invalid config: rate_limit.{field} must be a number of at least 1")
+                return False
+
+        metrics_section = config.get("metrics", {})
+        if not isinstance(metrics_section, dict):
+            logger.error("invalid config: metrics section must be a dictionary")
+            return False
+
+        if not isinstance(metrics_section.get("scrape_token", ""), str):
+            logger.error("invalid config: metrics.scrape_token must be a string")
+            return False
         return True
 
     def update_config(self, new_config: Dict[str, Any]) -> bool:
@@ -7,6 +7,7 @@ HTTP_WEB_SERVER_PORT = 8086
 HTTPS_WEB_SERVER_PORT = 8085
 SECURE_TCP_SERVER_PORT = 8084
 PLAIN_TCP_SERVER_PORT = 8083
+SYSLOG_PORT = 8514
 
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
 
@@ -19,3 +20,6 @@ CONFIG_FILENAME = DATA_DIR / "config.yaml"
 REACT_BUILD_DIR = PROJECT_ROOT / "web" / "build"
 
 MAX_META_PROMPT_LENGTH = 20000
+
+COMPRESSION_THRESHOLD_BYTES = 2048
+NOTIFICATION_PREVIEW_LENGTH = 500
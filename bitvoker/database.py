@@ -1,68 +1,596 @@
+import os
+import abc
+import json
+import time
+import zlib
+import shutil
 import sqlite3
+import threading
 
-from bitvoker.constants import DB_FILENAME
+from typing import Any, Dict, Iterator, List, Optional
 
+from bitvoker import metrics
+from bitvoker.config import get_config_snapshot
+from bitvoker.events import notification_events
+from bitvoker.logger import setup_logger
+from bitvoker.constants import DB_FILENAME, COMPRESSION_THRESHOLD_BYTES, NOTIFICATION_PREVIEW_LENGTH
 
-def init_db():
-    conn = sqlite3.connect(DB_FILENAME)
-    c = conn.cursor()
-    c.execute("""
-              CREATE TABLE IF NOT EXISTS notifications
-              (
-                  id        INTEGER PRIMARY KEY AUTOINCREMENT,
-                  timestamp TEXT,
-                  original  TEXT,
-                  ai        TEXT,
-                  client    TEXT
-              )
-              """)
-    conn.commit()
-    conn.close()
-
-
-def insert_notification(timestamp, original, ai, client):
-    conn = sqlite3.connect(DB_FILENAME)
-    c = conn.cursor()
-    c.execute(
-        """
-              INSERT INTO notifications (timestamp, original, ai, client)
-              VALUES (?, ?, ?, ?)
-              """,
-        (timestamp, original, ai, client),
+
+logger = setup_logger(__name__)
+
+SQLITE_AUTO_VACUUM_INCREMENTAL = 2
+# vacuum writes a full copy of the database and journals the copy back
+VACUUM_FREE_SPACE_FACTOR = 2
+
+NOTIFICATION_FIELDS = [
+    "id",
+    "timestamp",
+    "original",
+    "ai",
+    "client",
+    "matched_rule_name",
+    "destinations",
+    "delivery",
+    "status",
+    "message_size",
+    "ai_latency_ms",
+    "delivery_latency_ms",
+]
+
+INSERT_COLUMNS = [
+    "timestamp",
+    "original",
+    "ai",
+    "client",
+    "matched_rule_name",
+    "destinations",
+    "delivery",
+    "status",
+    "message_size",
+    "ai_latency_ms",
+    "delivery_latency_ms",
+    "original_z",
+    "ai_z",
+    "trace",
+]
+
+INSERT_QUERY = "INSERT INTO notifications ({}) VALUES ({})".format(
+    ", ".join(INSERT_COLUMNS), ", ".join("?" for _ in INSERT_COLUMNS)
+)
+
+
+def compress_body(text):
+    # large bodies are stored zlib-compressed with only a short preview kept as text, so list queries stay cheap
+    if text is None:
+        return None, None
+    encoded = text.encode("utf-8")
+    if len(encoded) <= COMPRESSION_THRESHOLD_BYTES:
+        return text, None
+    return text[:NOTIFICATION_PREVIEW_LENGTH], zlib.compress(encoded)
+
+
+def decompress_body(text, compressed):
+    if compressed is None:
+        return text
+    return zlib.decompress(bytes(compressed)).decode("utf-8")
+
+
+def notification_row(
+    timestamp,
+    original,
+    ai,
+    client,
+    matched_rule_name="",
+    destinations=None,
+    delivery=None,
+    status="",
+    ai_latency_ms=None,
+    delivery_latency_ms=None,
+    trace=None,
+):
+    original_text, original_z = compress_body(original)
+    ai_text, ai_z = compress_body(ai)
+    return (
+        timestamp,
+        original_text,
+        ai_text,
+        client,
+        matched_rule_name,
+        json.dumps(destinations or []),
+        json.dumps(delivery or {}),
+        status,
+        len(original.encode("utf-8")),
+        ai_latency_ms,
+        delivery_latency_ms,
+        original_z,
+        ai_z,
+        json.dumps(trace) if trace else None,
     )
-    conn.commit()
-    conn.close()
 
 
-def get_notifications(limit=20, start_date="", end_date=""):
-    conn = sqlite3.connect(DB_FILENAME)
-    c = conn.cursor()
+def _row_to_notification(row, truncated=None):
+    notif = dict(zip(NOTIFICATION_FIELDS, row))
+    notif["matched_rule_name"] = notif["matched_rule_name"] or ""
+    notif["destinations"] = json.loads(notif["destinations"]) if notif["destinations"] else []
+    notif["delivery"] = json.loads(notif["delivery"]) if notif["delivery"] else {}
+    notif["status"] = notif["status"] or ""
+    if truncated is not None:
+        notif["truncated"] = truncated
+    return notif
+
+
+def _full_notification(row):
+    notif = _row_to_notification(row[:-2])
+    notif["original"] = decompress_body(notif["original"], row[-2])
+    notif["ai"] = decompress_body(notif["ai"], row[-1])
+    return notif
+
+
+class Storage(abc.ABC):
+    day_expression = "DATE(timestamp)"
+    day_parameter = "DATE(?)"
+    destination_filter = "EXISTS (SELECT 1 FROM json_each(destinations) WHERE json_each.value = ?)"
+
+    @abc.abstractmethod
+    def init_db(self) -> None:
+        pass
+
+    @abc.abstractmethod
+    def schema_version(self) -> int:
+        pass
+
+    @abc.abstractmethod
+    def insert_notification(self, *args, **kwargs) -> None:
+        pass
+
+    def insert_notifications(self, notifications: List[Dict[str, Any]]) -> None:
+        for notification in notifications:
+            self.insert_notification(**notification)
+
+    def get_notifications(self, *args, **kwargs) -> List[Dict[str, Any]]:
+        query, params, preview = self._notifications_query(*args, **kwargs)
+        return [
+            _row_to_notification(row[:-1], truncated=bool(row[-1])) if preview else _full_notification(row)
+            for row in self._fetchall(query, params)
+        ]
+
+    def get_notification(self, notification_id) -> Optional[Dict[str, Any]]:
+        rows = self._fetchall(
+            f"SELECT {', '.join(NOTIFICATION_FIELDS)}, original_z, ai_z, trace FROM notifications WHERE id = ?",
+            (notification_id,),
+        )
+        if not rows:
+            return None
+        # traces are only kept for slow messages and only shown on the detail view, never in list queries
+        notif = _full_notification(rows[0][:-1])
+        notif["trace"] = json.loads(rows[0][-1]) if rows[0][-1] else None
+        return notif
+
+    def get_notification_rollups(self, start_date="", end_date="") -> List[Dict[str, Any]]:
+        query = "SELECT day, client, rule, count FROM notification_rollups"
+        filters = []
+        params = []
+
+        if start_date:
+            filters.append(f"day >= {self.day_parameter}")
+            params.append(start_date)
+        if end_date:
+            filters.append(f"day <= {self.day_parameter}")
+            params.append(end_date)
+
+        if filters:
+            query += " WHERE " + " AND ".join(filters)
+
+        query += " ORDER BY day DESC, client, rule"
+
+        rows = self._fetchall(query, tuple(params))
+        return [{"day": row[0], "client": row[1], "rule": row[2], "count": row[3]} for row in rows]
+
+    def iter_notification_batches(
+        self, start_date="", end_date="", batch_size=1000, after_id=0
+    ) -> Iterator[List[Dict[str, Any]]]:
+        # keyset paging on id keeps every batch an index range scan, however deep into the table it is
+        filters = ["id > ?"]
+        params: List[Any] = []
+        if start_date:
+            filters.append(f"{self.day_expression} >= {self.day_parameter}")
+            params.append(start_date)
+        if end_date:
+            filters.append(f"{self.day_expression} <= {self.day_parameter}")
+            params.append(end_date)
+        query = (
+            "SELECT id, timestamp, client, matched_rule_name, original, original_z FROM notifications"
+            f" WHERE {' AND '.join(filters)} ORDER BY id LIMIT ?"
+        )
+        last_id = after_id
+        while True:
+            rows = self._fetchall(query, (last_id, *params, batch_size))
+            if not rows:
+                return
+            yield [
+                {
+                    "id": row[0],
+                    "timestamp": row[1],
+                    "client": row[2],
+                    "matched_rule_name": row[3] or "",
+                    "original": decompress_body(row[4], row[5]),
+                }
+                for row in rows
+            ]
+            last_id = rows[-1][0]
+
+    @abc.abstractmethod
+    def prune_notifications(self, *args, **kwargs) -> int:
+        pass
+
+    def rebuild_for_incremental_vacuum(self) -> bool:
+        return False
+
+    def close(self) -> None:
+        pass
+
+    @abc.abstractmethod
+    def _fetchall(self, query, params) -> List[tuple]:
+        pass
+
+    def _notifications_query(
+        self,
+        limit=20,
+        start_date="",
+        end_date="",
+        rule="",
+        client="",
+        status="",
+        destination="",
+        min_delivery_ms=None,
+        preview=False,
+        after_id=None,
+    ):
+        columns = list(NOTIFICATION_FIELDS)
+        params: List[Any] = []
+        if preview:
+            # previews never touch the compressed columns, only the leading characters of the text ones
+            columns[columns.index("original")] = "substr(original, 1, ?)"
+            columns[columns.index("ai")] = "substr(ai, 1, ?)"
+            columns.append("original_z IS NOT NULL OR ai_z IS NOT NULL OR length(original) > ? OR length(ai) > ?")
+            params.extend([NOTIFICATION_PREVIEW_LENGTH] * 4)
+        else:
+            columns.extend(["original_z", "ai_z"])
+
+        query = f"SELECT {', '.join(columns)} FROM notifications"
+        filters = []
+
+        if start_date:
+            filters.append(f"{self.day_expression} >= {self.day_parameter}")
+            params.append(start_date)
+        if end_date:
+            filters.append(f"{self.day_expression} <= {self.day_parameter}")
+            params.append(end_date)
+        if rule:
+            filters.append("matched_rule_name = ?")
+            params.append(rule)
+        if client:
+            filters.append("client = ?")
+            params.append(client)
+        if status:
+            filters.append("status = ?")
+            params.append(status)
+        if destination:
+            filters.append(self.destination_filter)
+            params.append(destination)
+        if min_delivery_ms is not None:
+            filters.append("delivery_latency_ms >= ?")
+            params.append(min_delivery_ms)
+        if after_id is not None:
+            filters.append("id > ?")
+            params.append(after_id)
+
+        if filters:
+            query += " WHERE " + " AND ".join(filters)
+
+        # after_id pages forward, oldest first, so a limited batch never skips rows between the cursor and the newest
+        query += " ORDER BY id LIMIT ?" if after_id is not None else " ORDER BY id DESC LIMIT ?"
+        params.append(limit)
+        return query, tuple(params), preview
+
+
+class SQLiteStorage(Storage):
+    def __init__(self, path=DB_FILENAME):
+        self.path = path
+
+    def init_db(self):
+        conn = sqlite3.connect(self.path)
+        try:
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != SQLITE_AUTO_VACUUM_INCREMENTAL:
+                if conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()[0] == 0:
+                    # a new database takes the setting before its first table, without a rebuild
+                    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+                else:
+                    # rebuilding an existing database can take minutes and twice its size on disk, so it is never
+                    # done at startup, only by the pruner when asked for
+                    logger.warning(
+                        "database does not use incremental auto-vacuum, pruned space stays allocated until it is"
+                        " rebuilt; set retention.vacuum_rebuild to rebuild it in the background"
+                    )
+
+            conn.execute(SCHEMA_VERSION_TABLE)
+            current = conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+            for version, description, migration in SQLITE_MIGRATIONS:
+                if version <= current:
+                    continue
+                logger.info(f"applying database migration {version}: {description}")
+                with conn:
+                    migration(conn)
+                    conn.execute(
+                        "INSERT INTO schema_version (version, applied_at) VALUES (?, ?)",
+                        (version, time.strftime("%Y-%m-%d %H:%M:%S")),
+                    )
+        finally:
+            conn.close()
+
+    def schema_version(self):
+        return self._fetchall("SELECT COALESCE(MAX(version), 0) FROM schema_version", ())[0][0]
+
+    def insert_notification(self, *args, **kwargs):
+        conn = sqlite3.connect(self.path)
+        c = conn.cursor()
+        c.execute(INSERT_QUERY, notification_row(*args, **kwargs))
+        conn.commit()
+        conn.close()
+
+    def insert_notifications(self, notifications):
+        conn = sqlite3.connect(self.path)
+        try:
+            with conn:
+                conn.executemany(INSERT_QUERY, [notification_row(**n) for n in notifications])
+        finally:
+            conn.close()
+
+    def prune_notifications(
+        self, max_age_days=0, max_rows=0, batch_size=500, rollup=False, vacuum_pages=1000, pause=0.05
+    ):
+        conn = sqlite3.connect(self.path)
+        deleted = 0
+        try:
+            if max_age_days:
+                cutoff = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(time.time() - max_age_days * 86400))
+                deleted += self._delete_in_batches(conn, "timestamp < ?", (cutoff,), batch_size, rollup, pause)
+
+            if max_rows:
+                row = conn.execute(
+                    "SELECT id FROM notifications ORDER BY id DESC LIMIT 1 OFFSET ?", (max_rows,)
+                ).fetchone()
+                if row:
+                    deleted += self._delete_in_batches(conn, "id <= ?", (row[0],), batch_size, rollup, pause)
+
+            if deleted:
+                self._incremental_vacuum(conn, vacuum_pages, pause)
+        finally:
+            conn.close()
+        return deleted
+
+    def rebuild_for_incremental_vacuum(self):
+        conn = sqlite3.connect(self.path)
+        try:
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == SQLITE_AUTO_VACUUM_INCREMENTAL:
+                return False
+            size = os.path.getsize(self.path)
+            free = shutil.disk_usage(os.path.dirname(os.path.abspath(self.path))).free
+            if free < size * VACUUM_FREE_SPACE_FACTOR:
+                logger.warning(
+                    "not rebuilding the database for incremental auto-vacuum: it needs about"
+                    f" {size * VACUUM_FREE_SPACE_FACTOR / 1048576:.0f} MiB free, {free / 1048576:.0f} MiB available"
+                )
+                return False
+            logger.info(
+                f"rebuilding the {size / 1048576:.0f} MiB database for incremental auto-vacuum, new notifications"
+                " wait until it finishes"
+            )
+            started = time.perf_counter()
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+            logger.info(f"database rebuilt for incremental auto-vacuum in {time.perf_counter() - started:.1f}s")
+            return True
+        finally:
+            conn.close()
+
+    def _fetchall(self, query, params):
+        conn = sqlite3.connect(self.path)
+        try:
+            return conn.execute(query, params).fetchall()
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _delete_in_batches(conn, condition, params, batch_size, rollup, pause):
+        deleted = 0
+        select_query = f"SELECT id FROM notifications WHERE {condition} ORDER BY id LIMIT ?"
+        while True:
+            ids = [row[0] for row in conn.execute(select_query, (*params, batch_size))]
+            if not ids:
+                return deleted
+
+            placeholders = ", ".join("?" for _ in ids)
+            with conn:
+                if rollup:
+                    conn.execute(
+                        f"""
+                        INSERT INTO notification_rollups (day, client, rule, count)
+                        SELECT DATE(timestamp), COALESCE(client, ''), COALESCE(matched_rule_name, ''), COUNT(*)
+                        FROM notifications
+                        WHERE id IN ({placeholders})
+                        GROUP BY 1, 2, 3
+                        ON CONFLICT (day, client, rule) DO UPDATE SET count = count + excluded.count
+                        """,
+                        ids,
+                    )
+                conn.execute(f"DELETE FROM notifications WHERE id IN ({placeholders})", ids)
+            deleted += len(ids)
+
+            # releasing the write lock between batches lets handlers insert while a large backlog is pruned
+            if pause:
+                time.sleep(pause)
+
+    @staticmethod
+    def _incremental_vacuum(conn, pages, pause):
+        # without incremental auto-vacuum the pragma frees nothing and the free list never shrinks
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != SQLITE_AUTO_VACUUM_INCREMENTAL:
+            return
+        while conn.execute("PRAGMA freelist_count").fetchone()[0] > 0:
+            conn.execute(f"PRAGMA incremental_vacuum({int(pages)})").fetchall()
+            if pause:
+                time.sleep(pause)
+
+
+def _ensure_columns(conn, table, columns):
+    # databases created before schema versioning may already have some of these columns
+    existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+    for name, column_type in columns.items():
+        if name not in existing:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {column_type}")
+
+
+def _create_notifications(conn):
+    conn.execute("""
+                 CREATE TABLE IF NOT EXISTS notifications
+                 (
+                     id        INTEGER PRIMARY KEY AUTOINCREMENT,
+                     timestamp TEXT,
+                     original  TEXT,
+                     ai        TEXT,
+                     client    TEXT
+                 )
+                 """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_notifications_timestamp ON notifications (timestamp)")
+
+
+def _create_rollups(conn):
+    conn.execute("""
+                 CREATE TABLE IF NOT EXISTS notification_rollups
+                 (
+                     day    TEXT,
+                     client TEXT,
+                     rule   TEXT,
+                     count  INTEGER,
+                     PRIMARY KEY (day, client, rule)
+                 )
+                 """)
+
+
+def _add_delivery_columns(conn):
+    _ensure_columns(
+        conn,
+        "notifications",
+        {
+            "matched_rule_name": "TEXT",
+            "destinations": "TEXT",
+            "delivery": "TEXT",
+            "status": "TEXT",
+            "message_size": "INTEGER",
+            "ai_latency_ms": "REAL",
+            "delivery_latency_ms": "REAL",
+        },
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_notifications_rule ON notifications (matched_rule_name)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_notifications_client ON notifications (client)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_notifications_status ON notifications (status)")
+
+
+def _add_compressed_bodies(conn):
+    _ensure_columns(conn, "notifications", {"original_z": "BLOB", "ai_z": "BLOB"})
+
+
+def _add_trace_column(conn):
+    _ensure_columns(conn, "notifications", {"trace": "TEXT"})
+
+
+SCHEMA_VERSION_TABLE = "CREATE TABLE IF NOT EXISTS schema_version (version INTEGER PRIMARY KEY, applied_at TEXT)"
+
+SQLITE_MIGRATIONS = [
+    (1, "create notifications table", _create_notifications),
+    (2, "create notification rollups table", _create_rollups),
+    (3, "record matched rule and delivery outcome", _add_delivery_columns),
+    (4, "store large bodies compressed", _add_compressed_bodies),
+    (5, "store traces of slow messages", _add_trace_column),
+]
+
+
+_storage: Optional[Storage] = None
+_storage_lock = threading.Lock()
+
+
+def create_storage(database_config: Dict[str, Any]) -> Storage:
+    backend = database_config.get("backend", "sqlite")
+    if backend == "postgres":
+        from bitvoker.postgres import PostgresStorage
+
+        logger.info("using postgres notification storage")
+        return PostgresStorage(**database_config.get("postgres", {}))
+    logger.info(f"using sqlite notification storage at {DB_FILENAME}")
+    return SQLiteStorage(DB_FILENAME)
+
+
+def get_storage() -> Storage:
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                _storage = create_storage(get_config_snapshot().get_database_config())
+    return _storage
+
+
+def set_storage(storage: Optional[Storage]) -> None:
+    global _storage
+    with _storage_lock:
+        previous, _storage = _storage, storage
+    if previous is not None and previous is not storage:
+        previous.close()
+
+
+def close_storage():
+    set_storage(None)
+
+
+def init_db():
+    get_storage().init_db()
+
+
+def insert_notification(*args, **kwargs):
+    started = time.perf_counter()
+    get_storage().insert_notification(*args, **kwargs)
+    metrics.stage_duration.observe(time.perf_counter() - started, "store")
+    # live feed subscribers re-query from their cursor, so the event only needs to wake them up
+    notification_events.publish(None)
+
+
+def insert_notifications(notifications):
+    if not notifications:
+        return
+    started = time.perf_counter()
+    get_storage().insert_notifications(notifications)
+    metrics.stage_duration.observe(time.perf_counter() - started, "store")
+    notification_events.publish(None)
+
+
+def get_notifications(*args, **kwargs):
+    return get_storage().get_notifications(*args, **kwargs)
+
+
+def get_notification(notification_id):
+    return get_storage().get_notification(notification_id)
 
-    query = "SELECT timestamp, original, ai, client FROM notifications"
-    filters = []
-    params = []
 
-    if start_date:
-        filters.append("DATE(timestamp) >= DATE(?)")
-        params.append(start_date)
-    if end_date:
-        filters.append("DATE(timestamp) <= DATE(?)")
-        params.append(end_date)
+def get_notification_rollups(start_date="", end_date=""):
+    return get_storage().get_notification_rollups(start_date, end_date)
 
-    if filters:
-        query += " WHERE " + " AND ".join(filters)
 
-    query += " ORDER BY id DESC LIMIT ?"
-    params.append(limit)
+def iter_notification_batches(start_date="", end_date="", batch_size=1000, after_id=0):
+    return get_storage().iter_notification_batches(start_date, end_date, batch_size, after_id)
 
-    c.execute(query, tuple(params))
-    rows = c.fetchall()
-    conn.close()
 
-    notifs = []
-    for row in rows:
-        notifs.append({"timestamp": row[0], "original": row[1], "ai": row[2], "client": row[3]})
-    return notifs
+def prune_notifications(*args, **kwargs):
+    return get_storage().prune_notifications(*args, **kwargs)
 
 
-init_db()
+def rebuild_for_incremental_vacuum():
+    return get_storage().rebuild_for_incremental_vacuum()
@@ -0,0 +1,61 @@
+import json
+import asyncio
+import threading
+
+from typing import Any, Dict, Optional
+
+
+SUBSCRIBER_QUEUE_SIZE = 1000
+
+
+class EventBroker:
+    def __init__(self, queue_size: int = SUBSCRIBER_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers: Dict[asyncio.Queue, asyncio.AbstractEventLoop] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers[queue] = asyncio.get_running_loop()
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue) -> None:
+        with self._lock:
+            self._subscribers.pop(queue, None)
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return len(self._subscribers)
+
+    def publish(self, event: Any) -> None:
+        # called from tcp handler threads and the event loop alike, so delivery is always marshalled onto the
+        # subscriber's loop; this must never log, since log records are published through here too
+        with self._lock:
+            subscribers = list(self._subscribers.items())
+        for queue, loop in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._deliver, queue, event)
+            except RuntimeError:
+                self.unsubscribe(queue)
+
+    @staticmethod
+    def _deliver(queue: asyncio.Queue, event: Any) -> None:
+        # a slow client loses its oldest events rather than stalling publishers, it can resume from its cursor
+        if queue.full():
+            queue.get_nowait()
+        queue.put_nowait(event)
+
+
+def format_sse(data: Any, event: Optional[str] = None, event_id: Optional[Any] = None) -> str:
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    if event:
+        lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data)}")
+    return "\n".join(lines) + "\n\n"
+
+
+notification_events = EventBroker()
+log_events = EventBroker()
@@ -1,103 +1,239 @@
 import hmac
+import time
 import socketserver
 
 from time import strftime, localtime
 
+from bitvoker import metrics
+from bitvoker.tracing import Trace, activate, slow_traces, span
 from bitvoker.utils import truncate
 from bitvoker.logger import setup_logger
+from bitvoker.pipeline import pipeline
+from bitvoker.config import TCP_DEFAULTS
 from bitvoker.database import insert_notification
 
 
 logger = setup_logger(__name__)
 
 TOKEN_PREFIX = "TOKEN:"
+READ_BUFFER_BYTES = 65536
+
+
+def delivery_status(delivery):
+    if not delivery:
+        return "undelivered"
+    successes = sum(1 for outcome in delivery.values() if outcome["success"])
+    if successes == len(delivery):
+        return "sent"
+    if successes == 0:
+        return "failed"
+    return "partial"
+
+
+def read_message(sock, max_bytes):
+    # reads into one buffer that grows in place up to max_bytes + 1, the extra byte is how an oversized message
+    # shows itself without reading any further
+    buffer = bytearray(min(max_bytes + 1, READ_BUFFER_BYTES))
+    view = memoryview(buffer)
+    size = 0
+    try:
+        while True:
+            if size == len(buffer):
+                if size > max_bytes:
+                    break
+                view.release()
+                buffer.extend(bytes(min(size, max_bytes + 1 - size)))
+                view = memoryview(buffer)
+            try:
+                received = sock.recv_into(view[size:])
+            except (TimeoutError, OSError):
+                break
+            if not received:
+                break
+            size += received
+    finally:
+        view.release()
+    return buffer, size
+
+
+def utf8_boundary(data, end):
+    # steps back over continuation bytes, so cutting a message never splits a character
+    while end > 0 and data[end] & 0xC0 == 0x80:
+        end -= 1
+    return end
+
+
+def verify_message_token(message, context, client_ip):
+    if context is None:
+        return message
+    expected_token = context.config.config_data.get("message_token", "")
+    if not expected_token:
+        return message
+    if not message.startswith(TOKEN_PREFIX):
+        logger.warning(f"message rejected: missing token prefix from {client_ip}")
+        return None
+    rest = message[len(TOKEN_PREFIX):]
+    sep_idx = rest.find(":")
+    if sep_idx == -1:
+        logger.warning(f"message rejected: malformed token from {client_ip}")
+        return None
+    provided_token = rest[:sep_idx]
+    if not hmac.compare_digest(provided_token, expected_token):
+        logger.warning(f"message rejected: invalid token from {client_ip}")
+        return None
+    return rest[sep_idx + 1:]
+
+
+def process_message(original_message, client_ip, context, fields=None, skip_ai=False, trace=None):
+    tracing_config = context.config.tracing_config if context is not None else None
+    if not tracing_config or not tracing_config["enabled"]:
+        return _process_message(original_message, client_ip, context, fields, skip_ai)
+
+    trace = trace or Trace(client_ip)
+    with activate(trace):
+        record = _process_message(original_message, client_ip, context, fields, skip_ai)
+    trace.finish(rule=record["matched_rule_name"], status=record["status"])
+    if trace.duration_ms >= tracing_config["slow_threshold_ms"]:
+        slow_traces.record(trace)
+        logger.info(f"slow message from {client_ip}: trace {trace.trace_id} took {trace.duration_ms:.0f} ms")
+        if tracing_config["persist"]:
+            record["trace"] = trace.to_dict()
+    return record
+
+
+def _process_message(original_message, client_ip, context, fields=None, skip_ai=False):
+    logger.debug(f"received: {truncate(original_message, 120)}")
+    started = time.perf_counter()
+
+    ts = strftime("%Y-%m-%d %H:%M:%S", localtime())
+    title = f"[{ts} - Notification from {client_ip}]"
+
+    match_result = None
+    if context is not None:
+        with span("match"):
+            match_result = context.match.process(client_ip, original_message, fields, skip_ai)
+
+    ai_result = ""
+    matched_rule_name = ""
+    destinations = []
+    delivery = {}
+    ai_latency_ms = None
+    delivery_latency_ms = None
+    status = "skipped"
+    if match_result:
+        ai_result = match_result.ai_processed or ""
+        matched_rule_name = match_result.matched_rule_name
+        destinations = match_result.destinations
+        ai_latency_ms = match_result.ai_latency_ms
+
+        message = ""
+        if match_result.should_send_ai and match_result.should_send_original:
+            message = (
+                f"\n~~~~~~~~~[AI Processed]~~~~~~~~~\n{match_result.ai_processed}\n~~~~~~~[Original"
+                f" Message]~~~~~~~\n{match_result.original_text}"
+            )
+        elif match_result.should_send_ai:
+            message = match_result.ai_processed
+        elif match_result.should_send_original:
+            message = match_result.original_text
+
+        if message:
+            delivery_started = time.perf_counter()
+            try:
+                with span("delivery"):
+                    if match_result.destinations:
+                        delivery = context.notifier.send_message(
+                            message, title=title, destination_names=match_result.destinations
+                        )
+                    else:
+                        delivery = context.notifier.send_message(message, title=title)
+            except Exception as e:
+                logger.exception(f"error during notification dispatch: {e}")
+            delivery_elapsed = time.perf_counter() - delivery_started
+            delivery_latency_ms = round(delivery_elapsed * 1000, 2)
+            metrics.stage_duration.observe(delivery_elapsed, "delivery")
+            status = delivery_status(delivery)
+
+    elapsed = time.perf_counter() - started
+    metrics.stage_duration.observe(elapsed, "process")
+    metrics.messages_processed.inc(status)
+    if matched_rule_name:
+        metrics.rule_duration.observe(elapsed, matched_rule_name)
+
+    return {
+        "timestamp": ts,
+        "original": original_message,
+        "ai": ai_result,
+        "client": client_ip,
+        "matched_rule_name": matched_rule_name,
+        "destinations": destinations,
+        "delivery": delivery,
+        "status": status,
+        "ai_latency_ms": ai_latency_ms,
+        "delivery_latency_ms": delivery_latency_ms,
+    }
 
 
 class Handler(socketserver.BaseRequestHandler):
-    def _verify_token(self, message):
-        config = getattr(self.server, "config", None)
-        if not config:
-            return message
-        expected_token = config.config_data.get("message_token", "")
-        if not expected_token:
-            return message
-        if not message.startswith(TOKEN_PREFIX):
-            logger.warning(f"message rejected: missing token prefix from {self.client_address[0]}")
-            return None
-        rest = message[len(TOKEN_PREFIX):]
-        sep_idx = rest.find(":")
-        if sep_idx == -1:
-            logger.warning(f"message rejected: malformed token from {self.client_address[0]}")
-            return None
-        provided_token = rest[:sep_idx]
-        if not hmac.compare_digest(provided_token, expected_token):
-            logger.warning(f"message rejected: invalid token from {self.client_address[0]}")
-            return None
-        return rest[sep_idx + 1:]
+    def _verify_token(self, message, context=None):
+        return verify_message_token(message, context, self.client_address[0])
 
     def handle(self):
+        metrics.inflight_connections.inc()
+        try:
+            self._handle()
+        finally:
+            metrics.inflight_connections.dec()
+
+    def _handle(self):
+        trace = Trace(self.client_address[0])
+        # one context for the whole message, a concurrent config reload applies from the next message on
+        context = pipeline.current()
+        tcp_config = context.config.tcp_config if context is not None else TCP_DEFAULTS
+        max_bytes = tcp_config["max_message_bytes"]
+        read_started = time.perf_counter()
         try:
             self.request.settimeout(2.0)
-            chunks = []
-            while True:
-                try:
-                    chunk = self.request.recv(4096)
-                    if not chunk:
-                        break
-                    chunks.append(chunk)
-                except (TimeoutError, OSError):
-                    break
-            data = b"".join(chunks).strip()
+            data, size = read_message(self.request, max_bytes)
         except Exception as e:
             logger.exception(f"error reading socket data: {e}")
             return
+        read_ended = time.perf_counter()
+        metrics.stage_duration.observe(read_ended - read_started, "read")
+        metrics.messages_received.inc("tcp")
+
+        oversized = size > max_bytes
+        trace.add_span("read", read_started, read_ended, bytes=size, oversized=oversized)
+        if oversized:
+            policy = tcp_config["oversize_policy"]
+            metrics.oversized_messages.inc(policy)
+            if policy == "reject":
+                logger.warning(f"message rejected: larger than {max_bytes} bytes from {self.client_address[0]}")
+                return
+            logger.warning(f"message truncated to {max_bytes} bytes from {self.client_address[0]}")
+            size = utf8_boundary(data, max_bytes)
 
         try:
-            original_message = data.decode("utf-8")
+            with memoryview(data)[:size] as view:
+                original_message = str(view, "utf-8").strip()
         except UnicodeDecodeError:
             logger.warning("received non-utf8 data, ignoring")
             return
 
-        if not original_message or original_message.strip() == "":
+        if not original_message:
             logger.warning("empty message received, ignoring")
             return
 
-        original_message = self._verify_token(original_message)
+        if oversized:
+            original_message += f"\n[truncated: message exceeded {max_bytes} bytes]"
+
+        original_message = self._verify_token(original_message, context)
         if original_message is None:
             return
 
-        logger.debug(f"received: {truncate(original_message, 120)}")
-
-        ts = strftime("%Y-%m-%d %H:%M:%S", localtime())
-        client_ip = self.client_address[0]
-        title = f"[{ts} - Notification from {client_ip}]"
-
-        match_result = self.server.match.process(client_ip, original_message) if hasattr(self.server, "match") else None
-
-        ai_result = ""
-        if match_result:
-            ai_result = match_result.ai_processed or ""
-
-            message = ""
-            if match_result.should_send_ai and match_result.should_send_original:
-                message = (
-                    f"\n~~~~~~~~~[AI Processed]~~~~~~~~~\n{match_result.ai_processed}\n~~~~~~~[Original"
-                    f" Message]~~~~~~~\n{match_result.original_text}"
-                )
-            elif match_result.should_send_ai:
-                message = match_result.ai_processed
-            elif match_result.should_send_original:
-                message = match_result.original_text
-
-            if message:
-                try:
-                    if match_result.destinations:
-                        self.server.notifier.send_message(
-                            message, title=title, destination_names=match_result.destinations
-                        )
-                    else:
-                        self.server.notifier.send_message(message, title=title)
-                except Exception as e:
-                    logger.exception(f"error during notification dispatch: {e}")
+        ingest_queue = getattr(self.server, "ingest_queue", None)
+        if ingest_queue is not None and ingest_queue.running:
+            ingest_queue.submit(original_message, self.client_address[0], context, trace=trace)
+            return
 
-        insert_notification(ts, original_message, ai_result, client_ip)
+        insert_notification(**process_message(original_message, self.client_address[0], context, trace=trace))
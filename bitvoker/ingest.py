@@ -0,0 +1,98 @@
+import hmac
+import json
+
+from typing import Any, Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+
+from bitvoker import metrics
+from bitvoker.logger import setup_logger
+from bitvoker.pipeline import pipeline
+from bitvoker.database import insert_notifications
+from bitvoker.handler import process_message, verify_message_token
+
+
+logger = setup_logger(__name__)
+
+INGEST_MAX_BATCH = 1000
+INGEST_MAX_BODY_BYTES = 8 * 1024 * 1024
+INGEST_WORKERS = 8
+
+_executor = ThreadPoolExecutor(max_workers=INGEST_WORKERS, thread_name_prefix="ingest")
+
+
+def parse_messages(body: bytes, content_type: str = "") -> List[Optional[str]]:
+    try:
+        text = body.decode("utf-8")
+    except UnicodeDecodeError:
+        raise ValueError("request body must be utf-8")
+
+    content_type = content_type.split(";")[0].strip().lower()
+    try:
+        if content_type in ["application/x-ndjson", "application/ndjson", "application/jsonl"]:
+            items = [json.loads(line) for line in text.splitlines() if line.strip()]
+        elif content_type == "application/json":
+            payload = json.loads(text)
+            items = payload if isinstance(payload, list) else [payload]
+        else:
+            items = [text] if text.strip() else []
+    except json.JSONDecodeError as e:
+        raise ValueError(f"invalid json: {e}")
+    return [_item_message(item) for item in items]
+
+
+def _item_message(item: Any) -> Optional[str]:
+    if isinstance(item, dict):
+        item = item.get("message")
+    if isinstance(item, str) and item.strip():
+        return item.strip()
+    return None
+
+
+def check_ingest_token(provided_token: Optional[str]) -> Optional[bool]:
+    # a token header vouches for the whole batch, without one every message needs its own TOKEN: prefix
+    if provided_token is None:
+        return None
+    context = pipeline.current()
+    expected_token = context.config.message_token if context is not None else ""
+    if not expected_token:
+        return True
+    return hmac.compare_digest(provided_token, expected_token)
+
+
+def ingest_messages(messages: List[Optional[str]], client_ip: str, token_verified: bool = False) -> List[Dict]:
+    context = pipeline.current()
+    results: List[Dict[str, Any]] = [{} for _ in messages]
+    metrics.messages_received.inc("http", amount=len(messages))
+    futures = {}
+    for index, message in enumerate(messages):
+        if message is None:
+            results[index] = {"index": index, "status": "invalid", "error": "message must be a non-empty string"}
+            continue
+        if not token_verified:
+            message = verify_message_token(message, context, client_ip)
+            if message is None:
+                results[index] = {"index": index, "status": "rejected", "error": "invalid or missing token"}
+                continue
+        futures[index] = _executor.submit(process_message, message, client_ip, context)
+
+    records = []
+    for index, future in futures.items():
+        try:
+            record = future.result()
+        except Exception as e:
+            logger.exception(f"error processing ingested message {index} from {client_ip}: {e}")
+            results[index] = {"index": index, "status": "error", "error": str(e)}
+            continue
+        records.append(record)
+        results[index] = {
+            "index": index,
+            "status": record["status"],
+            "matched_rule_name": record["matched_rule_name"],
+            "destinations": record["destinations"],
+            "delivery": record["delivery"],
+        }
+
+    # one write for the whole batch instead of a transaction per message
+    insert_notifications(records)
+    logger.info(f"ingested {len(records)}/{len(messages)} messages over http from {client_ip}")
+    return results
@@ -0,0 +1,178 @@
+import time
+import threading
+
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from bitvoker import metrics
+from bitvoker.logger import setup_logger
+from bitvoker.tracing import Trace
+from bitvoker.handler import process_message
+from bitvoker.config import INGEST_DEFAULTS, INGEST_POLICIES
+from bitvoker.database import insert_notification
+
+
+logger = setup_logger(__name__)
+
+DROP_LOG_INTERVAL = 100
+
+# message, client ip, pipeline context, structured fields, trace, enqueue time
+_Item = Tuple[str, str, Any, Optional[Dict[str, str]], Optional[Trace], float]
+
+
+class IngestQueue:
+    # sits between the socket readers and message processing, so a burst of senders waits on (or is shed by)
+    # a bounded buffer instead of each connection thread holding a slow ai call and delivery
+    def __init__(
+        self,
+        max_size: int = INGEST_DEFAULTS["queue_size"],
+        workers: int = INGEST_DEFAULTS["workers"],
+        policy: str = INGEST_DEFAULTS["policy"],
+        block_timeout: float = INGEST_DEFAULTS["block_timeout_seconds"],
+    ):
+        self._items: Deque[_Item] = deque()
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._stopping = False
+        self._threads: List[threading.Thread] = []
+        self.configure(max_size, workers, policy, block_timeout)
+        self.accepted = 0
+        self.processed = 0
+        self.failed = 0
+        self.dropped_newest = 0
+        self.dropped_oldest = 0
+        self.ai_bypassed = 0
+        self.block_timeouts = 0
+
+    def configure(self, max_size: int, workers: int, policy: str, block_timeout: float) -> None:
+        if policy not in INGEST_POLICIES:
+            raise ValueError(f"unknown ingest policy '{policy}', expected one of {INGEST_POLICIES}")
+        self.max_size = max_size
+        self.workers = workers
+        self.policy = policy
+        self.block_timeout = block_timeout
+
+    @property
+    def running(self) -> bool:
+        return any(thread.is_alive() for thread in self._threads)
+
+    @property
+    def dropped(self) -> int:
+        return self.dropped_newest + self.dropped_oldest + self.block_timeouts
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stopping = False
+        self._threads = [
+            threading.Thread(target=self._run, name=f"ingest-worker-{i}", daemon=True) for i in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+        logger.info(f"ingest queue started: size {self.max_size}, {self.workers} workers, policy {self.policy}")
+
+    def stop(self, timeout: float = 5.0) -> None:
+        # workers finish what is already queued before exiting
+        with self._lock:
+            self._stopping = True
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        self._threads = []
+
+    def depth(self) -> int:
+        with self._lock:
+            return len(self._items)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "depth": self.depth(),
+            "max_size": self.max_size,
+            "policy": self.policy,
+            "workers": self.workers,
+            "accepted": self.accepted,
+            "processed": self.processed,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "dropped_newest": self.dropped_newest,
+            "dropped_oldest": self.dropped_oldest,
+            "block_timeouts": self.block_timeouts,
+            "ai_bypassed": self.ai_bypassed,
+        }
+
+    def submit(
+        self,
+        message: str,
+        client_ip: str,
+        context: Any,
+        fields: Optional[Dict[str, str]] = None,
+        trace: Optional[Trace] = None,
+    ) -> bool:
+        item: Optional[_Item] = (message, client_ip, context, fields, trace, time.perf_counter())
+        with self._lock:
+            if len(self._items) >= self.max_size:
+                if self.policy == "block":
+                    has_room = self._not_full.wait_for(
+                        lambda: len(self._items) < self.max_size or self._stopping, timeout=self.block_timeout
+                    )
+                    if not has_room or self._stopping:
+                        self.block_timeouts += 1
+                        self._log_drop(client_ip, f"queue full for {self.block_timeout}s")
+                        return False
+                elif self.policy == "drop_newest":
+                    self.dropped_newest += 1
+                    self._log_drop(client_ip, "queue full, message dropped")
+                    return False
+                elif self.policy == "drop_oldest":
+                    oldest_client_ip = self._items.popleft()[1]
+                    self.dropped_oldest += 1
+                    self._log_drop(oldest_client_ip, "queue full, oldest queued message dropped")
+                elif self.policy == "ai_bypass":
+                    self.ai_bypassed += 1
+                    item = None
+
+            if item is not None:
+                self._items.append(item)
+                self.accepted += 1
+                self._not_empty.notify()
+                return True
+
+        # the sender's own thread handles it right away without the ai step, matching and delivery of the
+        # original text still happen and the queue stays bounded
+        if self.ai_bypassed % DROP_LOG_INTERVAL == 1:
+            logger.warning(f"ingest queue full, skipping ai processing ({self.ai_bypassed} bypassed so far)")
+        self._process(message, client_ip, context, fields, trace, skip_ai=True)
+        return True
+
+    def _log_drop(self, client_ip: str, reason: str) -> None:
+        if self.dropped % DROP_LOG_INTERVAL == 1:
+            logger.warning(f"message from {client_ip} dropped: {reason} ({self.dropped} dropped so far)")
+
+    def _process(self, message, client_ip, context, fields=None, trace=None, skip_ai=False) -> None:
+        try:
+            record = process_message(message, client_ip, context, fields=fields, skip_ai=skip_ai, trace=trace)
+            insert_notification(**record)
+            with self._lock:
+                self.processed += 1
+        except Exception as e:
+            with self._lock:
+                self.failed += 1
+            logger.exception(f"error processing message from {client_ip}: {e}")
+
+    def _run(self) -> None:
+        while True:
+            with self._lock:
+                self._not_empty.wait_for(lambda: self._items or self._stopping)
+                if not self._items:
+                    return
+                message, client_ip, context, fields, trace, enqueued = self._items.popleft()
+                self._not_full.notify()
+            if trace is not None:
+                trace.add_span("queue", enqueued, time.perf_counter())
+            self._process(message, client_ip, context, fields, trace)
+
+
+ingest_queue = IngestQueue()
+metrics.ingest_queue_depth.set_function(ingest_queue.depth)
@@ -0,0 +1,414 @@
+import re
+import ssl
+import sys
+import json
+import time
+import uuid
+import socket
+import argparse
+import threading
+import urllib.request
+
+from collections import Counter
+from typing import Dict, List, Optional
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from bitvoker.constants import PLAIN_TCP_SERVER_PORT, SECURE_TCP_SERVER_PORT
+
+
+DEFAULT_TEMPLATE = "loadgen message {seq} from worker {worker}: service-{mod10} failed with error"
+SINK_MARKER = "[loadgen:{run_id}:{seq}]"
+SINK_MARKER_PATTERN = re.compile(r"\[loadgen:(?P<run_id>[0-9a-f]{8}):(?P<seq>\d+)\]")
+SAMPLED_GAUGES = ["bitvoker_threads", "bitvoker_inflight_connections", "bitvoker_ingest_queue_depth"]
+
+
+def percentile(sorted_samples: List[float], percent: float) -> float:
+    if not sorted_samples:
+        return 0.0
+    index = min(len(sorted_samples) - 1, int(round(percent / 100 * (len(sorted_samples) - 1))))
+    return sorted_samples[index]
+
+
+def validate_templates(messages: List[str]) -> None:
+    # a bad field would otherwise only show up in the workers, after the run has started
+    sample = {"seq": 0, "worker": 0, "mod10": 0, "run_id": "0" * 8}
+    for template in messages:
+        try:
+            template.format_map(sample)
+        except KeyError as e:
+            raise ValueError(
+                f"unknown field {e} in message template {template!r}, use {{seq}}, {{worker}}, {{mod10}} or {{run_id}}"
+            ) from e
+        except (IndexError, ValueError) as e:
+            raise ValueError(f"invalid message template {template!r}: {e}") from e
+
+
+def latency_summary(samples: List[float]) -> Dict[str, float]:
+    samples = sorted(samples)
+    return {
+        "count": len(samples),
+        "p50_ms": round(percentile(samples, 50) * 1000, 2),
+        "p95_ms": round(percentile(samples, 95) * 1000, 2),
+        "p99_ms": round(percentile(samples, 99) * 1000, 2),
+        "max_ms": round(samples[-1] * 1000, 2) if samples else 0.0,
+    }
+
+
+class Sink:
+    # a local http endpoint for a bitvoker json:// destination, every delivered message that carries a marker
+    # closes the loop for end to end latency
+    def __init__(self, host: str, port: int, run_id: str):
+        self.run_id = run_id
+        self.received: Dict[int, float] = {}
+        self._lock = threading.Lock()
+        sink = self
+
+        class _SinkHandler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("content-length", 0) or 0))
+                sink.record(body.decode("utf-8", errors="replace"))
+                self.send_response(200)
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer((host, port), _SinkHandler)
+        self.server.daemon_threads = True
+        self._thread = threading.Thread(target=self.server.serve_forever, name="loadgen-sink", daemon=True)
+
+    @property
+    def address(self):
+        return self.server.server_address
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+    def record(self, body: str) -> None:
+        now = time.perf_counter()
+        # json-escaped or chunked bodies may carry the marker more than once, only the first arrival counts
+        for match in SINK_MARKER_PATTERN.finditer(body):
+            if match.group("run_id") != self.run_id:
+                continue
+            with self._lock:
+                self.received.setdefault(int(match.group("seq")), now)
+
+    def count(self) -> int:
+        with self._lock:
+            return len(self.received)
+
+
+class MetricsSampler:
+    # polls the server's /metrics while load runs, the peaks show how threads and connections grow under load
+    def __init__(self, url: str, token: str = "", interval: float = 0.5):
+        self.url = url
+        self.token = token
+        self.interval = interval
+        self.peaks: Dict[str, float] = {}
+        self.samples = 0
+        self.errors = 0
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="loadgen-metrics", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> Dict:
+        self._stop_event.set()
+        self._thread.join(timeout=5)
+        return {"samples": self.samples, "errors": self.errors, "peaks": dict(self.peaks)}
+
+    def sample(self) -> None:
+        request = urllib.request.Request(self.url)
+        if self.token:
+            request.add_header("Authorization", f"Bearer {self.token}")
+        with urllib.request.urlopen(request, timeout=self.interval * 4) as response:
+            text = response.read().decode("utf-8")
+        for line in text.splitlines():
+            name, _, value = line.partition(" ")
+            if name in SAMPLED_GAUGES:
+                self.peaks[name] = max(self.peaks.get(name, 0), float(value))
+        self.samples += 1
+
+    def _run(self) -> None:
+        while not self._stop_event.is_set():
+            try:
+                self.sample()
+            except (OSError, ValueError):
+                self.errors += 1
+            self._stop_event.wait(self.interval)
+
+
+class LoadGenerator:
+    def __init__(
+        self,
+        host: str,
+        port: int,
+        messages: List[str],
+        connections: int = 10,
+        count: int = 1000,
+        rate: float = 0.0,
+        token: str = "",
+        tls: bool = False,
+        timeout: float = 10.0,
+        sink: Optional[Sink] = None,
+    ):
+        validate_templates(messages)
+        self.host = host
+        self.port = port
+        self.messages = messages
+        self.connections = connections
+        self.count = count
+        self.rate = rate
+        self.token = token
+        self.timeout = timeout
+        self.sink = sink
+        self.run_id = sink.run_id if sink is not None else uuid.uuid4().hex[:8]
+        self.ssl_context = None
+        if tls:
+            # bitvoker generates a self-signed certificate, so this only encrypts and does not verify
+            self.ssl_context = ssl.create_default_context()
+            self.ssl_context.check_hostname = False
+            self.ssl_context.verify_mode = ssl.CERT_NONE
+
+        self.sent_at: Dict[int, float] = {}
+        self.ack_latencies: List[float] = []
+        self.errors: Counter = Counter()
+        self._next_seq = 0
+        self._lock = threading.Lock()
+        self.started = 0.0
+        self.finished = 0.0
+
+    def render(self, seq: int, worker: int) -> bytes:
+        template = self.messages[seq % len(self.messages)]
+        message = template.format_map({"seq": seq, "worker": worker, "mod10": seq % 10, "run_id": self.run_id})
+        if self.sink is not None:
+            message = f"{message} {SINK_MARKER.format(run_id=self.run_id, seq=seq)}"
+        if self.token:
+            message = f"TOKEN:{self.token}:{message}"
+        return message.encode("utf-8")
+
+    def _claim(self) -> Optional[int]:
+        with self._lock:
+            if self._next_seq >= self.count:
+                return None
+            seq = self._next_seq
+            self._next_seq += 1
+        if self.rate > 0:
+            # every message has a fixed slot on a shared schedule, so the offered rate does not depend on how
+            # many connections are open or how slowly the server answers
+            delay = self.started + seq / self.rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        return seq
+
+    def _send(self, payload: bytes) -> None:
+        with socket.create_connection((self.host, self.port), timeout=self.timeout) as sock:
+            if self.ssl_context is not None:
+                conn = self.ssl_context.wrap_socket(sock, server_hostname=self.host)
+                conn.sendall(payload)
+                # a tls connection cannot half-close, the close_notify is what ends the message and the listener
+                # answers by dropping the connection once it is done with it
+                try:
+                    conn.unwrap()
+                except (ssl.SSLEOFError, ssl.SSLZeroReturnError):
+                    pass
+                return
+            sock.sendall(payload)
+            sock.shutdown(socket.SHUT_WR)
+            # the listener closes the connection once it is done with the message
+            while sock.recv(4096):
+                pass
+
+    def _worker(self, worker: int) -> None:
+        while True:
+            seq = self._claim()
+            if seq is None:
+                return
+            payload = self.render(seq, worker)
+            started = time.perf_counter()
+            with self._lock:
+                self.sent_at[seq] = started
+            try:
+                self._send(payload)
+            except socket.timeout:
+                self._error("timeout")
+                continue
+            except ConnectionRefusedError:
+                self._error("connection refused")
+                continue
+            except ssl.SSLError as e:
+                self._error(f"ssl: {e.reason}")
+                continue
+            except OSError as e:
+                self._error(type(e).__name__)
+                continue
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.ack_latencies.append(elapsed)
+
+    def _error(self, kind: str) -> None:
+        with self._lock:
+            self.errors[kind] += 1
+
+    def run(self, sink_wait: float = 10.0) -> Dict:
+        self.started = time.perf_counter()
+        workers = [
+            threading.Thread(target=self._worker, args=(i,), name=f"loadgen-{i}", daemon=True)
+            for i in range(self.connections)
+        ]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        self.finished = time.perf_counter()
+
+        if self.sink is not None:
+            expected = len(self.ack_latencies)
+            deadline = time.perf_counter() + sink_wait
+            while self.sink.count() < expected and time.perf_counter() < deadline:
+                time.sleep(0.05)
+        return self.report()
+
+    def report(self) -> Dict:
+        duration = self.finished - self.started
+        sent = len(self.ack_latencies)
+        report = {
+            "run_id": self.run_id,
+            "target": f"{self.host}:{self.port}",
+            "tls": self.ssl_context is not None,
+            "connections": self.connections,
+            "target_rate": self.rate,
+            "attempted": self._next_seq,
+            "sent": sent,
+            "errors": dict(self.errors),
+            "error_count": sum(self.errors.values()),
+            "duration_seconds": round(duration, 3),
+            "throughput_per_second": round(sent / duration, 2) if duration else 0.0,
+            "ack_latency": latency_summary(self.ack_latencies),
+        }
+        if self.sink is not None:
+            with self.sink._lock:
+                received = dict(self.sink.received)
+            end_to_end = [received[seq] - self.sent_at[seq] for seq in received if seq in self.sent_at]
+            report["end_to_end_latency"] = latency_summary(end_to_end)
+            report["delivered"] = len(end_to_end)
+            report["undelivered"] = self._next_seq - len(end_to_end)
+        return report
+
+
+def load_corpus(path: str) -> List[str]:
+    with open(path, "r", encoding="utf-8") as f:
+        # corpus lines are sent verbatim, braces are escaped so they are not taken for template fields
+        lines = [line.rstrip("\n").replace("{", "{{").replace("}", "}}") for line in f]
+    messages = [line for line in lines if line.strip()]
+    if not messages:
+        raise ValueError(f"corpus file {path} has no messages")
+    return messages
+
+
+def format_report(report: Dict) -> str:
+    lines = [
+        f"target:      {report['target']}{' (tls)' if report['tls'] else ''}, {report['connections']} connections",
+        (
+            f"sent:        {report['sent']}/{report['attempted']} in {report['duration_seconds']}s"
+            f" ({report['throughput_per_second']} msg/s)"
+        ),
+        f"errors:      {report['error_count']} {report['errors'] if report['errors'] else ''}".rstrip(),
+    ]
+    latencies = [("ack", report["ack_latency"])]
+    if "end_to_end_latency" in report:
+        latencies.append(("end to end", report["end_to_end_latency"]))
+        lines.append(f"delivered:   {report['delivered']} ({report['undelivered']} not seen by the sink)")
+    if "server" in report:
+        peaks = ", ".join(f"{name} {value:g}" for name, value in report["server"]["peaks"].items()) or "no samples"
+        lines.append(f"server peak: {peaks}")
+    for label, summary in latencies:
+        lines.append(
+            f"{label + ':':<12} p50 {summary['p50_ms']} ms, p95 {summary['p95_ms']} ms, p99 {summary['p99_ms']} ms,"
+            f" max {summary['max_ms']} ms"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m bitvoker.loadgen", description="send load to the bitvoker tcp/tls listeners"
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="bitvoker host")
+    parser.add_argument(
+        "--port",
+        type=int,
+        help=f"listener port (default {PLAIN_TCP_SERVER_PORT}, or {SECURE_TCP_SERVER_PORT} with --tls)",
+    )
+    parser.add_argument("--tls", action="store_true", help="connect to the secure listener")
+    parser.add_argument("-c", "--connections", type=int, default=10, help="concurrent connections")
+    parser.add_argument("-n", "--count", type=int, default=1000, help="total messages to send")
+    parser.add_argument("-r", "--rate", type=float, default=0.0, help="target messages per second, 0 for unlimited")
+    parser.add_argument("--corpus", help="file with one message per line, sent in rotation")
+    parser.add_argument(
+        "--template", default=DEFAULT_TEMPLATE, help="synthetic message template with {seq}, {worker} and {mod10}"
+    )
+    parser.add_argument("--token", default="", help="prefix every message with TOKEN:<token>:")
+    parser.add_argument("--timeout", type=float, default=10.0, help="socket timeout in seconds")
+    parser.add_argument(
+        "--sink-port", type=int, help="listen on this port for a json:// destination to measure end to end latency"
+    )
+    parser.add_argument("--sink-host", default="0.0.0.0", help="address the sink listens on")
+    parser.add_argument("--sink-wait", type=float, default=10.0, help="seconds to wait for outstanding deliveries")
+    parser.add_argument("--metrics-url", help="sample peak threads and connections from this bitvoker /metrics url")
+    parser.add_argument("--metrics-token", default="", help="bearer token for --metrics-url when auth is enabled")
+    parser.add_argument("--json", action="store_true", help="print the report as json")
+    args = parser.parse_args(argv)
+
+    try:
+        messages = load_corpus(args.corpus) if args.corpus else [args.template]
+        validate_templates(messages)
+    except (OSError, ValueError) as e:
+        parser.error(str(e))
+
+    sink = None
+    if args.sink_port is not None:
+        sink = Sink(args.sink_host, args.sink_port, uuid.uuid4().hex[:8])
+        sink.start()
+        print(
+            f"sink listening on {args.sink_host}:{sink.address[1]}, add a destination with url json://<this"
+            f" host>:{sink.address[1]}",
+            file=sys.stderr,
+        )
+
+    port = args.port or (SECURE_TCP_SERVER_PORT if args.tls else PLAIN_TCP_SERVER_PORT)
+    generator = LoadGenerator(
+        args.host,
+        port,
+        messages,
+        connections=args.connections,
+        count=args.count,
+        rate=args.rate,
+        token=args.token,
+        tls=args.tls,
+        timeout=args.timeout,
+        sink=sink,
+    )
+    sampler = MetricsSampler(args.metrics_url, args.metrics_token) if args.metrics_url else None
+    if sampler is not None:
+        sampler.start()
+    try:
+        report = generator.run(sink_wait=args.sink_wait)
+    finally:
+        if sink is not None:
+            sink.stop()
+        server_stats = sampler.stop() if sampler is not None else None
+    if server_stats is not None:
+        report["server"] = server_stats
+
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+    return 0 if report["error_count"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
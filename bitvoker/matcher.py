@@ -1,8 +1,12 @@
-import re
+import time
 import socket
-from typing import Dict, Any, Optional, List
+import threading
+from typing import Dict, Any, Optional, List, Union
 
-from bitvoker.config import Config
+from bitvoker import metrics
+from bitvoker.tracing import record_span
+from bitvoker.regex_guard import UnsafePatternError, compile_pattern, rule_patterns
+from bitvoker.config import Config, ConfigSnapshot
 from bitvoker.logger import setup_logger
 from bitvoker.ai import process_with_ai
 
@@ -17,14 +21,179 @@ class MatchResults:
         self.ai_processed = ""
         self.original_text = ""
         self.matched_rule_name = ""
+        self.ai_latency_ms = None
         self.should_send_ai = False
         self.should_send_original = False
 
 
+class RuleStats:
+    OUTCOMES = ["source_rejects", "regex_rejects", "fields_rejects", "timeouts", "matches"]
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self.since = time.time()
+            self.evaluations = 0
+            self.counts = dict.fromkeys(self.OUTCOMES, 0)
+            self.selected = 0
+            self.regex_seconds = 0.0
+            self.regex_max_seconds = 0.0
+
+    def record(self, outcome: str, regex_seconds: float = 0.0) -> None:
+        with self._lock:
+            self.evaluations += 1
+            self.counts[outcome] += 1
+            self.regex_seconds += regex_seconds
+            if regex_seconds > self.regex_max_seconds:
+                self.regex_max_seconds = regex_seconds
+
+    def record_selected(self) -> None:
+        with self._lock:
+            self.selected += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            regexed = self.evaluations - self.counts["source_rejects"]
+            return {
+                "since": round(self.since, 3),
+                "evaluations": self.evaluations,
+                **self.counts,
+                "selected": self.selected,
+                "regex_ms_total": round(self.regex_seconds * 1000, 3),
+                "regex_ms_max": round(self.regex_max_seconds * 1000, 3),
+                "regex_ms_mean": round(self.regex_seconds * 1000 / regexed, 4) if regexed else 0.0,
+            }
+
+
+class CompiledRule:
+    def __init__(self, rule: Dict[str, Any]):
+        self.rule = rule
+        self.name = rule.get("name", "unnamed_rule")
+        self.patterns = {}
+        self.error = None
+        # set when the rule's regexes keep timing out, cleared through the api rather than by editing the rule
+        self.disabled: Optional[str] = None
+        # kept with the compiled rule, so the numbers survive reloads until the rule itself is edited
+        self.stats = RuleStats()
+        for pattern in rule_patterns(rule):
+            try:
+                self.patterns[pattern] = compile_pattern(pattern)
+            except UnsafePatternError as e:
+                self.error = str(e)
+                break
+
+        match_config = rule.get("match", {})
+        self.specificity = 0
+        if match_config.get("sources", []):
+            self.specificity += 1
+        if match_config.get("og_text_regex", ""):
+            self.specificity += 2
+        if match_config.get("ai_text_regex", ""):
+            self.specificity += 1
+        if match_config.get("fields"):
+            self.specificity += 1
+
+
 class Match:
-    def __init__(self, config: Config):
+    def __init__(self, config: Union[Config, ConfigSnapshot], previous: Optional["Match"] = None):
+        if not isinstance(config, ConfigSnapshot):
+            config = ConfigSnapshot(config.config_data)
         self.config = config
 
+        # rules are compiled one at a time, anything unchanged since the previous match is reused as is
+        reusable = {r.name: r for r in previous.compiled_rules} if previous is not None else {}
+        self.compiled_rules: List[CompiledRule] = []
+        compiled = 0
+        for rule in config.enabled_rules:
+            compiled_rule = reusable.get(rule.get("name", "unnamed_rule"))
+            if compiled_rule is None or compiled_rule.rule != rule:
+                compiled_rule = CompiledRule(rule)
+                compiled += 1
+                if compiled_rule.error:
+                    logger.error(f"rule '{compiled_rule.name}' disabled: {compiled_rule.error}")
+            self.compiled_rules.append(compiled_rule)
+        self._patterns: Dict[str, Any] = {}
+        self._pattern_rules: Dict[str, List[CompiledRule]] = {}
+        for compiled_rule in self.compiled_rules:
+            self._patterns.update(compiled_rule.patterns)
+            for pattern in compiled_rule.patterns:
+                self._pattern_rules.setdefault(pattern, []).append(compiled_rule)
+        matching_config = config.matching_config
+        self._regex_timeout_ms = matching_config["regex_timeout_ms"]
+        self._regex_max_chars = matching_config["regex_max_chars"] or None
+        self._timeout_window = matching_config["timeout_window"]
+        self._timeout_disable_ratio = matching_config["timeout_disable_ratio"]
+        # searches and timeouts per pattern over the current window of timeout_window searches
+        self._timeout_counts: Dict[str, List[int]] = {pattern: [0, 0] for pattern in self._patterns}
+        self._timeout_lock = threading.Lock()
+        self._local = threading.local()
+        logger.debug(f"compiled {compiled} of {len(self.compiled_rules)} enabled rules")
+
+    def rule_stats(self) -> List[Dict[str, Any]]:
+        return [
+            {"name": r.name, "error": r.error or r.disabled, "disabled": bool(r.disabled), **r.stats.to_dict()}
+            for r in self.compiled_rules
+        ]
+
+    def reset_rule_stats(self) -> None:
+        for compiled_rule in self.compiled_rules:
+            compiled_rule.stats.reset()
+
+    def enable_rule(self, name: str) -> bool:
+        for compiled_rule in self.compiled_rules:
+            if compiled_rule.name == name and compiled_rule.disabled:
+                compiled_rule.disabled = None
+                with self._timeout_lock:
+                    for pattern in compiled_rule.patterns:
+                        self._timeout_counts[pattern] = [0, 0]
+                logger.info(f"rule '{name}' re-enabled")
+                return True
+        return False
+
+    def _search(self, pattern: str, text: str):
+        regex = self._patterns.get(pattern)
+        if regex is None:
+            regex = compile_pattern(pattern, check=False)
+        # handler threads share the counts, like the rule stats they are only touched under a lock
+        with self._timeout_lock:
+            counts = self._timeout_counts.setdefault(pattern, [0, 0])
+            if counts[0] >= self._timeout_window:
+                counts[0] = counts[1] = 0
+            counts[0] += 1
+        try:
+            # the timeout bounds the work on a long message, regex_max_chars optionally caps how much of it is read
+            return regex.search(text, 0, self._regex_max_chars, timeout=self._regex_timeout_ms / 1000)
+        except TimeoutError:
+            # a timeout only means no match for this message, a sender must not be able to switch a rule off
+            # with one crafted message; the rules are disabled once a good share of the window times out
+            self._local.timed_out = True
+            with self._timeout_lock:
+                counts[1] += 1
+                searches, timeouts = counts
+            self._count_timeout(pattern)
+            if self._timeout_disable_ratio and timeouts >= self._timeout_disable_ratio * self._timeout_window:
+                self._disable_pattern(pattern, timeouts, searches)
+            return None
+
+    def _count_timeout(self, pattern: str) -> None:
+        for compiled_rule in self._pattern_rules.get(pattern, []):
+            metrics.regex_timeouts.inc(compiled_rule.name)
+
+    def _disable_pattern(self, pattern: str, timeouts: int, searches: int) -> None:
+        for compiled_rule in self._pattern_rules.get(pattern, []):
+            if compiled_rule.error or compiled_rule.disabled:
+                continue
+            compiled_rule.disabled = (
+                f"regex '{pattern}' took longer than {self._regex_timeout_ms} ms in {timeouts} of {searches} searches"
+            )
+            logger.error(f"rule '{compiled_rule.name}' disabled: {compiled_rule.disabled}")
+
+    def _resolve_host(self, host: str) -> List[str]:
+        return socket.gethostbyname_ex(host)[2]
+
     def _is_source_match(self, client_source: str, rule_source_list: List[str]) -> bool:
         if not rule_source_list:
             logger.debug("empty sources list - matching all sources")
@@ -36,8 +205,10 @@ class Match:
         for src_item in rule_source_list:
             if not src_item:
                 continue
+            resolve_started = time.perf_counter()
             try:
-                ips = socket.gethostbyname_ex(src_item)[2]
+                ips = self._resolve_host(src_item)
+                record_span("resolve", resolve_started, time.perf_counter(), host=src_item)
                 if client_source in ips:
                     logger.debug(
                         f"hostname translation successful: '{src_item}' resolved to {ips}, matched client ip"
@@ -45,54 +216,77 @@ class Match:
                     )
                     return True
             except (socket.gaierror, socket.herror):
+                record_span("resolve", resolve_started, time.perf_counter(), host=src_item, error=True)
                 logger.debug(f"hostname translation failed: could not resolve '{src_item}' to ip address, skipping")
                 continue
         return False
 
-    def _find_matching_rule(self, source: str, text: str) -> Optional[Dict[str, Any]]:
+    def _is_fields_match(self, field_patterns: Dict[str, Optional[str]], fields: Optional[Dict[str, str]]) -> bool:
+        if not field_patterns:
+            return True
+        # rules on structured fields only apply to messages that came in with fields, such as syslog
+        if fields is None:
+            return False
+        return all(
+            not pattern or self._search(pattern, str(fields.get(name, ""))) for name, pattern in field_patterns.items()
+        )
+
+    def _find_matching_rule(
+        self, source: str, text: str, fields: Optional[Dict[str, str]] = None
+    ) -> Optional[Dict[str, Any]]:
         matching_rules = []
 
-        for rule in self.config.get_enabled_rules():
-            rule_name_for_log = rule.get("name", "unnamed_rule")
+        for compiled_rule in self.compiled_rules:
+            if compiled_rule.error or compiled_rule.disabled:
+                continue
+            rule = compiled_rule.rule
+            rule_name_for_log = compiled_rule.name
             match_config = rule.get("match", {})
+            stats = compiled_rule.stats
 
             source_list = match_config.get("sources", [])
             if not self._is_source_match(source, source_list):
+                stats.record("source_rejects")
                 logger.debug(
                     f"rule '{rule_name_for_log}' rejected: source '{source}' not in rule's sources list {source_list}"
                 )
                 continue
 
+            self._local.timed_out = False
+            regex_started = time.perf_counter()
             og_regex = match_config.get("og_text_regex", "")
-            if og_regex and not re.search(og_regex, text, re.DOTALL | re.IGNORECASE):
+            if og_regex and not self._search(og_regex, text):
+                stats.record(
+                    "timeouts" if self._local.timed_out else "regex_rejects", time.perf_counter() - regex_started
+                )
                 logger.debug(
                     f"rule '{rule_name_for_log}' rejected: original text does not match og_text_regex '{og_regex}'"
                 )
                 continue
 
-            ai_regex_in_match = match_config.get("ai_text_regex", "")
-
-            specificity = 0
-            if source_list:
-                specificity += 1
-            if og_regex:
-                specificity += 2
-            if ai_regex_in_match:
-                specificity += 1
+            if not self._is_fields_match(match_config.get("fields") or {}, fields):
+                stats.record(
+                    "timeouts" if self._local.timed_out else "fields_rejects", time.perf_counter() - regex_started
+                )
+                logger.debug(f"rule '{rule_name_for_log}' rejected: message fields do not match rule's fields")
+                continue
 
-            matching_rules.append((rule, specificity))
+            stats.record("matches", time.perf_counter() - regex_started)
+            matching_rules.append((compiled_rule, compiled_rule.specificity))
 
         matching_rules.sort(key=lambda x: x[1], reverse=True)
 
         if matching_rules:
-            logger.debug(f"matched rule '{matching_rules[0][0].get('name')}' with specificity {matching_rules[0][1]}")
-            return matching_rules[0][0]
+            selected = matching_rules[0][0]
+            selected.stats.record_selected()
+            logger.debug(f"matched rule '{selected.name}' with specificity {matching_rules[0][1]}")
+            return selected.rule
 
         logger.debug("no matching rule found after evaluating all enabled rules")
         return None
 
     def _should_process_with_ai(self, rule: Dict[str, Any]) -> bool:
-        ai_config = self.config.get_ai_config()
+        ai_config = self.config.ai_config
         if not ai_config or not ai_config.get("provider"):
             logger.warning("ai processing disabled - ai_config is empty or provider not set")
             return False
@@ -111,11 +305,23 @@ class Match:
         return should_process_ai
 
     def _get_ai_processed(self, text: str, preprompt: str) -> Optional[str]:
+        provider = self.config.ai_config.get("provider", "meta_ai")
+        started = time.perf_counter()
+        outcome = "error"
         try:
-            return process_with_ai(text, preprompt, self.config.get_ai_config())
+            ai_output = process_with_ai(text, preprompt, self.config.ai_config)
+            outcome = "success" if ai_output is not None else "empty"
+            return ai_output
         except Exception as e:
             logger.error(f"ai processing failed: {str(e)}")
             return None
+        finally:
+            ended = time.perf_counter()
+            elapsed = ended - started
+            record_span("ai", started, ended, provider=provider, outcome=outcome)
+            metrics.stage_duration.observe(elapsed, "ai")
+            metrics.ai_duration.observe(elapsed, provider)
+            metrics.ai_requests.inc(provider, outcome)
 
     def _should_send_message(
         self, config_section: Dict[str, Any], original_text: str, ai_text: Optional[str] = None
@@ -124,14 +330,14 @@ class Match:
             return False
 
         og_text_regex = config_section.get("og_text_regex", "")
-        if og_text_regex and not re.search(og_text_regex, original_text, re.DOTALL | re.IGNORECASE):
+        if og_text_regex and not self._search(og_text_regex, original_text):
             return False
 
         ai_text_regex = config_section.get("ai_text_regex", "")
         if ai_text_regex:
             if ai_text is None:
                 return False
-            if not re.search(ai_text_regex, ai_text, re.DOTALL | re.IGNORECASE):
+            if not self._search(ai_text_regex, ai_text):
                 return False
         return True
 
@@ -142,27 +348,26 @@ class Match:
         return self._should_send_message(notify_config.get("send_ai_text", {}), text, ai_text)
 
     def get_enabled_destinations_by_names(self, destination_names: List[str]) -> Dict[str, Dict[str, Any]]:
-        destinations = {}
-        enabled_destinations_from_config = self.config.get_enabled_destinations()
-        for dest_name in destination_names:
-            for conf_dest in enabled_destinations_from_config:
-                if conf_dest["name"] == dest_name:
-                    destinations[dest_name] = conf_dest
-                    break
-        return destinations
-
-    def process(self, source: str, text: str) -> Optional[MatchResults]:
+        enabled_destinations = self.config.enabled_destinations_by_name
+        return {name: enabled_destinations[name] for name in destination_names if name in enabled_destinations}
+
+    def process(
+        self, source: str, text: str, fields: Optional[Dict[str, str]] = None, skip_ai: bool = False
+    ) -> Optional[MatchResults]:
         if not text or not source:
             logger.debug("processing aborted: empty text or source")
             return None
 
-        matched_rule = self._find_matching_rule(source, text)
+        match_started = time.perf_counter()
+        matched_rule = self._find_matching_rule(source, text, fields)
+        metrics.stage_duration.observe(time.perf_counter() - match_started, "match")
         if not matched_rule:
             logger.debug(f"no matching rule found for source: {source} and text snippet: {text[:100]}")
             return None
 
         rule_name = matched_rule.get("name", "unnamed_rule")
         logger.info(f"rule '{rule_name}' matched for source: {source}")
+        metrics.rule_matches.inc(rule_name)
 
         result = MatchResults()
         result.original_text = text
@@ -171,10 +376,16 @@ class Match:
         result.ai_processed = None
 
         if self._should_process_with_ai(matched_rule):
-            ai_output = self._get_ai_processed(text, matched_rule.get("preprompt", ""))
+            if skip_ai:
+                logger.debug(f"rule '{rule_name}': ai processing bypassed")
+                ai_output = None
+            else:
+                ai_started = time.perf_counter()
+                ai_output = self._get_ai_processed(text, matched_rule.get("preprompt", ""))
+                result.ai_latency_ms = round((time.perf_counter() - ai_started) * 1000, 2)
             if ai_output is not None:
                 result.ai_processed = ai_output
-            else:
+            elif not skip_ai:
                 logger.warning(f"ai processing returned none for rule '{rule_name}'")
 
             match_config = matched_rule.get("match", {})
@@ -186,7 +397,7 @@ class Match:
                         " conditions, but ai_processed text is not available"
                     )
                     return None
-                if not re.search(ai_text_regex_in_match, result.ai_processed, re.DOTALL | re.IGNORECASE):
+                if not self._search(ai_text_regex_in_match, result.ai_processed):
                     logger.debug(
                         f"rule '{rule_name}' rejected: ai processed text does not match ai_text_regex"
                         f" ('{ai_text_regex_in_match}') in match conditions"
@@ -207,7 +418,7 @@ class Match:
                 f"rule '{rule_name}': empty destinations array in rule - will send to all configured and enabled global"
                 " destinations"
             )
-            dest_list_names = [d["name"] for d in self.config.get_enabled_destinations()]
+            dest_list_names = list(self.config.enabled_destination_names)
 
         result.destinations = dest_list_names
 
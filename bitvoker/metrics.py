@@ -0,0 +1,231 @@
+import abc
+import math
+import bisect
+import threading
+
+from typing import Any, Callable, Dict, Generic, List, Optional, Tuple, TypeVar
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+V = TypeVar("V")
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric(abc.ABC, Generic[V]):
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], V] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labelvalues: Tuple) -> Tuple[str, ...]:
+        if len(labelvalues) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {labelvalues}")
+        return tuple(str(value) for value in labelvalues)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._values.clear()
+
+    @abc.abstractmethod
+    def _samples(self) -> List[str]:
+        pass
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+
+
+class Counter(_Metric[float]):
+    kind = "counter"
+
+    def inc(self, *labelvalues, amount: float = 1) -> None:
+        key = self._key(labelvalues)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, *labelvalues) -> float:
+        return self._values.get(self._key(labelvalues), 0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}" for key, v in items]
+
+
+class Gauge(_Metric[float]):
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._function: Optional[Callable[[], float]] = None
+
+    def set(self, value: float, *labelvalues) -> None:
+        key = self._key(labelvalues)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, *labelvalues, amount: float = 1) -> None:
+        key = self._key(labelvalues)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, *labelvalues, amount: float = 1) -> None:
+        self.inc(*labelvalues, amount=-amount)
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        # read at scrape time, for values that something else already keeps track of
+        self._function = function
+
+    def value(self, *labelvalues) -> float:
+        if self._function is not None:
+            return self._function()
+        return self._values.get(self._key(labelvalues), 0)
+
+    def _samples(self) -> List[str]:
+        if self._function is not None:
+            return [f"{self.name} {_format_value(self._function())}"]
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}" for key, v in items]
+
+
+class _Series:
+    def __init__(self, buckets: int):
+        # per bucket counts, only made cumulative when rendered, so an observation is one increment
+        self.counts = [0] * buckets
+        self.total = 0.0
+        self.count = 0
+
+
+class Histogram(_Metric[_Series]):
+    kind = "histogram"
+
+    def __init__(
+        self, name: str, documentation: str, labelnames: Tuple[str, ...] = (), buckets: Tuple = LATENCY_BUCKETS
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labelvalues) -> None:
+        key = self._key(labelvalues)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._values.get(key)
+            if series is None:
+                series = self._values[key] = _Series(len(self.buckets) + 1)
+            series.counts[index] += 1
+            series.total += value
+            series.count += 1
+
+    def count(self, *labelvalues) -> int:
+        series = self._values.get(self._key(labelvalues))
+        return series.count if series is not None else 0
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = [(key, (list(s.counts), s.total, s.count)) for key, s in self._values.items()]
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+M = TypeVar("M", bound="_Metric[Any]")
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric[Any]] = []
+
+    def register(self, metric: M) -> M:
+        self._metrics.append(metric)
+        return metric
+
+    def clear(self) -> None:
+        for metric in self._metrics:
+            metric.clear()
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+messages_received = registry.register(
+    Counter("bitvoker_messages_received_total", "Messages received, by listener.", ("listener",))
+)
+messages_processed = registry.register(
+    Counter("bitvoker_messages_processed_total", "Messages processed, by final status.", ("status",))
+)
+stage_duration = registry.register(
+    Histogram("bitvoker_stage_duration_seconds", "Time spent in each pipeline stage.", ("stage",))
+)
+rule_matches = registry.register(Counter("bitvoker_rule_matches_total", "Messages matched, by rule.", ("rule",)))
+rule_duration = registry.register(
+    Histogram("bitvoker_rule_duration_seconds", "End to end processing time of matched messages, by rule.", ("rule",))
+)
+regex_timeouts = registry.register(
+    Counter("bitvoker_regex_timeouts_total", "Regex searches that ran out of time, by rule.", ("rule",))
+)
+ai_requests = registry.register(
+    Counter("bitvoker_ai_requests_total", "AI processing requests, by provider and outcome.", ("provider", "outcome"))
+)
+ai_duration = registry.register(
+    Histogram("bitvoker_ai_duration_seconds", "AI processing time, by provider.", ("provider",))
+)
+deliveries = registry.register(
+    Counter("bitvoker_deliveries_total", "Delivery attempts, by destination and outcome.", ("destination", "outcome"))
+)
+delivery_duration = registry.register(
+    Histogram("bitvoker_delivery_duration_seconds", "Delivery time, by destination.", ("destination",))
+)
+oversized_messages = registry.register(
+    Counter("bitvoker_oversized_messages_total", "TCP messages over max_message_bytes, by policy.", ("policy",))
+)
+rate_limited = registry.register(
+    Counter("bitvoker_rate_limited_total", "API requests refused by the rate limiter, by bucket.", ("bucket",))
+)
+inflight_connections = registry.register(
+    Gauge("bitvoker_inflight_connections", "TCP connections currently being handled.")
+)
+threads = registry.register(Gauge("bitvoker_threads", "Threads currently alive in the process."))
+threads.set_function(threading.active_count)
+ingest_queue_depth = registry.register(Gauge("bitvoker_ingest_queue_depth", "Messages waiting in the ingest queue."))
+
+
+def render() -> str:
+    return registry.render()
@@ -1,17 +1,23 @@
+import time
 import apprise
 
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 
+from bitvoker import metrics
 from bitvoker.logger import setup_logger
+from bitvoker.tracing import record_span
 
 
 logger = setup_logger(__name__)
 
 
 class Notifier:
-    def __init__(self, destinations_config: Optional[List[Dict[str, Any]]] = None):
+    def __init__(
+        self, destinations_config: Optional[List[Dict[str, Any]]] = None, previous: Optional["Notifier"] = None
+    ):
         self.destinations_config = destinations_config if destinations_config else []
         self.apprise = apprise.Apprise()
+        self._plugins: Dict[str, Tuple[str, Any]] = dict(previous._plugins) if previous is not None else {}
         self._setup_destinations()
 
     def update_destinations(self, destinations_config: Optional[List[Dict[str, Any]]] = None):
@@ -19,7 +25,11 @@ class Notifier:
         self._setup_destinations()
 
     def _setup_destinations(self):
-        self.apprise = apprise.Apprise()
+        # plugin instances are kept for destinations whose url did not change, the new set is swapped in at once
+        # so messages being sent keep using the servers they started with
+        container = apprise.Apprise()
+        plugins = {}
+        reused = 0
         for destination_conf in self.destinations_config:
             if not destination_conf.get("enabled", False):
                 logger.debug(f"skipping disabled destination: {destination_conf.get('name', 'unnamed destination')}")
@@ -27,40 +37,55 @@ class Notifier:
             try:
                 url = destination_conf.get("url")
                 name = destination_conf.get("name")
-                if url and name:
-                    self.apprise.add(url, tag=name)
+                if not url or not name:
+                    continue
+                existing = self._plugins.get(name)
+                if existing is not None and existing[0] == url:
+                    plugin = existing[1]
+                    reused += 1
+                else:
+                    plugin = apprise.Apprise.instantiate(url, tag=name)
+                    if plugin is None:
+                        logger.error(f"failed to add destination {name}: unsupported or invalid url")
+                        continue
                     logger.debug(f"added notification destination: {name}")
+                container.add(plugin)
+                plugins[name] = (url, plugin)
             except Exception as e:
                 logger.error(f"failed to add destination {destination_conf.get('name', 'unknown')}: {str(e)}")
+        self._plugins = plugins
+        self.apprise = container
+        logger.debug(f"notification destinations ready ({len(plugins)} active, {reused} reused)")
 
     def send_message(
         self, message_body: str, title: str = "bitvoker notification", destination_names: Optional[List[str]] = None
-    ) -> None:
-        if not self.apprise.servers:
+    ) -> Dict[str, Dict[str, Any]]:
+        delivery: Dict[str, Dict[str, Any]] = {}
+        servers = self.apprise.servers
+        if not servers:
             logger.warning("no notification destinations configured or loaded")
-            return
+            return delivery
 
         try:
             tags_to_notify = set(destination_names) if destination_names else None
             if not tags_to_notify:
-                target_servers = self.apprise.servers
+                target_servers = servers
             else:
-                target_servers = [s for s in self.apprise.servers if tags_to_notify.intersection(s.tags)]
+                target_servers = [s for s in servers if tags_to_notify.intersection(s.tags)]
 
             if not target_servers:
                 logger.warning(f"no notification services found for specified tags: {destination_names}")
-                return
+                return delivery
 
             success_count = 0
             for server in target_servers:
+                name = next(iter(server.tags), server.service_name)
+                started = time.perf_counter()
+                success = False
                 try:
-                    temp_notifier = apprise.Apprise()
-                    temp_notifier.add(server.url(privacy=False))
-
                     max_len = getattr(server, "body_maxlen", 0)
                     if not max_len or len(message_body) <= max_len:
-                        if temp_notifier.notify(body=message_body, title=title):
-                            success_count += 1
+                        success = bool(server.notify(body=message_body, title=title))
                         continue
 
                     SAFETY_BUFFER = 50
@@ -79,14 +104,21 @@ class Notifier:
                     for i, chunk in enumerate(chunks):
                         part_number = i + 1
                         paginated_title = f"{title} ({part_number}/{total_chunks})"
-                        if not temp_notifier.notify(body=chunk, title=paginated_title):
+                        if not server.notify(body=chunk, title=paginated_title):
                             chunk_success = False
 
-                    if chunk_success:
-                        success_count += 1
+                    success = chunk_success
 
                 except Exception as e:
                     logger.error(f"failed to send to destination {server.service_name}: {e}", exc_info=True)
+                finally:
+                    ended = time.perf_counter()
+                    elapsed = ended - started
+                    delivery[name] = {"success": success, "latency_ms": round(elapsed * 1000, 2)}
+                    record_span("destination", started, ended, destination=name, success=success)
+                    metrics.delivery_duration.observe(elapsed, name)
+                    metrics.deliveries.inc(name, "success" if success else "failure")
+                    success_count += int(success)
 
             logger.info(f"successfully sent notifications to {success_count}/{len(target_servers)} destinations")
 
@@ -95,3 +127,4 @@ class Notifier:
                 f"an unexpected error occurred sending notifications for tag(s) '{destination_names}': {str(e)}",
                 exc_info=True,
             )
+        return delivery
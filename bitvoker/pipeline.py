@@ -0,0 +1,72 @@
+import time
+import threading
+
+from typing import Optional
+
+from bitvoker.config import ConfigSnapshot
+from bitvoker.matcher import Match
+from bitvoker.notifier import Notifier
+from bitvoker.logger import setup_logger
+
+
+logger = setup_logger(__name__)
+
+
+class PipelineContext:
+    # everything a listener needs to handle one message, taken together so a refresh can never hand a message
+    # the match of one configuration version and the notifier of another
+    def __init__(self, config: ConfigSnapshot, notifier: Notifier, match: Match):
+        self.config = config
+        self.notifier = notifier
+        self.match = match
+
+    @property
+    def version(self) -> int:
+        return self.config.version
+
+
+class Pipeline:
+    def __init__(self):
+        self._context: Optional[PipelineContext] = None
+        self._lock = threading.Lock()
+
+    def current(self) -> Optional[PipelineContext]:
+        return self._context
+
+    def refresh(self, config: ConfigSnapshot, components: Optional[set] = None) -> PipelineContext:
+        # a single writer at a time, readers only ever see a complete context
+        with self._lock:
+            previous = self._context
+            notifier = previous.notifier if previous is not None else None
+            match = previous.match if previous is not None else None
+            rebuild_all = components is None
+
+            if components is None or "destinations" in components or notifier is None:
+                step_started = time.perf_counter()
+                destinations = config.get_enabled_destinations()
+                try:
+                    notifier = Notifier(destinations, previous=notifier)
+                except Exception as e:
+                    logger.error(f"failed to update notifier: {str(e)}")
+                    notifier = Notifier([])
+                logger.debug(f"notifier refreshed in {(time.perf_counter() - step_started) * 1000:.1f} ms")
+
+            # rules that notify every destination resolve the enabled list through match, so it follows destinations too
+            if rebuild_all or components or match is None:
+                step_started = time.perf_counter()
+                try:
+                    match = Match(config, previous=match)
+                    logger.debug(
+                        f"match system updated to configuration version {config.version} in"
+                        f" {(time.perf_counter() - step_started) * 1000:.1f} ms"
+                    )
+                except Exception as e:
+                    logger.error(f"failed to update match system: {str(e)}")
+                    if match is None:
+                        raise
+
+            self._context = PipelineContext(config, notifier, match)
+            return self._context
+
+
+pipeline = Pipeline()
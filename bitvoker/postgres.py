@@ -0,0 +1,200 @@
+import time
+import threading
+
+from bitvoker.logger import setup_logger
+from bitvoker.database import INSERT_QUERY, SCHEMA_VERSION_TABLE, Storage, notification_row
+
+
+logger = setup_logger(__name__)
+
+INITIAL_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS notifications
+    (
+        id                  BIGSERIAL PRIMARY KEY,
+        timestamp           TEXT,
+        original            TEXT,
+        ai                  TEXT,
+        client              TEXT,
+        matched_rule_name   TEXT,
+        destinations        TEXT,
+        delivery            TEXT,
+        status              TEXT,
+        message_size        INTEGER,
+        ai_latency_ms       DOUBLE PRECISION,
+        delivery_latency_ms DOUBLE PRECISION,
+        original_z          BYTEA,
+        ai_z                BYTEA
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_notifications_timestamp ON notifications (timestamp)",
+    "CREATE INDEX IF NOT EXISTS idx_notifications_rule ON notifications (matched_rule_name)",
+    "CREATE INDEX IF NOT EXISTS idx_notifications_client ON notifications (client)",
+    "CREATE INDEX IF NOT EXISTS idx_notifications_status ON notifications (status)",
+    """
+    CREATE TABLE IF NOT EXISTS notification_rollups
+    (
+        day    TEXT,
+        client TEXT,
+        rule   TEXT,
+        count  BIGINT,
+        PRIMARY KEY (day, client, rule)
+    )
+    """,
+]
+
+MIGRATION_LOCK_ID = 0x62697476
+
+POSTGRES_MIGRATIONS = [
+    (1, "create notification tables", INITIAL_SCHEMA),
+    (2, "store traces of slow messages", ["ALTER TABLE notifications ADD COLUMN IF NOT EXISTS trace TEXT"]),
+]
+
+
+def _to_pyformat(query):
+    return query.replace("?", "%s")
+
+
+class PostgresStorage(Storage):
+    day_expression = "LEFT(timestamp, 10)"
+    day_parameter = "?"
+    destination_filter = "destinations::jsonb @> jsonb_build_array(?::text)"
+
+    def __init__(
+        self, dsn="", min_pool_size=1, max_pool_size=10, batch_size=100, flush_interval_seconds=1.0, pool=None
+    ):
+        if pool is None:
+            try:
+                from psycopg_pool import ConnectionPool  # type: ignore[import]
+            except ImportError as e:
+                raise RuntimeError("postgres backend requires psycopg, install bitvoker[postgres]") from e
+            pool = ConnectionPool(dsn, min_size=min_pool_size, max_size=max_pool_size, open=True)
+        self.pool = pool
+        self.batch_size = batch_size
+        self.flush_interval_seconds = flush_interval_seconds
+        self._pending = []
+        self._pending_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._flusher = threading.Thread(target=self._run_flusher, name="postgres-flusher", daemon=True)
+        self._flusher.start()
+        logger.info(f"postgres storage ready (pool: {min_pool_size}-{max_pool_size}, batch size: {batch_size})")
+
+    def init_db(self):
+        # replicas starting together serialize on an advisory lock, and postgres ddl is transactional
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK_ID,))
+                cur.execute(SCHEMA_VERSION_TABLE)
+                cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+                current = cur.fetchone()[0]
+                for version, description, statements in POSTGRES_MIGRATIONS:
+                    if version <= current:
+                        continue
+                    logger.info(f"applying database migration {version}: {description}")
+                    for statement in statements:
+                        cur.execute(statement)
+                    cur.execute(
+                        "INSERT INTO schema_version (version, applied_at) VALUES (%s, %s)",
+                        (version, time.strftime("%Y-%m-%d %H:%M:%S")),
+                    )
+
+    def schema_version(self):
+        return self._fetchall("SELECT COALESCE(MAX(version), 0) FROM schema_version", ())[0][0]
+
+    def insert_notification(self, *args, **kwargs):
+        row = notification_row(*args, **kwargs)
+        with self._pending_lock:
+            self._pending.append(row)
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self.flush()
+
+    def insert_notifications(self, notifications):
+        rows = [notification_row(**n) for n in notifications]
+        with self._pending_lock:
+            self._pending.extend(rows)
+            full = len(self._pending) >= self.batch_size
+        if full:
+            self.flush()
+
+    def flush(self):
+        # a single flusher at a time keeps batches in insertion order
+        with self._flush_lock:
+            with self._pending_lock:
+                rows, self._pending = self._pending, []
+            if not rows:
+                return 0
+            try:
+                with self.pool.connection() as conn:
+                    with conn.cursor() as cur:
+                        cur.executemany(_to_pyformat(INSERT_QUERY), rows)
+            except Exception:
+                with self._pending_lock:
+                    self._pending[:0] = rows
+                raise
+            logger.debug(f"flushed {len(rows)} notifications to postgres")
+            return len(rows)
+
+    def prune_notifications(self, max_age_days=0, max_rows=0, batch_size=500, rollup=False, pause=0.05, **kwargs):
+        self.flush()
+        deleted = 0
+        if max_age_days:
+            cutoff = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(time.time() - max_age_days * 86400))
+            deleted += self._delete_in_batches("timestamp < %s", (cutoff,), batch_size, rollup, pause)
+
+        if max_rows:
+            rows = self._fetchall("SELECT id FROM notifications ORDER BY id DESC LIMIT 1 OFFSET ?", (max_rows,))
+            if rows:
+                deleted += self._delete_in_batches("id <= %s", (rows[0][0],), batch_size, rollup, pause)
+        # postgres reclaims space through autovacuum, so there is no explicit vacuum step here
+        return deleted
+
+    def close(self):
+        self._stop_event.set()
+        self._flusher.join(timeout=5)
+        try:
+            self.flush()
+        finally:
+            self.pool.close()
+
+    def _fetchall(self, query, params):
+        self.flush()
+        with self.pool.connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute(_to_pyformat(query), params)
+                return cur.fetchall()
+
+    def _delete_in_batches(self, condition, params, batch_size, rollup, pause):
+        deleted = 0
+        batch = f"SELECT id FROM notifications WHERE {condition} ORDER BY id LIMIT %s"
+        while True:
+            with self.pool.connection() as conn:
+                with conn.cursor() as cur:
+                    if rollup:
+                        cur.execute(
+                            f"""
+                            INSERT INTO notification_rollups (day, client, rule, count)
+                            SELECT LEFT(timestamp, 10), COALESCE(client, ''), COALESCE(matched_rule_name, ''), COUNT(*)
+                            FROM notifications
+                            WHERE id IN ({batch})
+                            GROUP BY 1, 2, 3
+                            ON CONFLICT (day, client, rule)
+                                DO UPDATE SET count = notification_rollups.count + EXCLUDED.count
+                            """,
+                            (*params, batch_size),
+                        )
+                    cur.execute(f"DELETE FROM notifications WHERE id IN ({batch})", (*params, batch_size))
+                    count = cur.rowcount
+            if not count:
+                return deleted
+            deleted += count
+            if pause:
+                time.sleep(pause)
+
+    def _run_flusher(self):
+        while not self._stop_event.wait(self.flush_interval_seconds):
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"failed to flush notifications to postgres: {e}")
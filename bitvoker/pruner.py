@@ -0,0 +1,64 @@
+import threading
+
+from typing import Any, Dict, Optional
+
+from bitvoker.config import get_config_snapshot
+from bitvoker.logger import setup_logger
+from bitvoker.database import prune_notifications, rebuild_for_incremental_vacuum
+
+
+logger = setup_logger(__name__)
+
+RETRY_INTERVAL_SECONDS = 300
+
+
+class Pruner:
+    def __init__(self):
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="notification-pruner", daemon=True)
+        self._thread.start()
+        logger.info("notification pruner started")
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def run_once(self, retention: Optional[Dict[str, Any]] = None) -> int:
+        retention = retention or get_config_snapshot().get_retention_config()
+        if not retention["enabled"]:
+            logger.debug("notification retention disabled, skipping prune")
+            return 0
+        if not retention["max_age_days"] and not retention["max_rows"]:
+            logger.debug("no retention limits configured, skipping prune")
+            return 0
+        if retention["vacuum_rebuild"]:
+            # a no-op once the database uses incremental auto-vacuum
+            rebuild_for_incremental_vacuum()
+
+        deleted = prune_notifications(
+            max_age_days=retention["max_age_days"],
+            max_rows=retention["max_rows"],
+            batch_size=retention["batch_size"],
+            rollup=retention["rollup"],
+        )
+        if deleted:
+            logger.info(f"pruned {deleted} notifications (rollup: {retention['rollup']})")
+        return deleted
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            interval = RETRY_INTERVAL_SECONDS
+            try:
+                retention = get_config_snapshot().get_retention_config()
+                interval = retention["interval_seconds"]
+                self.run_once(retention)
+            except Exception as e:
+                logger.error(f"failed to prune notifications: {e}")
+            self._stop_event.wait(interval)
@@ -0,0 +1,87 @@
+import math
+import time
+
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from fastapi.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from bitvoker import metrics
+from bitvoker.config import get_config_snapshot
+from bitvoker.logger import setup_logger
+
+
+logger = setup_logger(__name__)
+
+RATE_LIMIT_MAX_CLIENTS = 10000
+LOGIN_PATH = "/api/auth/login"
+INGEST_PATH = "/api/ingest"
+
+
+class TokenBuckets:
+    def __init__(self, max_clients: int = RATE_LIMIT_MAX_CLIENTS):
+        self.max_clients = max_clients
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+
+    def take(self, key: str, rate: float, burst: float, now: Optional[float] = None) -> float:
+        # returns 0 if the request may go ahead, otherwise the seconds until the bucket has a token again
+        now = time.monotonic() if now is None else now
+        tokens, updated = self._buckets.pop(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated) * rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / rate
+        # least recently seen clients go first once the table is full, they are the ones with a refilled bucket
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_clients:
+            self._buckets.popitem(last=False)
+        return wait
+
+    def clear(self) -> None:
+        self._buckets.clear()
+
+
+rate_limits = TokenBuckets()
+
+
+class RateLimitMiddleware:
+    def __init__(self, app: ASGIApp, buckets: Optional[TokenBuckets] = None) -> None:
+        self.app = app
+        self.buckets = buckets if buckets is not None else rate_limits
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        path = scope.get("path", "")
+        if scope["type"] != "http" or not path.startswith("/api/"):
+            await self.app(scope, receive, send)
+            return
+
+        config = get_config_snapshot().rate_limit_config
+        if not config["enabled"]:
+            await self.app(scope, receive, send)
+            return
+
+        client = scope["client"][0] if scope.get("client") else ""
+        if path == LOGIN_PATH:
+            bucket = "login"
+            attempts = config["login_attempts_per_minute"]
+            wait = self.buckets.take(f"login:{client}", attempts / 60, attempts)
+        elif path == INGEST_PATH:
+            # log shippers legitimately send far more than a browser, so they get a bucket of their own
+            bucket = "ingest"
+            wait = self.buckets.take(f"ingest:{client}", config["ingest_requests_per_second"], config["ingest_burst"])
+        else:
+            bucket = "api"
+            wait = self.buckets.take(client, config["requests_per_second"], config["burst"])
+
+        if wait:
+            metrics.rate_limited.inc(bucket)
+            logger.debug(f"rate limited {bucket} request from {client} to {path}")
+            response = JSONResponse(
+                content={"error": "too many requests"}, status_code=429, headers={"Retry-After": str(math.ceil(wait))}
+            )
+            await response(scope, receive, send)
+            return
+        await self.app(scope, receive, send)
@@ -1,68 +1,57 @@
+import time
+
 from typing import Optional, Any
 
-from bitvoker.config import Config
-from bitvoker.matcher import Match
-from bitvoker.notifier import Notifier
+from bitvoker.config import get_config_snapshot
 from bitvoker.logger import setup_logger
+from bitvoker.pipeline import pipeline
+from bitvoker.tracing import slow_traces
 
 
 logger = setup_logger(__name__)
 
+COMPONENT_TYPES = ["ai", "destinations", "rules"]
 
-def refresh_components(app: Any, component_types: Optional[list] = None) -> None:
-    logger.info(f"refreshing components: {component_types or 'all'}")
+# config sections whose changes require rebuilding a component, anything else only swaps the snapshot
+CONFIG_SECTION_COMPONENTS = {
+    "ai": "ai",
+    "destinations": "destinations",
+    "rules": "rules",
+    "matching": "rules",
+}
 
-    try:
-        config = Config()
-        config.get_default_rule()
-        if component_types is None or "servers" in component_types:
-            for server_type in ["secure_tcp_server", "plain_tcp_server"]:
-                if hasattr(app.state, server_type):
-                    try:
-                        _refresh_server_components(getattr(app.state, server_type), app, config)
-                    except Exception as e:
-                        logger.error(f"failed to refresh {server_type}: {str(e)}")
 
-            updated_servers = {}
-            for server_type in ["secure_tcp_server", "plain_tcp_server"]:
-                if hasattr(app.state, server_type):
-                    updated_servers[server_type.split("_")[0]] = getattr(app.state, server_type)
-                else:
-                    updated_servers[server_type.split("_")[0]] = None
-            app.state.tcp_servers = updated_servers
-    except Exception as e:
-        logger.error(f"failed to refresh components: {str(e)}")
+def changed_components(changed_sections: list) -> list:
+    return sorted({CONFIG_SECTION_COMPONENTS[s] for s in changed_sections if s in CONFIG_SECTION_COMPONENTS})
 
 
-def _refresh_server_components(server: Any, app: Any, config: Optional[Config] = None) -> Any:
-    if server is None:
-        logger.warning("cannot refresh server: server is None")
-        return None
+def refresh_components(app: Any, component_types: Optional[list] = None) -> None:
+    logger.info(f"refreshing components: {component_types if component_types is not None else 'all'}")
+    started = time.perf_counter()
 
     try:
-        if config is None:
-            config = Config()
-
-        server.config = config
-        try:
-            destinations = config.get_enabled_destinations()
-            if hasattr(server, "notifier") and server.notifier is not None:
-                logger.debug("updating existing notifier with new destinations")
-                server.notifier.update_destinations(destinations)
+        config = get_config_snapshot()
+        config.get_default_rule()
+        if component_types is None or "servers" in component_types:
+            components = set(COMPONENT_TYPES)
+        else:
+            components = set(component_types)
+
+        # every listener reads the same shared context, so the cost of a refresh does not grow with listeners
+        pipeline.refresh(config, components)
+        app.state.pipeline = pipeline
+        slow_traces.resize(config.tracing_config["ring_size"])
+
+        updated_servers = {}
+        for server_type in ["secure_tcp_server", "plain_tcp_server"]:
+            if hasattr(app.state, server_type):
+                updated_servers[server_type.split("_")[0]] = getattr(app.state, server_type)
             else:
-                logger.info("creating new notifier")
-                server.notifier = Notifier(destinations)
-        except Exception as e:
-            logger.error(f"failed to update notifier: {str(e)}")
-            server.notifier = Notifier([])
-
-        try:
-            server.match = Match(config)
-            logger.debug("match system updated")
-        except Exception as e:
-            logger.error(f"failed to update match system: {str(e)}")
-
-        return server
+                updated_servers[server_type.split("_")[0]] = None
+        app.state.tcp_servers = updated_servers
+        logger.info(
+            f"components refreshed to configuration version {config.version} in"
+            f" {(time.perf_counter() - started) * 1000:.1f} ms"
+        )
     except Exception as e:
-        logger.error(f"failed to refresh server components: {str(e)}")
-        return server
+        logger.error(f"failed to refresh components: {str(e)}")
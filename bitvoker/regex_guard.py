@@ -0,0 +1,102 @@
+from typing import Any, Dict, List, Optional
+
+import regex
+
+# the parser behind the re module is private and has moved before, without it patterns are only guarded by the
+# evaluation timeout
+try:
+    import re._parser as sre_parse  # type: ignore[import]
+except ImportError:
+    try:
+        import sre_parse  # type: ignore[no-redef]
+    except ImportError:
+        sre_parse = None  # type: ignore[assignment]
+
+
+FLAGS = regex.DOTALL | regex.IGNORECASE | regex.VERSION0
+
+_REPEATS = (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT) if sre_parse is not None else ()
+
+
+class UnsafePatternError(ValueError):
+    pass
+
+
+def rule_patterns(rule: Dict[str, Any]) -> List[str]:
+    notify_config = rule.get("notify", {})
+    sections = [rule.get("match", {}), notify_config.get("send_og_text", {}), notify_config.get("send_ai_text", {})]
+    patterns = [
+        section.get(field)
+        for section in sections
+        if isinstance(section, dict)
+        for field in ["og_text_regex", "ai_text_regex"]
+        if section.get(field)
+    ]
+    field_patterns = rule.get("match", {}).get("fields") or {}
+    return patterns + [pattern for pattern in field_patterns.values() if pattern]
+
+
+def _unwrap(op, av):
+    # a group around a single item behaves like the item for backtracking purposes
+    while op is sre_parse.SUBPATTERN and len(av[-1]) == 1:
+        op, av = av[-1][0]
+    return op, av
+
+
+def _min_width(items) -> int:
+    return sre_parse.SubPattern(sre_parse.State(), list(items)).getwidth()[0] if items else 0
+
+
+def _has_nested_quantifier(items) -> bool:
+    for op, av in items:
+        if op in _REPEATS:
+            _, high, body = av
+            if high == sre_parse.MAXREPEAT:
+                inner = list(body)
+                if len(inner) == 1:
+                    inner_op, inner_av = _unwrap(*inner[0])
+                    inner = list(inner_av[-1]) if inner_op is sre_parse.SUBPATTERN else [(inner_op, inner_av)]
+                for index, item in enumerate(inner):
+                    inner_op, inner_av = _unwrap(*item)
+                    # (a+)+ or (\w+\s?)*: the inner repeat can split the same text in exponentially many ways
+                    if inner_op in _REPEATS and inner_av[1] == sre_parse.MAXREPEAT:
+                        if _min_width(inner[:index] + inner[index + 1 :]) == 0:
+                            return True
+            if _has_nested_quantifier(body):
+                return True
+        elif op is sre_parse.SUBPATTERN:
+            if _has_nested_quantifier(av[-1]):
+                return True
+        elif op is sre_parse.BRANCH:
+            if any(_has_nested_quantifier(branch) for branch in av[1]):
+                return True
+        elif op in (sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+            if _has_nested_quantifier(av[1]):
+                return True
+    return False
+
+
+def compile_pattern(pattern: str, check: bool = True):
+    try:
+        compiled = regex.compile(pattern, FLAGS)
+    except regex.error as e:
+        raise UnsafePatternError(f"invalid regex '{pattern}': {e}") from e
+    if check and sre_parse is not None:
+        try:
+            parsed = sre_parse.parse(pattern, sre_parse.SRE_FLAG_DOTALL | sre_parse.SRE_FLAG_IGNORECASE)
+        except sre_parse.error:
+            # syntax only the regex module understands, left to the evaluation timeout
+            return compiled
+        if _has_nested_quantifier(parsed):
+            raise UnsafePatternError(
+                f"regex '{pattern}' nests unbounded quantifiers and can backtrack catastrophically"
+            )
+    return compiled
+
+
+def pattern_problem(pattern: str) -> Optional[str]:
+    try:
+        compile_pattern(pattern)
+    except UnsafePatternError as e:
+        return str(e)
+    return None
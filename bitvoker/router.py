@@ -1,19 +1,31 @@
+import hmac
 import time
+import asyncio
 import logging
+import threading
 
-from typing import Dict, List, Optional
-from pathlib import Path
+from collections import deque
 
-from fastapi.responses import JSONResponse, FileResponse
-from fastapi import APIRouter, HTTPException, Query, Request
+from typing import Any, Deque, Dict, List, Optional
+
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from fastapi import APIRouter, Header, HTTPException, Query, Request
 from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
 
+from bitvoker import metrics
+from bitvoker.backtest import run_backtest
 from bitvoker.auth import is_auth_enabled, verify_credentials, create_token, verify_token
-from bitvoker.config import Config
+from bitvoker.config import Config, diff_config, get_config_data, get_config_snapshot
 from bitvoker.logger import setup_logger
-from bitvoker.constants import REACT_BUILD_DIR
-from bitvoker.database import get_notifications
-from bitvoker.refresher import refresh_components
+from bitvoker.events import format_sse, log_events, notification_events
+from bitvoker.database import get_notification, get_notifications, get_notification_rollups
+from bitvoker.refresher import changed_components, refresh_components
+from bitvoker.ingest import INGEST_MAX_BATCH, INGEST_MAX_BODY_BYTES, check_ingest_token, ingest_messages, parse_messages
+from bitvoker.ingest_queue import ingest_queue
+from bitvoker.tracing import slow_traces
+from bitvoker.static import static_index
+from bitvoker.pipeline import pipeline
 
 
 logger = setup_logger(__name__)
@@ -21,16 +33,35 @@ logger = setup_logger(__name__)
 
 api_router = APIRouter()
 
+STREAM_KEEPALIVE_SECONDS = 15
+STREAM_BATCH_LIMIT = 1000
+
+_config_update_lock = threading.Lock()
+_backtest_lock = threading.Lock()
+
 
 class LoginRequest(BaseModel):
     username: str
     password: str
 
 
-def _check_auth(request: Request):
+class BacktestRequest(BaseModel):
+    config: Optional[Dict[str, Any]] = None
+    start_date: str = ""
+    end_date: str = ""
+    after_id: int = 0
+    max_rows: int = 0
+    samples: int = 5
+    timeout_seconds: float = 30
+
+
+def _check_auth(request: Request, allow_query_token: bool = False):
     if not is_auth_enabled():
         return
     token = request.headers.get("authorization", "").removeprefix("Bearer ")
+    # EventSource cannot send headers, so only the live feeds take the token as a query parameter instead
+    if not token and allow_query_token:
+        token = request.query_params.get("token", "")
     if not verify_token(token):
         raise HTTPException(status_code=401, detail="unauthorized")
 
@@ -50,14 +81,23 @@ async def login(data: LoginRequest):
     raise HTTPException(status_code=401, detail="invalid credentials")
 
 
+def _apply_config(app, new_config: Dict[str, Any]) -> bool:
+    # concurrent saves would otherwise interleave their file writes and component refreshes
+    with _config_update_lock:
+        previous = get_config_snapshot()
+        config = Config(config_data=previous.config_data)
+        if not config.update_config(new_config):
+            return False
+        refresh_components(app, changed_components(diff_config(previous.config_data, config.config_data)))
+        return True
+
+
 @api_router.post("/api/config")
 async def update_config(request: Request):
     _check_auth(request)
     try:
         form_data = await request.json()
-        config_obj = Config()
-        if config_obj.update_config(form_data):
-            refresh_components(request.app)
+        if await run_in_threadpool(_apply_config, request.app, form_data):
             return {"success": True}
         else:
             return JSONResponse(content={"error": "Invalid configuration format"}, status_code=400)
@@ -70,77 +110,361 @@ async def update_config(request: Request):
 async def get_config(request: Request):
     _check_auth(request)
     try:
-        config_obj = Config()
-        config_obj.get_default_rule()
-        return config_obj.config_data
+        # served from the in-memory snapshot, only the very first request has to read the file
+        return await run_in_threadpool(get_config_data)
     except Exception as e:
         logger.error(f"failed to retrieve configuration: {e}")
         return JSONResponse(content={"error": f"failed to retrieve config: {str(e)}"}, status_code=500)
 
 
+async def _read_body(request: Request, max_bytes: int) -> Optional[bytes]:
+    # stops reading as soon as the body is too large instead of buffering whatever the client sends
+    declared = request.headers.get("content-length", "")
+    if declared.isdigit() and int(declared) > max_bytes:
+        return None
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > max_bytes:
+            return None
+    return bytes(body)
+
+
+@api_router.post("/api/ingest")
+async def ingest(request: Request, x_message_token: Optional[str] = Header(None)):
+    token_verified = check_ingest_token(x_message_token)
+    if token_verified is False:
+        raise HTTPException(status_code=401, detail="invalid message token")
+
+    body = await _read_body(request, INGEST_MAX_BODY_BYTES)
+    if body is None:
+        return JSONResponse(content={"error": f"body exceeds {INGEST_MAX_BODY_BYTES} bytes"}, status_code=413)
+    try:
+        messages = parse_messages(body, request.headers.get("content-type", ""))
+    except ValueError as e:
+        return JSONResponse(content={"error": str(e)}, status_code=400)
+    if not messages:
+        return JSONResponse(content={"error": "no messages in request"}, status_code=400)
+    if len(messages) > INGEST_MAX_BATCH:
+        return JSONResponse(content={"error": f"batch exceeds {INGEST_MAX_BATCH} messages"}, status_code=413)
+
+    client_ip = request.client.host if request.client else ""
+    results = await run_in_threadpool(ingest_messages, messages, client_ip, bool(token_verified))
+    return {"results": results}
+
+
+@api_router.get("/metrics")
+def get_metrics(request: Request):
+    # login tokens expire and do not survive a restart, so a scraper can use a fixed token from the config instead
+    scrape_token = get_config_snapshot().metrics_config["scrape_token"]
+    token = request.headers.get("authorization", "").removeprefix("Bearer ")
+    if not (scrape_token and hmac.compare_digest(token.encode(), scrape_token.encode())):
+        _check_auth(request)
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+@api_router.get("/api/rules/stats")
+def get_rule_stats(request: Request):
+    _check_auth(request)
+    context = pipeline.current()
+    rules = context.match.rule_stats() if context is not None else []
+    # the rules that cost the most regex time overall come first
+    rules.sort(key=lambda r: r["regex_ms_total"], reverse=True)
+    return {"rules": rules}
+
+
+@api_router.post("/api/rules/stats/reset")
+def reset_rule_stats(request: Request):
+    _check_auth(request)
+    context = pipeline.current()
+    if context is not None:
+        context.match.reset_rule_stats()
+    return {"status": "reset"}
+
+
+@api_router.post("/api/rules/{rule_name}/enable")
+def enable_rule(request: Request, rule_name: str):
+    _check_auth(request)
+    context = pipeline.current()
+    if context is None or not context.match.enable_rule(rule_name):
+        raise HTTPException(status_code=404, detail="no disabled rule with that name")
+    return {"status": "enabled"}
+
+
+@api_router.post("/api/rules/backtest")
+def backtest_rules(request: Request, data: BacktestRequest):
+    _check_auth(request)
+    # without a candidate the current rules are replayed, which shows what they would match today
+    config_data = data.config if data.config is not None else get_config_data()
+    if not Config(config_data=config_data).validate_config(config_data):
+        return JSONResponse(content={"error": "Invalid configuration format"}, status_code=400)
+    # one replay at a time, each one reads the whole notification history
+    if not _backtest_lock.acquire(blocking=False):
+        return JSONResponse(content={"error": "a backtest is already running"}, status_code=409)
+    try:
+        return run_backtest(
+            config_data,
+            start_date=data.start_date,
+            end_date=data.end_date,
+            after_id=max(0, data.after_id),
+            max_rows=max(0, data.max_rows),
+            samples=max(0, data.samples),
+            timeout_seconds=data.timeout_seconds,
+        )
+    finally:
+        _backtest_lock.release()
+
+
+@api_router.get("/api/traces")
+def get_traces(request: Request, limit: int = Query(50, ge=1, le=1000), min_ms: float = Query(0, ge=0)):
+    _check_auth(request)
+    return {
+        "slow_threshold_ms": get_config_snapshot().get_tracing_config()["slow_threshold_ms"],
+        "traces": slow_traces.slowest(limit, min_ms),
+    }
+
+
+@api_router.get("/api/traces/{trace_id}")
+def get_trace(request: Request, trace_id: str):
+    _check_auth(request)
+    trace = slow_traces.get(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="trace not found")
+    return trace
+
+
+@api_router.get("/api/ingest/stats")
+def get_ingest_stats(request: Request):
+    _check_auth(request)
+    stats = {"queue": ingest_queue.stats()}
+    syslog_listener = getattr(request.app.state, "syslog_listener", None)
+    if syslog_listener is not None:
+        stats["syslog"] = syslog_listener.stats()
+    return stats
+
+
 @api_router.get("/api/notifications")
 def get_notifications_route(
     request: Request,
-    limit: int = Query(100, le=1000), start_date: Optional[str] = Query(None), end_date: Optional[str] = Query(None)
+    limit: int = Query(100, le=1000),
+    start_date: Optional[str] = Query(None),
+    end_date: Optional[str] = Query(None),
+    rule: Optional[str] = Query(None),
+    client: Optional[str] = Query(None),
+    status: Optional[str] = Query(None),
+    destination: Optional[str] = Query(None),
+    min_delivery_ms: Optional[float] = Query(None, ge=0),
+    preview: bool = Query(False),
 ):
     _check_auth(request)
     try:
-        notifs = get_notifications(limit, start_date or "", end_date or "")
+        notifs = get_notifications(
+            limit,
+            start_date or "",
+            end_date or "",
+            rule=rule or "",
+            client=client or "",
+            status=status or "",
+            destination=destination or "",
+            min_delivery_ms=min_delivery_ms,
+            preview=preview,
+        )
         return {"notifications": notifs}
     except Exception as e:
         logger.error(f"error retrieving notifications: {e}")
         return JSONResponse(content={"notifications": [], "error": str(e)}, status_code=500)
 
 
+@api_router.get("/api/notifications/rollups")
+def get_notification_rollups_route(
+    request: Request, start_date: Optional[str] = Query(None), end_date: Optional[str] = Query(None)
+):
+    _check_auth(request)
+    try:
+        rollups = get_notification_rollups(start_date or "", end_date or "")
+        return {"rollups": rollups}
+    except Exception as e:
+        logger.error(f"error retrieving notification rollups: {e}")
+        return JSONResponse(content={"rollups": [], "error": str(e)}, status_code=500)
+
+
+def _stream_cursor(request: Request, since: Optional[int]) -> Optional[int]:
+    last_event_id = request.headers.get("last-event-id", "")
+    if last_event_id.isdigit():
+        return int(last_event_id)
+    return since
+
+
+async def _notification_stream(request: Request, cursor: Optional[int]):
+    queue = notification_events.subscribe()
+    try:
+        if cursor is None:
+            latest = await run_in_threadpool(get_notifications, limit=1, preview=True)
+            cursor = latest[0]["id"] if latest else 0
+        while not await request.is_disconnected():
+            # drain everything after the cursor in batches before waiting for the next event
+            while True:
+                notifs = await run_in_threadpool(
+                    get_notifications, limit=STREAM_BATCH_LIMIT, preview=True, after_id=cursor
+                )
+                for notif in notifs:
+                    cursor = notif["id"]
+                    yield format_sse(notif, event="notification", event_id=cursor)
+                if len(notifs) < STREAM_BATCH_LIMIT:
+                    break
+            try:
+                await asyncio.wait_for(queue.get(), timeout=STREAM_KEEPALIVE_SECONDS)
+                while not queue.empty():
+                    queue.get_nowait()
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+    finally:
+        notification_events.unsubscribe(queue)
+
+
+@api_router.get("/api/notifications/stream")
+async def stream_notifications(request: Request, since: Optional[int] = Query(None, ge=0)):
+    _check_auth(request, allow_query_token=True)
+    return StreamingResponse(
+        _notification_stream(request, _stream_cursor(request, since)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@api_router.get("/api/notifications/{notification_id:int}")
+def get_notification_route(request: Request, notification_id: int):
+    _check_auth(request)
+    try:
+        notif = get_notification(notification_id)
+    except Exception as e:
+        logger.error(f"error retrieving notification {notification_id}: {e}")
+        return JSONResponse(content={"error": str(e)}, status_code=500)
+    if notif is None:
+        raise HTTPException(status_code=404, detail="notification not found")
+    return notif
+
+
 class MemoryLogHandler(logging.Handler):
     def __init__(self, max_entries: int = 1000):
         super().__init__()
-        self.log_entries: List[Dict[str, str]] = []
         self.max_entries = max_entries
+        self.log_entries: Deque[Dict[str, Any]] = deque(maxlen=max_entries)
+        self.level_entries: Dict[str, Deque[Dict[str, Any]]] = {}
+        self.last_seq = 0
+        self._entries_lock = threading.Lock()
 
     def emit(self, record):
-        entry = {
-            "timestamp": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(record.created)),
-            "level": record.levelname,
-            "message": record.getMessage(),
-        }
-        self.log_entries.append(entry)
-        if len(self.log_entries) > self.max_entries:
-            self.log_entries.pop(0)
-
-    def get_logs(self):
-        return self.log_entries
+        with self._entries_lock:
+            self.last_seq += 1
+            entry = {
+                "seq": self.last_seq,
+                "timestamp": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(record.created)),
+                "level": record.levelname,
+                "message": record.getMessage(),
+            }
+            self.log_entries.append(entry)
+            level_entries = self.level_entries.get(record.levelname)
+            if level_entries is None:
+                level_entries = self.level_entries[record.levelname] = deque(maxlen=self.max_entries)
+            level_entries.append(entry)
+        log_events.publish(entry)
+
+    def get_logs(
+        self, since: int = 0, level: Optional[str] = None, limit: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        with self._entries_lock:
+            entries = self.log_entries if level is None else self.level_entries.get(level, deque())
+            # a level index can still hold entries that already rotated out of the main buffer
+            oldest_seq = self.last_seq - len(self.log_entries)
+            cursor = max(since, oldest_seq)
+            logs: List[Dict[str, Any]] = []
+            # walking back from the newest entry only touches the lines the caller has not seen yet
+            for entry in reversed(entries):
+                if entry["seq"] <= cursor:
+                    break
+                logs.append(entry)
+        logs.reverse()
+        if limit:
+            # a caller reading on from a cursor gets the oldest lines it has not seen, a snapshot gets the newest
+            logs = logs[:limit] if since else logs[-limit:]
+        return logs
 
 
 memory_log_handler = MemoryLogHandler()
 logging.getLogger().addHandler(memory_log_handler)
 
 
+def _level_filter(level: Optional[str]) -> Optional[str]:
+    if level and level.upper() != "ALL":
+        return level.upper()
+    return None
+
+
 @api_router.get("/api/logs")
-def get_logs(request: Request, level: Optional[str] = Query(None)):
+def get_logs(
+    request: Request,
+    level: Optional[str] = Query(None),
+    since: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1),
+):
     _check_auth(request)
-    logs = memory_log_handler.get_logs()
-    if level and level.upper() != "ALL":
-        logs = [log for log in logs if log["level"] == level.upper()]
-    return {"logs": logs}
+    last_seq = memory_log_handler.last_seq
+    logs = memory_log_handler.get_logs(since=since, level=_level_filter(level), limit=limit)
+    if since and limit and len(logs) == limit:
+        # more lines may be waiting, the next poll has to pick up right after the last one returned here
+        return {"logs": logs, "last_seq": logs[-1]["seq"]}
+    return {"logs": logs, "last_seq": max(last_seq, logs[-1]["seq"] if logs else 0)}
+
+
+async def _log_stream(request: Request, cursor: Optional[int], level: Optional[str]):
+    queue = log_events.subscribe()
+    try:
+        seq = memory_log_handler.last_seq if cursor is None else cursor
+        while not await request.is_disconnected():
+            # events only wake the stream up, the lines are read from the ring buffer, so a slow client whose
+            # queue overflowed still gets every line that has not rotated out yet
+            for entry in memory_log_handler.get_logs(seq, level):
+                seq = entry["seq"]
+                yield format_sse(entry, event="log", event_id=seq)
+            try:
+                await asyncio.wait_for(queue.get(), timeout=STREAM_KEEPALIVE_SECONDS)
+                while not queue.empty():
+                    queue.get_nowait()
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+    finally:
+        log_events.unsubscribe(queue)
+
+
+@api_router.get("/api/logs/stream")
+async def stream_logs(request: Request, since: Optional[int] = Query(None, ge=0), level: Optional[str] = Query(None)):
+    _check_auth(request, allow_query_token=True)
+    return StreamingResponse(
+        _log_stream(request, _stream_cursor(request, since), _level_filter(level)),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _static_response(request: Request, asset):
+    return asset.response(request.headers.get("accept-encoding", ""), request.headers.get("if-none-match", ""))
 
 
 @api_router.get("/")
-async def serve_index():
-    index_path = Path(REACT_BUILD_DIR) / "index.html"
-    if index_path.exists():
-        return FileResponse(str(index_path))
+async def serve_index(request: Request):
+    index = static_index.get("index.html")
+    if index is not None:
+        return _static_response(request, index)
     return JSONResponse(content={"error": "frontend not built"}, status_code=404)
 
 
 @api_router.get("/{full_path:path}")
-async def serve_react(full_path: str):
+async def serve_react(request: Request, full_path: str):
     if full_path.startswith("api/"):
         raise HTTPException(status_code=404)
-    requested_path = Path(REACT_BUILD_DIR) / full_path
-    if requested_path.exists() and requested_path.is_file():
-        return FileResponse(str(requested_path))
-    index_path = Path(REACT_BUILD_DIR) / "index.html"
-    if index_path.exists():
-        return FileResponse(str(index_path))
+    # served from memory, only files that were in the build at startup can ever be returned
+    asset = static_index.get(full_path) or static_index.get("index.html")
+    if asset is not None:
+        return _static_response(request, asset)
     return JSONResponse(content={"error": "resource not found"}, status_code=404)
@@ -8,9 +8,16 @@ import bitvoker.constants as constants
 
 from bitvoker.api import app
 from bitvoker.handler import Handler
+from bitvoker.ingest_queue import ingest_queue
+from bitvoker.pruner import Pruner
+from bitvoker.config import get_config_snapshot
+from bitvoker.syslog_server import SyslogListener
+from bitvoker.watcher import ConfigWatcher
 from bitvoker.logger import setup_logger
+from bitvoker.database import init_db, close_storage
 from bitvoker.utils import generate_ssl_cert
 from bitvoker.refresher import refresh_components
+from bitvoker.static import static_index
 
 
 logger = setup_logger(__name__)
@@ -20,6 +27,7 @@ def run_plain_tcp_server():
     socketserver.TCPServer.allow_reuse_address = True
     with socketserver.ThreadingTCPServer((constants.SERVER_HOST, constants.PLAIN_TCP_SERVER_PORT), Handler) as server:
         server.app = app
+        server.ingest_queue = ingest_queue
         app.state.plain_tcp_server = server
         logger.info(
             f"plain tcp server listening on {constants.SERVER_HOST}:{constants.PLAIN_TCP_SERVER_PORT} ... e.g., echo"
@@ -34,6 +42,7 @@ def run_secure_tcp_server():
     ssl_context.load_cert_chain(certfile=constants.CERT_PATH, keyfile=constants.KEY_PATH)
     with socketserver.ThreadingTCPServer((constants.SERVER_HOST, constants.SECURE_TCP_SERVER_PORT), Handler) as server:
         server.app = app
+        server.ingest_queue = ingest_queue
         app.state.secure_tcp_server = server
         server.socket = ssl_context.wrap_socket(server.socket, server_side=True)
         logger.info(
@@ -66,6 +75,19 @@ async def start_https_server():
 
 async def async_main():
     generate_ssl_cert()
+    init_db()
+    static_index.load()
+
+    # queue sizing is read once at startup, changing it needs a restart
+    ingest_config = get_config_snapshot().get_ingest_config()
+    ingest_queue.configure(
+        ingest_config["queue_size"],
+        ingest_config["workers"],
+        ingest_config["policy"],
+        ingest_config["block_timeout_seconds"],
+    )
+    ingest_queue.start()
+    app.state.ingest_queue = ingest_queue
 
     logger.info("starting tcp servers in background threads...")
     threading.Thread(target=run_plain_tcp_server, daemon=True).start()
@@ -74,6 +96,16 @@ async def async_main():
     await asyncio.sleep(1)
     refresh_components(app)
 
+    app.state.pruner = Pruner()
+    app.state.pruner.start()
+
+    app.state.config_watcher = ConfigWatcher(app)
+    app.state.config_watcher.start()
+
+    if get_config_snapshot().get_syslog_config()["enabled"]:
+        app.state.syslog_listener = SyslogListener()
+        await app.state.syslog_listener.start(constants.SERVER_HOST, constants.SYSLOG_PORT)
+
     logger.info("starting web servers...")
     await asyncio.gather(
         start_http_server(),
@@ -86,6 +118,8 @@ def main():
         asyncio.run(async_main())
     except KeyboardInterrupt:
         logger.info("application shutting down.")
+    finally:
+        close_storage()
 
 
 if __name__ == "__main__":
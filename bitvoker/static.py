@@ -0,0 +1,136 @@
+import re
+import gzip
+import hashlib
+import mimetypes
+
+from pathlib import Path
+from typing import Dict, Optional
+
+from fastapi.responses import Response
+
+from bitvoker.logger import setup_logger
+from bitvoker.constants import REACT_BUILD_DIR
+
+try:
+    import brotli  # type: ignore[import]
+except ImportError:
+    brotli = None
+
+
+logger = setup_logger(__name__)
+
+COMPRESS_MIN_BYTES = 1024
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml", "application/manifest")
+# the build puts a content hash in every file under static/, e.g. main.3f2a9c1b.js, so those never change in place
+HASHED_NAME = re.compile(r"\.[0-9a-f]{8,}\.(?:chunk\.)?[a-z0-9]+(?:\.map)?$")
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE = "no-cache"
+
+
+class StaticAsset:
+    def __init__(self, name: str, body: bytes, gzipped: Optional[bytes] = None, brotlied: Optional[bytes] = None):
+        self.name = name
+        self.body = body
+        self.variants = {"br": brotlied, "gzip": gzipped}
+        self.content_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        self.etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+        self.cache_control = IMMUTABLE_CACHE if HASHED_NAME.search(name) else REVALIDATE_CACHE
+
+    def response(self, accept_encoding: str = "", if_none_match: str = "") -> Response:
+        headers = {"Cache-Control": self.cache_control, "Vary": "Accept-Encoding"}
+        accepted = _accepted_encodings(accept_encoding)
+        encoding = next((e for e, body in self.variants.items() if body is not None and e in accepted), None)
+        # each encoding is a different representation, so it gets its own etag
+        headers["ETag"] = f'{self.etag[:-1]}-{encoding}"' if encoding else self.etag
+        if if_none_match and _etag_matches(if_none_match, self.etag):
+            return Response(status_code=304, headers=headers)
+        if encoding:
+            headers["Content-Encoding"] = encoding
+            return Response(self.variants[encoding], media_type=self.content_type, headers=headers)
+        return Response(self.body, media_type=self.content_type, headers=headers)
+
+
+def _accepted_encodings(header: str) -> set:
+    accepted = set()
+    for item in header.split(","):
+        coding, *params = item.split(";")
+        quality = 1.0
+        for param in params:
+            key, _, value = param.strip().partition("=")
+            if key.lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    if header.strip() == "*":
+        return True
+    base = etag.strip('"')
+    for candidate in header.split(","):
+        candidate = candidate.strip().removeprefix("W/").strip('"')
+        if candidate == base or candidate.rsplit("-", 1)[0] == base:
+            return True
+    return False
+
+
+def _compressible(name: str, content_type: str, size: int) -> bool:
+    return size >= COMPRESS_MIN_BYTES and (content_type.startswith(COMPRESSIBLE_TYPES) or name.endswith(".map"))
+
+
+def _smaller(compressed: Optional[bytes], body: bytes) -> Optional[bytes]:
+    return compressed if compressed is not None and len(compressed) < len(body) else None
+
+
+def load_asset(path: Path, name: str) -> StaticAsset:
+    body = path.read_bytes()
+    gzipped = brotlied = None
+    # variants produced by the frontend build are used as they are, anything else is compressed once here
+    gz_path, br_path = path.with_name(path.name + ".gz"), path.with_name(path.name + ".br")
+    if gz_path.is_file():
+        gzipped = gz_path.read_bytes()
+    if br_path.is_file():
+        brotlied = br_path.read_bytes()
+    if _compressible(name, mimetypes.guess_type(name)[0] or "", len(body)):
+        if gzipped is None:
+            gzipped = _smaller(gzip.compress(body, compresslevel=9, mtime=0), body)
+        if brotlied is None and brotli is not None:
+            brotlied = _smaller(brotli.compress(body), body)
+    return StaticAsset(name, body, gzipped, brotlied)
+
+
+class StaticIndex:
+    def __init__(self, build_dir):
+        self.build_dir = Path(build_dir)
+        self._assets: Optional[Dict[str, StaticAsset]] = None
+
+    def load(self) -> Dict[str, StaticAsset]:
+        assets = {}
+        if self.build_dir.is_dir():
+            for path in sorted(self.build_dir.rglob("*")):
+                if not path.is_file() or (path.suffix in (".gz", ".br") and path.with_suffix("").is_file()):
+                    continue
+                name = path.relative_to(self.build_dir).as_posix()
+                assets[name] = load_asset(path, name)
+        total = sum(len(asset.body) for asset in assets.values())
+        logger.info(f"indexed {len(assets)} frontend files ({total / 1024:.0f} KiB) from {self.build_dir}")
+        # swapped in whole, requests never see a half built index
+        self._assets = assets
+        return assets
+
+    @property
+    def assets(self) -> Dict[str, StaticAsset]:
+        # built once, normally at startup; a rebuilt frontend is picked up on the next restart
+        if self._assets is None:
+            return self.load()
+        return self._assets
+
+    def get(self, name: str) -> Optional[StaticAsset]:
+        return self.assets.get(name)
+
+
+static_index = StaticIndex(REACT_BUILD_DIR)
@@ -0,0 +1,245 @@
+import re
+import socket
+import asyncio
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from bitvoker import metrics
+from bitvoker.logger import setup_logger
+from bitvoker.pipeline import pipeline
+from bitvoker.handler import process_message
+from bitvoker.database import insert_notification
+
+
+logger = setup_logger(__name__)
+
+SYSLOG_QUEUE_SIZE = 1000
+SYSLOG_WORKERS = 4
+SYSLOG_MAX_MESSAGE_BYTES = 8192
+SYSLOG_RECEIVE_BUFFER_BYTES = 1024 * 1024
+DROP_LOG_INTERVAL = 100
+
+# fmt: off
+FACILITIES = [
+    "kern", "user", "mail", "daemon", "auth", "syslog", "lpr", "news", "uucp", "cron", "authpriv", "ftp",
+    "ntp", "security", "console", "solaris-cron", "local0", "local1", "local2", "local3", "local4", "local5",
+    "local6", "local7",
+]
+# fmt: on
+SEVERITIES = ["emergency", "alert", "critical", "error", "warning", "notice", "info", "debug"]
+
+PRI_PATTERN = re.compile(r"^<(?P<pri>\d{1,3})>")
+RFC5424_PATTERN = re.compile(
+    r"^(?P<version>\d{1,2}) (?P<timestamp>\S+) (?P<hostname>\S+) (?P<app_name>\S+) (?P<procid>\S+) (?P<msgid>\S+)"
+    r" ?(?P<rest>.*)$",
+    re.DOTALL,
+)
+RFC3164_PATTERN = re.compile(
+    r"^(?P<timestamp>[A-Z][a-z]{2} [ \d]\d \d{2}:\d{2}:\d{2}) (?P<hostname>\S+)"
+    r" (?:(?P<app_name>[^:\[\s]+)(?:\[(?P<procid>[^\]]*)\])?: ?)?(?P<message>.*)$",
+    re.DOTALL,
+)
+
+
+def _nil(value: Optional[str]) -> str:
+    return "" if value is None or value == "-" else value
+
+
+def _split_structured_data(rest: str):
+    if rest.startswith("-"):
+        return "", rest[1:].lstrip(" ")
+    if not rest.startswith("["):
+        return "", rest
+    # sd-elements may contain escaped brackets inside quoted values, so this walks the string instead of using a regex
+    in_quotes = False
+    depth = 0
+    index = 0
+    while index < len(rest):
+        char = rest[index]
+        if char == "\\":
+            index += 2
+            continue
+        if char == '"':
+            in_quotes = not in_quotes
+        elif not in_quotes and char == "[":
+            depth += 1
+        elif not in_quotes and char == "]":
+            depth -= 1
+            if depth == 0 and (index + 1 == len(rest) or rest[index + 1] != "["):
+                return rest[: index + 1], rest[index + 1 :].lstrip(" ")
+        index += 1
+    return rest, ""
+
+
+def parse_syslog(text: str) -> Optional[Dict[str, str]]:
+    pri_match = PRI_PATTERN.match(text)
+    if not pri_match or int(pri_match.group("pri")) > 191:
+        return None
+
+    pri = int(pri_match.group("pri"))
+    fields = {
+        "format": "",
+        "facility": FACILITIES[pri // 8],
+        "severity": SEVERITIES[pri % 8],
+        "timestamp": "",
+        "hostname": "",
+        "app_name": "",
+        "procid": "",
+        "msgid": "",
+        "message": "",
+    }
+    rest = text[pri_match.end() :]
+
+    rfc5424 = RFC5424_PATTERN.match(rest)
+    if rfc5424:
+        structured_data, message = _split_structured_data(rfc5424.group("rest"))
+        fields.update(
+            format="rfc5424",
+            timestamp=_nil(rfc5424.group("timestamp")),
+            hostname=_nil(rfc5424.group("hostname")),
+            app_name=_nil(rfc5424.group("app_name")),
+            procid=_nil(rfc5424.group("procid")),
+            msgid=_nil(rfc5424.group("msgid")),
+            message=message.removeprefix("\ufeff"),
+        )
+        if structured_data:
+            fields["structured_data"] = structured_data
+        return fields
+
+    rfc3164 = RFC3164_PATTERN.match(rest)
+    if rfc3164:
+        fields.update(
+            format="rfc3164",
+            timestamp=rfc3164.group("timestamp"),
+            hostname=rfc3164.group("hostname"),
+            app_name=rfc3164.group("app_name") or "",
+            procid=rfc3164.group("procid") or "",
+            message=rfc3164.group("message"),
+        )
+        return fields
+
+    fields.update(format="pri", message=rest)
+    return fields
+
+
+def process_syslog_message(message: str, client_ip: str) -> Dict[str, Any]:
+    context = pipeline.current()
+    record = process_message(message, client_ip, context, fields=parse_syslog(message))
+    insert_notification(**record)
+    return record
+
+
+class _SyslogDatagramProtocol(asyncio.DatagramProtocol):
+    def __init__(self, listener: "SyslogListener"):
+        self.listener = listener
+
+    def datagram_received(self, data, addr):
+        self.listener.submit(data, addr[0])
+
+
+class SyslogListener:
+    def __init__(self, queue_size: int = SYSLOG_QUEUE_SIZE, workers: int = SYSLOG_WORKERS):
+        self.queue_size = queue_size
+        self.workers = workers
+        self.received = 0
+        self.dropped = 0
+        # created by start(), on the loop that serves the listener
+        self.queue: Optional["asyncio.Queue[Tuple[str, str]]"] = None
+        self._transport: Optional[asyncio.DatagramTransport] = None
+        self._tcp_server: Optional[asyncio.Server] = None
+        self._tasks: List["asyncio.Task[None]"] = []
+
+    async def start(self, host: str, port: int) -> None:
+        loop = asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        transport, _ = await loop.create_datagram_endpoint(
+            lambda: _SyslogDatagramProtocol(self), local_addr=(host, port)
+        )
+        self._transport = transport
+        sock = transport.get_extra_info("socket")
+        if sock is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, SYSLOG_RECEIVE_BUFFER_BYTES)
+        self._tcp_server = await asyncio.start_server(self._handle_stream, host, port, limit=SYSLOG_MAX_MESSAGE_BYTES)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        logger.info(f"syslog listener on udp and tcp {host}:{port} ... e.g., logger -n {host} -P {port} -d 'message'")
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        if self._transport is not None:
+            self._transport.close()
+        if self._tcp_server is not None:
+            self._tcp_server.close()
+            await self._tcp_server.wait_closed()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "received": self.received,
+            "dropped": self.dropped,
+            "queue_depth": self.queue.qsize() if self.queue is not None else 0,
+            "queue_size": self.queue_size,
+        }
+
+    def _started_queue(self) -> "asyncio.Queue[Tuple[str, str]]":
+        if self.queue is None:
+            raise RuntimeError("syslog listener is not started, call start() first")
+        return self.queue
+
+    def submit(self, data: bytes, client_ip: str) -> bool:
+        queue = self._started_queue()
+        message = data[:SYSLOG_MAX_MESSAGE_BYTES].decode("utf-8", errors="replace").strip()
+        if not message:
+            return False
+        self.received += 1
+        metrics.messages_received.inc("syslog")
+        if queue.full():
+            self._drop(client_ip, "queue full")
+            return False
+        queue.put_nowait((message, client_ip))
+        return True
+
+    def _drop(self, client_ip: str, reason: str) -> None:
+        self.dropped += 1
+        if self.dropped % DROP_LOG_INTERVAL == 1:
+            logger.warning(f"syslog message from {client_ip} dropped: {reason} ({self.dropped} dropped so far)")
+
+    async def _handle_stream(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        client_ip = (writer.get_extra_info("peername") or ("",))[0]
+        try:
+            while True:
+                first = await reader.read(1)
+                if not first:
+                    break
+                if first.isdigit():
+                    # rfc 6587 octet counting: "<length> <message>"
+                    length_bytes = first + await reader.readuntil(b" ")
+                    length = int(length_bytes.strip())
+                    if length > SYSLOG_MAX_MESSAGE_BYTES:
+                        self._drop(client_ip, "message too large")
+                        break
+                    data = await reader.readexactly(length)
+                else:
+                    try:
+                        data = first + await reader.readuntil(b"\n")
+                    except asyncio.LimitOverrunError:
+                        self._drop(client_ip, "message too large")
+                        break
+                    except asyncio.IncompleteReadError as e:
+                        data = first + e.partial
+                self.submit(data, client_ip)
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError, ConnectionError) as e:
+            logger.debug(f"syslog connection from {client_ip} closed: {e}")
+        finally:
+            writer.close()
+
+    async def _worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        queue = self._started_queue()
+        while True:
+            message, client_ip = await queue.get()
+            try:
+                await loop.run_in_executor(None, process_syslog_message, message, client_ip)
+            except Exception as e:
+                logger.exception(f"error processing syslog message from {client_ip}: {e}")
+            finally:
+                queue.task_done()
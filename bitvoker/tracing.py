@@ -0,0 +1,118 @@
+import time
+import uuid
+import threading
+import contextvars
+
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, List, Optional
+
+from bitvoker.config import TRACING_DEFAULTS
+
+
+_current_trace: contextvars.ContextVar[Optional["Trace"]] = contextvars.ContextVar("trace", default=None)
+
+
+class Trace:
+    def __init__(self, client: str = "", trace_id: Optional[str] = None):
+        self.trace_id = trace_id or uuid.uuid4().hex[:16]
+        self.client = client
+        self.timestamp = time.time()
+        self.started = time.perf_counter()
+        self.duration_ms: Optional[float] = None
+        self.spans: List[Dict[str, Any]] = []
+        self.attributes: Dict[str, Any] = {}
+
+    def add_span(self, name: str, started: float, ended: float, **attributes) -> None:
+        span = {
+            "name": name,
+            "start_ms": round((started - self.started) * 1000, 3),
+            "duration_ms": round((ended - started) * 1000, 3),
+        }
+        if attributes:
+            span.update(attributes)
+        self.spans.append(span)
+
+    def finish(self, **attributes) -> "Trace":
+        self.attributes.update(attributes)
+        self.duration_ms = round((time.perf_counter() - self.started) * 1000, 3)
+        return self
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "client": self.client,
+            "timestamp": round(self.timestamp, 3),
+            "duration_ms": self.duration_ms,
+            **self.attributes,
+            "spans": list(self.spans),
+        }
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def activate(trace: Optional[Trace]):
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+def record_span(name: str, started: float, ended: float, **attributes) -> None:
+    # for code that already times itself, adds the span to the active trace if there is one
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add_span(name, started, ended, **attributes)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    # without an active trace this is a context var lookup and nothing else
+    trace = _current_trace.get()
+    if trace is None:
+        yield attributes
+        return
+    started = time.perf_counter()
+    try:
+        yield attributes
+    finally:
+        trace.add_span(name, started, time.perf_counter(), **attributes)
+
+
+class SlowTraceRing:
+    def __init__(self, size: int = TRACING_DEFAULTS["ring_size"]):
+        self._traces: Deque[Trace] = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def resize(self, size: int) -> None:
+        with self._lock:
+            if size != self._traces.maxlen:
+                self._traces = deque(self._traces, maxlen=size)
+
+    def record(self, trace: Trace) -> None:
+        with self._lock:
+            self._traces.append(trace)
+
+    def slowest(self, limit: int = 50, min_duration_ms: float = 0) -> List[Dict[str, Any]]:
+        with self._lock:
+            traces = [t for t in self._traces if (t.duration_ms or 0) >= min_duration_ms]
+        traces.sort(key=lambda t: t.duration_ms or 0, reverse=True)
+        return [t.to_dict() for t in traces[:limit]]
+
+    def get(self, trace_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            for trace in self._traces:
+                if trace.trace_id == trace_id:
+                    return trace.to_dict()
+        return None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._traces.clear()
+
+
+slow_traces = SlowTraceRing()
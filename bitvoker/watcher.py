@@ -0,0 +1,94 @@
+import os
+import time
+import yaml
+import threading
+
+from typing import Any, List, Optional
+
+from bitvoker.logger import setup_logger
+from bitvoker.constants import CONFIG_FILENAME
+from bitvoker.config import Config, diff_config, get_config_snapshot, publish_config_snapshot
+from bitvoker.refresher import changed_components, refresh_components
+
+
+logger = setup_logger(__name__)
+
+POLL_INTERVAL_SECONDS = 2.0
+DEBOUNCE_SECONDS = 1.0
+
+
+class ConfigWatcher:
+    def __init__(
+        self,
+        app: Any,
+        config_path=None,
+        poll_interval: float = POLL_INTERVAL_SECONDS,
+        debounce: float = DEBOUNCE_SECONDS,
+    ):
+        self.app = app
+        self.config_path = str(config_path or CONFIG_FILENAME)
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="config-watcher", daemon=True)
+        self._thread.start()
+        logger.info(f"watching {self.config_path} for changes")
+
+    def stop(self):
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def reload(self) -> Optional[List[str]]:
+        try:
+            with open(self.config_path, "r", encoding="utf-8") as f:
+                config_data = yaml.safe_load(f) or {}
+        except (yaml.YAMLError, IOError) as e:
+            logger.error(f"config file change ignored, failed to read {self.config_path}: {e}")
+            return None
+
+        config = Config(self.config_path, config_data=config_data)
+        if not config.validate_config(config.config_data):
+            logger.error("config file change rejected by validation, keeping previous configuration")
+            return None
+
+        changed_sections = diff_config(get_config_snapshot(self.config_path).config_data, config.config_data)
+        if not changed_sections:
+            logger.debug("config file changed on disk without any effective changes")
+            return []
+
+        publish_config_snapshot(self.config_path, config.config_data)
+        logger.info(f"config file changed on disk, changed sections: {changed_sections}")
+        refresh_components(self.app, changed_components(changed_sections))
+        return changed_sections
+
+    def _signature(self):
+        try:
+            stat = os.stat(self.config_path)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size, stat.st_ino
+
+    def _run(self):
+        last_signature = self._signature()
+        changed_at = None
+        while not self._stop_event.wait(self.poll_interval):
+            signature = self._signature()
+            if signature != last_signature:
+                # editors and gitops syncs often write in several steps, wait for the file to settle
+                last_signature = signature
+                changed_at = time.monotonic()
+                continue
+            if changed_at is None or signature is None or time.monotonic() - changed_at < self.debounce:
+                continue
+            changed_at = None
+            try:
+                self.reload()
+            except Exception as e:
+                logger.error(f"failed to reload configuration: {e}")
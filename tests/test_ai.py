@@ -1,7 +1,7 @@
 import pytest
 from unittest.mock import patch, MagicMock
 
-from bitvoker.ai import MetaAIProvider, OllamaProvider, get_provider, process_with_ai
+from bitvoker.ai import MetaAIProvider, OllamaProvider, get_cached_provider, get_provider, process_with_ai
 
 
 class TestGetProvider:
@@ -19,6 +19,16 @@ class TestGetProvider:
         mock_ollama.assert_called_once()
 
 
+class TestGetCachedProvider:
+    @patch("bitvoker.ai.get_provider")
+    def test_reused_until_config_changes(self, mock_get_provider):
+        mock_get_provider.side_effect = lambda ai_config: MagicMock()
+        first = get_cached_provider({"provider": "meta_ai"})
+        assert get_cached_provider({"provider": "meta_ai"}) is first
+        assert get_cached_provider({"provider": "ollama", "ollama": {"url": "http://x"}}) is not first
+        assert mock_get_provider.call_count == 2
+
+
 class TestProcessWithAi:
     def test_no_config_returns_none(self):
         assert process_with_ai("msg", "prompt", None) is None
@@ -77,6 +77,15 @@ class TestTokens:
         parts[2] = "tampered"
         assert verify_token(":".join(parts)) is False
 
+    def test_verified_token_cached_until_expiry(self, monkeypatch):
+        import bitvoker.auth as auth_module
+        token = create_token("cached")
+        assert verify_token(token) is True
+        assert token in auth_module._verified_tokens
+        monkeypatch.setattr(auth_module, "TOKEN_EXPIRY", -1)
+        assert verify_token(token) is False
+        assert token not in auth_module._verified_tokens
+
     def test_expired_token(self, monkeypatch):
         token = create_token("admin")
         import bitvoker.auth as auth_module
@@ -0,0 +1,129 @@
+import socket
+
+import pytest
+
+import bitvoker.database as db_module
+
+from bitvoker import metrics
+from bitvoker.backtest import BacktestMatch, run_backtest
+from bitvoker.config import ConfigSnapshot
+
+
+def _rule(name, og_text_regex=None, sources=None, ai_text_regex=None, fields=None):
+    return {
+        "name": name,
+        "enabled": True,
+        "preprompt": "",
+        "match": {
+            "sources": sources or [],
+            "og_text_regex": og_text_regex,
+            "ai_text_regex": ai_text_regex,
+            "fields": fields,
+        },
+        "notify": {
+            "destinations": [],
+            "send_og_text": {"enabled": True, "og_text_regex": None, "ai_text_regex": None},
+            "send_ai_text": {"enabled": False, "og_text_regex": None, "ai_text_regex": None},
+        },
+    }
+
+
+def _config(*rules):
+    return {"ai": {"provider": "meta_ai"}, "message_token": "", "rules": list(rules), "destinations": []}
+
+
+@pytest.fixture
+def history(tmp_path, monkeypatch):
+    monkeypatch.setattr(db_module, "_storage", db_module.SQLiteStorage(str(tmp_path / "test.db")))
+    db_module.init_db()
+    db_module.insert_notifications(
+        [
+            {
+                "timestamp": "2025-01-01 10:00:00",
+                "original": "disk error on sda",
+                "ai": "",
+                "client": "10.0.0.1",
+                "matched_rule_name": "default-rule",
+            },
+            {
+                "timestamp": "2025-01-01 11:00:00",
+                "original": "all good",
+                "ai": "",
+                "client": "10.0.0.1",
+                "matched_rule_name": "default-rule",
+            },
+            {
+                "timestamp": "2025-01-02 10:00:00",
+                "original": "fan error",
+                "ai": "",
+                "client": "10.0.0.2",
+                "matched_rule_name": "default-rule",
+            },
+        ]
+    )
+
+
+class TestRunBacktest:
+    def test_counts_and_samples(self, history):
+        result = run_backtest(_config(_rule("errors", "error")), batch_size=2)
+        assert result["scanned"] == 3
+        assert result["unmatched"] == 1
+        assert result["changed"] == 3
+        assert result["complete"] is True
+        errors = result["rules"][0]
+        assert errors["selected"] == 2
+        assert [hit["original"] for hit in errors["samples"]] == ["disk error on sda", "fan error"]
+        assert errors["samples"][0]["previous_rule"] == "default-rule"
+
+    def test_most_specific_rule_selected(self, history):
+        result = run_backtest(_config(_rule("default-rule"), _rule("errors", "error")), samples=1)
+        by_name = {r["name"]: r for r in result["rules"]}
+        assert by_name["errors"]["selected"] == 2
+        assert by_name["default-rule"]["selected"] == 1
+        assert by_name["default-rule"]["matches"] == 3
+        assert len(by_name["errors"]["samples"]) == 1
+        assert result["changed"] == 2
+
+    def test_date_range_and_row_limit(self, history):
+        assert run_backtest(_config(_rule("errors", "error")), start_date="2025-01-02")["scanned"] == 1
+        result = run_backtest(_config(_rule("errors", "error")), max_rows=2)
+        assert result["scanned"] == 2
+        assert result["complete"] is False
+        assert result["last_id"] == 2
+        assert run_backtest(_config(_rule("errors", "error")), after_id=2)["scanned"] == 1
+
+    def test_ai_conditions_flagged(self, history):
+        result = run_backtest(_config(_rule("errors", "error", ai_text_regex="urgent")))
+        assert result["rules"][0]["ai_text_regex_skipped"] is True
+        assert result["rules"][0]["fields_not_replayed"] is False
+
+    def test_fields_conditions_flagged(self, history):
+        result = run_backtest(_config(_rule("ssh", fields={"app_name": "^sshd$"}), _rule("errors", "error")))
+        by_name = {r["name"]: r for r in result["rules"]}
+        assert by_name["ssh"]["fields_not_replayed"] is True
+        assert by_name["ssh"]["matches"] == 0
+        assert by_name["errors"]["fields_not_replayed"] is False
+
+
+class TestBacktestMatch:
+    def test_hostnames_resolved_once(self, monkeypatch):
+        calls = []
+
+        def resolve(host):
+            calls.append(host)
+            raise socket.gaierror(host)
+
+        monkeypatch.setattr(socket, "gethostbyname_ex", resolve)
+        match = BacktestMatch(ConfigSnapshot(_config(_rule("nas", sources=["nas.local"]))))
+        for _ in range(3):
+            assert match._find_matching_rule("10.0.0.1", "x") is None
+        assert calls == ["nas.local"]
+
+    def test_timeouts_stay_out_of_live_metrics(self):
+        config = _config(_rule("slow", "(a|aa)+$"))
+        config["matching"] = {"regex_timeout_ms": 10, "timeout_window": 1}
+        match = BacktestMatch(ConfigSnapshot(config))
+        before = metrics.regex_timeouts.value("slow")
+        assert match._find_matching_rule("10.0.0.1", "a" * 200 + "!") is None
+        assert "took longer" in match.compiled_rules[0].disabled
+        assert metrics.regex_timeouts.value("slow") == before
@@ -0,0 +1,19 @@
+import json
+
+from benchmarks.run import BENCHMARKS, main
+
+
+class TestBenchmarks:
+    def test_every_benchmark_runs(self, tmp_path):
+        output = tmp_path / "results.json"
+        assert main(["-n", "5", "-o", str(output)]) == 0
+        report = json.loads(output.read_text())
+        assert [r["name"] for r in report["results"]] == list(BENCHMARKS)
+        assert all(r["operations"] > 0 and r["ops_per_second"] > 0 for r in report["results"])
+
+    def test_compare_flags_regression(self, tmp_path):
+        baseline = tmp_path / "baseline.json"
+        baseline.write_text(json.dumps({"results": [{"name": "match_rules_10", "ops_per_second": 1e12}]}))
+        args = ["-n", "5", "-k", "match_rules_10", "-o", str(tmp_path / "results.json"), "--compare", str(baseline)]
+        assert main(args) == 0
+        assert main(args + ["--max-regression", "10"]) == 1
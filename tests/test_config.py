@@ -4,7 +4,7 @@ import tempfile
 import yaml
 import pytest
 
-from bitvoker.config import Config
+from bitvoker.config import Config, ConfigSnapshot, get_config_data, get_config_snapshot
 
 
 @pytest.fixture
@@ -79,6 +79,12 @@ class TestConfigGetters:
         dests = config.get_destinations()
         assert len(dests) == 1
 
+    def test_get_retention_config_defaults(self, config_file):
+        config = Config(config_path=config_file)
+        retention = config.get_retention_config()
+        assert retention["enabled"] is False
+        assert retention["batch_size"] == 500
+
     def test_get_enabled_destinations(self, config_file, sample_config):
         sample_config["destinations"].append({"name": "disabled", "url": "json://x", "enabled": False})
         with open(config_file, "w") as f:
@@ -142,6 +148,100 @@ class TestConfigValidation:
         config = Config(config_path=config_file)
         assert config.validate_config(sample_config) is False
 
+    def test_validate_retention(self, config_file, sample_config):
+        sample_config["retention"] = {"enabled": True, "max_age_days": 30, "max_rows": 1000, "rollup": True}
+        config = Config(config_path=config_file)
+        assert config.validate_config(sample_config) is True
+
+    def test_validate_invalid_retention(self, config_file, sample_config):
+        sample_config["retention"] = {"enabled": True, "max_age_days": -1}
+        config = Config(config_path=config_file)
+        assert config.validate_config(sample_config) is False
+
+    def test_validate_retention_zero_batch_size(self, config_file, sample_config):
+        sample_config["retention"] = {"batch_size": 0}
+        config = Config(config_path=config_file)
+        assert config.validate_config(sample_config) is False
+
+    def test_validate_rule_match_fields(self, config_file, sample_config):
+        config = Config(config_path=config_file)
+        sample_config["rules"][0]["match"]["fields"] = {"severity": "error", "hostname": None}
+        assert config.validate_config(sample_config) is True
+        sample_config["rules"][0]["match"]["fields"] = ["severity"]
+        assert config.validate_config(sample_config) is False
+
+    def test_validate_syslog(self, config_file, sample_config):
+        config = Config(config_path=config_file)
+        sample_config["syslog"] = {"enabled": "yes"}
+        assert config.validate_config(sample_config) is False
+
+    def test_validate_ingest(self, config_file, sample_config):
+        config = Config(config_path=config_file)
+        sample_config["ingest"] = {"queue_size": 50, "policy": "drop_oldest", "block_timeout_seconds": 0.5}
+        assert config.validate_config(sample_config) is True
+        sample_config["ingest"] = {"policy": "drop_everything"}
+        assert config.validate_config(sample_config) is False
+        sample_config["ingest"] = {"queue_size": 0}
+        assert config.validate_config(sample_config) is False
+
+    def test_validate_tracing(self, config_file, sample_config):
+        config = Config(config_path=config_file)
+        sample_config["tracing"] = {"slow_threshold_ms": 250, "persist": True}
+        assert config.validate_config(sample_config) is True
+        sample_config["tracing"] = {"ring_size": 0}
+        assert config.validate_config(sample_config) is False
+        sample_config["tracing"] = {"persist": "yes"}
+        assert config.validate_config(sample_config) is False
+
+    def test_validate_matching(self, config_file, sample_config):
+        config = Config(config_path=config_file)
+        sample_config["matching"] = {"regex_timeout_ms": 20}
+        assert config.validate_config(sample_config) is True
+        sample_config["matching"] = {"regex_timeout_ms": 0}
+        assert config.validate_config(sample_config) is False
+        sample_config["matching"] = {"regex_max_chars": 0, "timeout_window": 10, "timeout_disable_ratio": 0}
+        assert config.validate_config(sample_config) is True
+        sample_config["matching"] = {"timeout_window": 0}
+        assert config.validate_config(sample_config) is False
+        sample_config["matching"] = {"timeout_disable_ratio": 1.5}
+        assert config.validate_config(sample_config) is False
+
+    def test_validate_tcp(self, config_file, sample_config):
+        config = Config(config_path=config_file)
+        sample_config["tcp"] = {"max_message_bytes": 65536, "oversize_policy": "reject"}
+        assert config.validate_config(sample_config) is True
+        sample_config["tcp"] = {"oversize_policy": "spill"}
+        assert config.validate_config(sample_config) is False
+        sample_config["tcp"] = {"max_message_bytes": 0}
+        assert config.validate_config(sample_config) is False
+
+    def test_validate_rate_limit(self, config_file, sample_config):
+        config = Config(config_path=config_file)
+        sample_config["rate_limit"] = {"ingest_requests_per_second": 100, "ingest_burst": 500}
+        assert config.validate_config(sample_config) is True
+        sample_config["rate_limit"] = {"ingest_requests_per_second": 0}
+        assert config.validate_config(sample_config) is False
+        sample_config["rate_limit"] = {"ingest_burst": 0.5}
+        assert config.validate_config(sample_config) is False
+
+    def test_validate_metrics(self, config_file, sample_config):
+        config = Config(config_path=config_file)
+        sample_config["metrics"] = {"scrape_token": "secret"}
+        assert config.validate_config(sample_config) is True
+        sample_config["metrics"] = {"scrape_token": 1234}
+        assert config.validate_config(sample_config) is False
+
+    def test_validate_rule_regexes(self, config_file, sample_config):
+        config = Config(config_path=config_file)
+        rule = sample_config["rules"][0]
+        rule["match"]["og_text_regex"] = r"\bdisk (full|failure)"
+        assert config.validate_rule(rule) is True
+        rule["match"]["og_text_regex"] = "(unclosed"
+        assert config.validate_rule(rule) is False
+        rule["match"]["og_text_regex"] = None
+        rule["notify"]["send_og_text"]["og_text_regex"] = r"^(\w+\s?)*$"
+        assert config.validate_rule(rule) is False
+
     def test_validate_rule_missing_fields(self, config_file):
         config = Config(config_path=config_file)
         assert config.validate_rule({"name": "incomplete"}) is False
@@ -167,3 +267,46 @@ class TestConfigSave:
     def test_update_invalid_config(self, config_file):
         config = Config(config_path=config_file)
         assert config.update_config({"invalid": True}) is False
+
+
+class TestConfigSnapshot:
+    def test_snapshot_served_from_memory(self, config_file, sample_config):
+        Config(config_path=config_file)
+        sample_config["ai"]["provider"] = "ollama"
+        with open(config_file, "w") as f:
+            yaml.safe_dump(sample_config, f)
+        assert get_config_data(config_file)["ai"]["provider"] == "meta_ai"
+
+    def test_snapshot_follows_save(self, config_file, sample_config):
+        sample_config["ai"]["provider"] = "ollama"
+        Config(config_path=config_file).update_config(sample_config)
+        assert get_config_data(config_file)["ai"]["provider"] == "ollama"
+
+    def test_snapshot_is_a_copy(self, config_file):
+        get_config_data(config_file)["ai"]["provider"] = "changed"
+        assert get_config_data(config_file)["ai"]["provider"] == "meta_ai"
+
+    def test_snapshot_version_changes_only_on_new_content(self, config_file, sample_config):
+        config = Config(config_path=config_file)
+        first = get_config_snapshot(config_file)
+        config.reload_config()
+        assert get_config_snapshot(config_file) is first
+
+        sample_config["message_token"] = "secret"
+        config.update_config(sample_config)
+        second = get_config_snapshot(config_file)
+        assert second.version > first.version
+        assert second.message_token == "secret"
+        assert first.message_token == ""
+
+    def test_snapshot_precomputes_enabled_views(self, sample_config):
+        sample_config["destinations"].append({"name": "off", "url": "json://localhost", "enabled": False})
+        snapshot = ConfigSnapshot(sample_config)
+        assert [d["name"] for d in snapshot.enabled_destinations] == ["test-dest"]
+        assert list(snapshot.enabled_destinations_by_name) == ["test-dest"]
+        assert [r["name"] for r in snapshot.enabled_rules] == ["default-rule"]
+
+    def test_snapshot_isolated_from_source(self, sample_config):
+        snapshot = ConfigSnapshot(sample_config)
+        sample_config["rules"][0]["enabled"] = False
+        assert snapshot.enabled_rules[0]["enabled"] is True
@@ -1,20 +1,52 @@
+import sys
+import shutil
 import sqlite3
+import subprocess
 
 import pytest
 
-from bitvoker.database import init_db, insert_notification, get_notifications
+import bitvoker.database as db_module
+
+from bitvoker.database import (
+    SQLiteStorage,
+    create_storage,
+    init_db,
+    insert_notification,
+    get_notifications,
+    get_notification,
+    get_notification_rollups,
+    iter_notification_batches,
+    prune_notifications,
+)
 
 
 @pytest.fixture
 def test_db(tmp_path, monkeypatch):
     db_path = tmp_path / "test.db"
-    import bitvoker.database as db_module
-    monkeypatch.setattr(db_module, "DB_FILENAME", str(db_path))
+    monkeypatch.setattr(db_module, "_storage", SQLiteStorage(str(db_path)))
     init_db()
     return str(db_path)
 
 
 class TestDatabase:
+    def test_init_db_records_schema_version(self, test_db):
+        assert db_module.get_storage().schema_version() == len(db_module.SQLITE_MIGRATIONS)
+
+    def test_init_db_is_idempotent(self, test_db):
+        init_db()
+        conn = sqlite3.connect(test_db)
+        versions = [row[0] for row in conn.execute("SELECT version FROM schema_version ORDER BY version")]
+        conn.close()
+        assert versions == [version for version, _, _ in db_module.SQLITE_MIGRATIONS]
+
+    def test_import_does_no_database_io(self):
+        code = (
+            "import bitvoker.handler, bitvoker.router, bitvoker.database as db;"
+            " assert db._storage is None, 'storage created at import'"
+        )
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+        assert result.returncode == 0, result.stderr
+
     def test_init_db_creates_table(self, test_db):
         conn = sqlite3.connect(test_db)
         cursor = conn.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='notifications'")
@@ -42,6 +74,12 @@ class TestDatabase:
         assert len(results) == 1
         assert results[0]["original"] == "new"
 
+    def test_get_notifications_after_id_pages_forward(self, test_db):
+        for i in range(10):
+            insert_notification(f"2025-01-01 12:00:0{i}", f"msg {i}", "", "127.0.0.1")
+        assert [n["id"] for n in get_notifications(limit=3, after_id=2)] == [3, 4, 5]
+        assert [n["id"] for n in get_notifications(limit=3, after_id=8)] == [9, 10]
+
     def test_get_notifications_empty(self, test_db):
         results = get_notifications(limit=10)
         assert results == []
@@ -51,3 +89,226 @@ class TestDatabase:
             insert_notification(f"2025-01-01 12:{i:02d}:00", f"message {i}", "", "10.0.0.1")
         results = get_notifications(limit=100)
         assert len(results) == 10
+
+    def test_insert_records_delivery_outcome(self, test_db):
+        insert_notification(
+            "2025-01-01 12:00:00",
+            "héllo",
+            "",
+            "127.0.0.1",
+            matched_rule_name="disk-alerts",
+            destinations=["slack", "ntfy"],
+            delivery={"slack": {"success": True, "latency_ms": 12.5}, "ntfy": {"success": False, "latency_ms": 3.0}},
+            status="partial",
+            ai_latency_ms=100.0,
+            delivery_latency_ms=15.5,
+        )
+        result = get_notifications(limit=1)[0]
+        assert result["matched_rule_name"] == "disk-alerts"
+        assert result["destinations"] == ["slack", "ntfy"]
+        assert result["delivery"]["ntfy"] == {"success": False, "latency_ms": 3.0}
+        assert result["status"] == "partial"
+        assert result["message_size"] == 6
+        assert result["ai_latency_ms"] == 100.0
+        assert result["delivery_latency_ms"] == 15.5
+
+    def test_get_notifications_filters(self, test_db):
+        insert_notification(
+            "2025-01-01 12:00:00", "a", "", "10.0.0.1", "r1", ["slack"], status="sent", delivery_latency_ms=5.0
+        )
+        insert_notification(
+            "2025-01-01 12:01:00", "b", "", "10.0.0.2", "r2", ["ntfy"], status="failed", delivery_latency_ms=500.0
+        )
+        assert [r["original"] for r in get_notifications(limit=10, rule="r1")] == ["a"]
+        assert [r["original"] for r in get_notifications(limit=10, client="10.0.0.2")] == ["b"]
+        assert [r["original"] for r in get_notifications(limit=10, status="failed")] == ["b"]
+        assert [r["original"] for r in get_notifications(limit=10, destination="slack")] == ["a"]
+        assert [r["original"] for r in get_notifications(limit=10, min_delivery_ms=100)] == ["b"]
+
+    def test_init_db_migrates_legacy_table(self, tmp_path, monkeypatch):
+        db_path = tmp_path / "legacy.db"
+        conn = sqlite3.connect(db_path)
+        conn.execute(
+            "CREATE TABLE notifications (id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp TEXT, original TEXT,"
+            " ai TEXT, client TEXT)"
+        )
+        conn.execute("INSERT INTO notifications (timestamp, original, ai, client) VALUES ('t', 'o', 'a', 'c')")
+        conn.commit()
+        conn.close()
+        monkeypatch.setattr(db_module, "_storage", SQLiteStorage(str(db_path)))
+        init_db()
+        result = get_notifications(limit=1)[0]
+        assert result["original"] == "o"
+        assert result["matched_rule_name"] == ""
+
+
+class TestCreateStorage:
+    def test_sqlite_is_default(self):
+        assert isinstance(create_storage({}), SQLiteStorage)
+
+    def test_explicit_sqlite(self):
+        assert isinstance(create_storage({"backend": "sqlite"}), SQLiteStorage)
+
+    def test_incomplete_backend_fails_on_construction(self):
+        class NoPruning(db_module.Storage):
+            def init_db(self):
+                pass
+
+            def schema_version(self):
+                return 0
+
+            def insert_notification(self, *args, **kwargs):
+                pass
+
+            def _fetchall(self, query, params):
+                return []
+
+        with pytest.raises(TypeError, match="prune_notifications"):
+            NoPruning()
+
+
+class TestCompression:
+    def test_small_body_stored_as_text(self, test_db):
+        insert_notification("2025-01-01 12:00:00", "short", "", "127.0.0.1")
+        conn = sqlite3.connect(test_db)
+        row = conn.execute("SELECT original, original_z FROM notifications").fetchone()
+        conn.close()
+        assert row == ("short", None)
+
+    def test_large_body_compressed_and_restored(self, test_db):
+        body = "Traceback line\n" * 1000
+        insert_notification("2025-01-01 12:00:00", body, "summary", "127.0.0.1")
+        conn = sqlite3.connect(test_db)
+        stored_text, stored_blob = conn.execute("SELECT original, original_z FROM notifications").fetchone()
+        conn.close()
+        assert stored_blob is not None
+        assert len(stored_blob) < len(body)
+        assert len(stored_text) < len(body)
+        result = get_notifications(limit=1)[0]
+        assert result["original"] == body
+        assert result["message_size"] == len(body)
+
+    def test_preview_truncates_without_full_body(self, test_db):
+        body = "x" * 10000
+        insert_notification("2025-01-01 12:00:00", body, "", "127.0.0.1")
+        insert_notification("2025-01-01 12:01:00", "small", "", "127.0.0.1")
+        small, large = get_notifications(limit=10, preview=True)
+        assert small["original"] == "small"
+        assert small["truncated"] is False
+        assert large["truncated"] is True
+        assert len(large["original"]) < len(body)
+
+    def test_get_notification_loads_full_body(self, test_db):
+        body = "y" * 10000
+        insert_notification("2025-01-01 12:00:00", body, body, "127.0.0.1")
+        notif_id = get_notifications(limit=1, preview=True)[0]["id"]
+        notif = get_notification(notif_id)
+        assert notif["original"] == body
+        assert notif["ai"] == body
+
+    def test_get_missing_notification(self, test_db):
+        assert get_notification(12345) is None
+
+
+class TestTraceStorage:
+    def test_trace_stored_with_notification(self, test_db):
+        trace = {"trace_id": "abc", "duration_ms": 1500.0, "spans": [{"name": "ai", "duration_ms": 1400.0}]}
+        insert_notification("2025-01-01 12:00:00", "slow", "", "127.0.0.1", trace=trace)
+        insert_notification("2025-01-01 12:00:01", "fast", "", "127.0.0.1")
+        fast, slow = get_notifications(limit=2)
+        assert "trace" not in slow
+        assert get_notification(slow["id"])["trace"] == trace
+        assert get_notification(fast["id"])["trace"] is None
+
+
+class TestIterNotificationBatches:
+    def test_iter_notification_batches(self, test_db):
+        body = "z" * 10000
+        insert_notification("2025-01-01 12:00:00", "first", "", "127.0.0.1", matched_rule_name="errors")
+        insert_notification("2025-01-02 12:00:00", body, "", "127.0.0.1")
+        insert_notification("2025-01-03 12:00:00", "third", "", "127.0.0.1")
+        batches = list(iter_notification_batches(batch_size=2))
+        assert [len(batch) for batch in batches] == [2, 1]
+        assert [row["original"] for batch in batches for row in batch] == ["first", body, "third"]
+        assert batches[0][0]["matched_rule_name"] == "errors"
+        rows = [row for batch in iter_notification_batches("2025-01-02", "2025-01-02") for row in batch]
+        assert [row["original"] for row in rows] == [body]
+
+
+class TestPruneNotifications:
+    def test_prune_by_age(self, test_db):
+        insert_notification("2000-01-01 12:00:00", "old", "", "127.0.0.1")
+        insert_notification("2999-01-01 12:00:00", "new", "", "127.0.0.1")
+        assert prune_notifications(max_age_days=30, pause=0) == 1
+        results = get_notifications(limit=10)
+        assert [r["original"] for r in results] == ["new"]
+
+    def test_prune_by_row_count_keeps_newest(self, test_db):
+        for i in range(10):
+            insert_notification(f"2025-01-01 12:{i:02d}:00", f"msg {i}", "", "127.0.0.1")
+        assert prune_notifications(max_rows=3, batch_size=2, pause=0) == 7
+        results = get_notifications(limit=100)
+        assert [r["original"] for r in results] == ["msg 9", "msg 8", "msg 7"]
+
+    def test_prune_without_limits_is_noop(self, test_db):
+        insert_notification("2000-01-01 12:00:00", "old", "", "127.0.0.1")
+        assert prune_notifications(pause=0) == 0
+        assert len(get_notifications(limit=10)) == 1
+
+    def test_prune_with_rollup(self, test_db):
+        insert_notification("2000-01-01 12:00:00", "a", "", "10.0.0.1", matched_rule_name="r1")
+        insert_notification("2000-01-01 13:00:00", "b", "", "10.0.0.1", matched_rule_name="r1")
+        insert_notification("2000-01-01 14:00:00", "c", "", "10.0.0.1", matched_rule_name="r2")
+        insert_notification("2000-01-02 12:00:00", "d", "", "10.0.0.2")
+        assert prune_notifications(max_age_days=30, batch_size=1, rollup=True, pause=0) == 4
+        rollups = get_notification_rollups()
+        assert {(r["day"], r["client"], r["rule"], r["count"]) for r in rollups} == {
+            ("2000-01-01", "10.0.0.1", "r1", 2),
+            ("2000-01-01", "10.0.0.1", "r2", 1),
+            ("2000-01-02", "10.0.0.2", "", 1),
+        }
+
+    def test_prune_without_rollup_keeps_no_counts(self, test_db):
+        insert_notification("2000-01-01 12:00:00", "a", "", "10.0.0.1")
+        prune_notifications(max_age_days=30, pause=0)
+        assert get_notification_rollups() == []
+
+    def test_incremental_auto_vacuum_enabled(self, test_db):
+        conn = sqlite3.connect(test_db)
+        assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+        conn.close()
+
+
+class TestVacuumRebuild:
+    @pytest.fixture
+    def legacy_db(self, tmp_path, monkeypatch):
+        db_path = tmp_path / "legacy.db"
+        conn = sqlite3.connect(db_path)
+        conn.execute("CREATE TABLE legacy (id INTEGER)")
+        conn.close()
+        monkeypatch.setattr(db_module, "_storage", SQLiteStorage(str(db_path)))
+        init_db()
+        return str(db_path)
+
+    def _auto_vacuum(self, path):
+        conn = sqlite3.connect(path)
+        try:
+            return conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+        finally:
+            conn.close()
+
+    def test_existing_database_not_rebuilt_at_startup(self, legacy_db):
+        assert self._auto_vacuum(legacy_db) == 0
+        insert_notification("2000-01-01 12:00:00", "old", "", "10.0.0.1")
+        assert prune_notifications(max_age_days=30, pause=0) == 1
+
+    def test_rebuild_on_request(self, legacy_db):
+        assert db_module.rebuild_for_incremental_vacuum() is True
+        assert self._auto_vacuum(legacy_db) == 2
+        assert db_module.rebuild_for_incremental_vacuum() is False
+
+    def test_rebuild_needs_free_space(self, legacy_db, monkeypatch):
+        usage = shutil.disk_usage(legacy_db)
+        monkeypatch.setattr(db_module.shutil, "disk_usage", lambda path: usage._replace(free=0))
+        assert db_module.rebuild_for_incremental_vacuum() is False
+        assert self._auto_vacuum(legacy_db) == 0
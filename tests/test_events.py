@@ -0,0 +1,48 @@
+import json
+import asyncio
+import threading
+
+from bitvoker.events import EventBroker, format_sse
+
+
+class TestFormatSse:
+    def test_data_only(self):
+        assert format_sse({"a": 1}) == 'data: {"a": 1}\n\n'
+
+    def test_with_event_and_id(self):
+        message = format_sse({"a": 1}, event="log", event_id=7)
+        assert message.splitlines()[:2] == ["id: 7", "event: log"]
+        assert json.loads(message.splitlines()[2].removeprefix("data: ")) == {"a": 1}
+
+
+class TestEventBroker:
+    def test_publish_from_other_thread(self):
+        async def scenario():
+            broker = EventBroker()
+            queue = broker.subscribe()
+            threading.Thread(target=broker.publish, args=("hello",)).start()
+            return await asyncio.wait_for(queue.get(), timeout=2)
+
+        assert asyncio.run(scenario()) == "hello"
+
+    def test_unsubscribe_stops_delivery(self):
+        async def scenario():
+            broker = EventBroker()
+            queue = broker.subscribe()
+            broker.unsubscribe(queue)
+            broker.publish("hello")
+            await asyncio.sleep(0)
+            return queue.empty(), broker.subscriber_count()
+
+        assert asyncio.run(scenario()) == (True, 0)
+
+    def test_full_queue_drops_oldest(self):
+        async def scenario():
+            broker = EventBroker(queue_size=2)
+            queue = broker.subscribe()
+            for i in range(3):
+                broker.publish(i)
+            await asyncio.sleep(0)
+            return [queue.get_nowait() for _ in range(queue.qsize())]
+
+        assert asyncio.run(scenario()) == [1, 2]
@@ -1,46 +1,130 @@
+import socket
+
 import pytest
 from unittest.mock import MagicMock, patch
 
-from bitvoker.handler import Handler, TOKEN_PREFIX
+import bitvoker.handler as handler_module
+
+from bitvoker.config import ConfigSnapshot
+from bitvoker.pipeline import PipelineContext
+from bitvoker.handler import Handler, TOKEN_PREFIX, delivery_status, read_message, utf8_boundary
 
 
 class TestVerifyToken:
-    def _make_handler(self, token=""):
+    def _make_handler(self):
         handler = object.__new__(Handler)
         handler.client_address = ("127.0.0.1", 12345)
-        server = MagicMock()
-        config = MagicMock()
-        config.config_data = {"message_token": token}
-        server.config = config
-        handler.server = server
+        handler.server = MagicMock()
         return handler
 
+    def _context(self, token=""):
+        return PipelineContext(ConfigSnapshot({"message_token": token}), MagicMock(), MagicMock())
+
     def test_no_token_configured_passes_through(self):
-        handler = self._make_handler("")
-        assert handler._verify_token("hello world") == "hello world"
+        handler = self._make_handler()
+        assert handler._verify_token("hello world", self._context("")) == "hello world"
 
     def test_valid_token(self):
-        handler = self._make_handler("mysecret")
-        assert handler._verify_token("TOKEN:mysecret:hello world") == "hello world"
+        handler = self._make_handler()
+        assert handler._verify_token("TOKEN:mysecret:hello world", self._context("mysecret")) == "hello world"
 
     def test_invalid_token(self):
-        handler = self._make_handler("mysecret")
-        assert handler._verify_token("TOKEN:wrong:hello") is None
+        handler = self._make_handler()
+        assert handler._verify_token("TOKEN:wrong:hello", self._context("mysecret")) is None
 
     def test_missing_token_prefix(self):
-        handler = self._make_handler("mysecret")
-        assert handler._verify_token("hello world") is None
+        handler = self._make_handler()
+        assert handler._verify_token("hello world", self._context("mysecret")) is None
 
     def test_malformed_token(self):
-        handler = self._make_handler("mysecret")
-        assert handler._verify_token("TOKEN:noseparator") is None
+        handler = self._make_handler()
+        assert handler._verify_token("TOKEN:noseparator", self._context("mysecret")) is None
 
     def test_empty_message_after_token(self):
-        handler = self._make_handler("mysecret")
-        assert handler._verify_token("TOKEN:mysecret:") == ""
+        handler = self._make_handler()
+        assert handler._verify_token("TOKEN:mysecret:", self._context("mysecret")) == ""
+
+    def test_no_pipeline_context(self):
+        handler = self._make_handler()
+        assert handler._verify_token("hello") == "hello"
+
+
+class TestDeliveryStatus:
+    def test_no_destinations_reached(self):
+        assert delivery_status({}) == "undelivered"
+
+    def test_all_succeeded(self):
+        assert delivery_status({"a": {"success": True}, "b": {"success": True}}) == "sent"
+
+    def test_all_failed(self):
+        assert delivery_status({"a": {"success": False}}) == "failed"
+
+    def test_partial(self):
+        assert delivery_status({"a": {"success": True}, "b": {"success": False}}) == "partial"
+
+
+def _sent(payload):
+    reader, writer = socket.socketpair()
+    writer.sendall(payload)
+    writer.close()
+    return reader
 
-    def test_no_config_attribute(self):
+
+class TestReadMessage:
+    def test_small_message(self):
+        with _sent(b"hello") as sock:
+            data, size = read_message(sock, 1024)
+        assert bytes(data[:size]) == b"hello"
+
+    def test_grows_past_initial_buffer(self, monkeypatch):
+        monkeypatch.setattr(handler_module, "READ_BUFFER_BYTES", 4)
+        with _sent(b"x" * 100) as sock:
+            data, size = read_message(sock, 1024)
+        assert size == 100
+
+    def test_exactly_at_limit(self):
+        with _sent(b"x" * 64) as sock:
+            _, size = read_message(sock, 64)
+        assert size == 64
+
+    def test_stops_one_byte_past_limit(self, monkeypatch):
+        monkeypatch.setattr(handler_module, "READ_BUFFER_BYTES", 8)
+        with _sent(b"x" * 1000) as sock:
+            data, size = read_message(sock, 64)
+        assert size == 65
+        assert len(data) == 65
+
+    def test_utf8_boundary(self):
+        data = "aé".encode("utf-8")
+        assert utf8_boundary(data, 2) == 1
+        assert utf8_boundary(b"abc", 2) == 2
+
+
+class TestOversizedMessages:
+    def _handle(self, payload, tcp_config):
         handler = object.__new__(Handler)
         handler.client_address = ("127.0.0.1", 12345)
-        handler.server = MagicMock(spec=[])
-        assert handler._verify_token("hello") == "hello"
+        handler.server = MagicMock(ingest_queue=None)
+        context = PipelineContext(ConfigSnapshot({"tcp": tcp_config}), MagicMock(), MagicMock())
+        with (
+            _sent(payload) as sock,
+            patch.object(handler_module.pipeline, "current", return_value=context),
+            patch.object(handler_module, "process_message", return_value={}) as process,
+            patch.object(handler_module, "insert_notification"),
+        ):
+            handler.request = sock
+            handler._handle()
+        return process
+
+    def test_truncate(self):
+        process = self._handle("é".encode("utf-8") * 10, {"max_message_bytes": 5, "oversize_policy": "truncate"})
+        message = process.call_args[0][0]
+        assert message == "éé\n[truncated: message exceeded 5 bytes]"
+
+    def test_reject(self):
+        process = self._handle(b"x" * 10, {"max_message_bytes": 5, "oversize_policy": "reject"})
+        process.assert_not_called()
+
+    def test_within_limit(self):
+        process = self._handle(b"  hello  ", {"max_message_bytes": 9, "oversize_policy": "reject"})
+        assert process.call_args[0][0] == "hello"
@@ -0,0 +1,91 @@
+import json
+
+import pytest
+from unittest.mock import patch
+
+import bitvoker.ingest as ingest_module
+import bitvoker.database as db_module
+
+from bitvoker.config import ConfigSnapshot
+from bitvoker.pipeline import Pipeline
+from bitvoker.ingest import check_ingest_token, ingest_messages, parse_messages
+
+
+@pytest.fixture
+def pipeline(tmp_path, monkeypatch):
+    monkeypatch.setattr(db_module, "_storage", db_module.SQLiteStorage(str(tmp_path / "test.db")))
+    db_module.init_db()
+    pipeline = Pipeline()
+    pipeline.refresh(
+        ConfigSnapshot(
+            {
+                "ai": {"provider": "meta_ai"},
+                "message_token": "secret",
+                "rules": [
+                    {
+                        "name": "errors",
+                        "enabled": True,
+                        "preprompt": "",
+                        "match": {"sources": [], "og_text_regex": "error", "ai_text_regex": None},
+                        "notify": {
+                            "destinations": [],
+                            "send_og_text": {"enabled": True, "og_text_regex": None, "ai_text_regex": None},
+                            "send_ai_text": {"enabled": False, "og_text_regex": None, "ai_text_regex": None},
+                        },
+                    }
+                ],
+                "destinations": [{"name": "test-dest", "url": "json://localhost", "enabled": True}],
+            }
+        )
+    )
+    monkeypatch.setattr(ingest_module, "pipeline", pipeline)
+    return pipeline
+
+
+class TestParseMessages:
+    def test_plain_text(self):
+        assert parse_messages(b"disk full\n", "text/plain") == ["disk full"]
+
+    def test_json_single_object(self):
+        assert parse_messages(b'{"message": "disk full"}', "application/json") == ["disk full"]
+
+    def test_json_array(self):
+        body = json.dumps(["one", {"message": "two"}, {"other": 1}]).encode()
+        assert parse_messages(body, "application/json; charset=utf-8") == ["one", "two", None]
+
+    def test_ndjson(self):
+        body = b'{"message": "one"}\n\n"two"\n'
+        assert parse_messages(body, "application/x-ndjson") == ["one", "two"]
+
+    def test_invalid_json(self):
+        with pytest.raises(ValueError):
+            parse_messages(b"{not json", "application/json")
+
+
+class TestCheckIngestToken:
+    def test_no_header(self, pipeline):
+        assert check_ingest_token(None) is None
+
+    def test_valid_header(self, pipeline):
+        assert check_ingest_token("secret") is True
+
+    def test_invalid_header(self, pipeline):
+        assert check_ingest_token("wrong") is False
+
+
+class TestIngestMessages:
+    @patch("bitvoker.notifier.apprise.NotifyBase.notify", return_value=True)
+    def test_batch_results_and_single_write(self, mock_notify, pipeline):
+        storage = db_module._storage
+        with patch.object(storage, "insert_notifications", wraps=storage.insert_notifications) as insert:
+            results = ingest_messages(["an error occurred", "all good", None], "10.0.0.1", token_verified=True)
+        assert [r["status"] for r in results] == ["sent", "skipped", "invalid"]
+        assert results[0]["matched_rule_name"] == "errors"
+        assert results[0]["delivery"]["test-dest"]["success"] is True
+        insert.assert_called_once()
+        assert len(db_module.get_notifications()) == 2
+
+    def test_per_message_token_prefix(self, pipeline):
+        results = ingest_messages(["TOKEN:secret:all good", "no token"], "10.0.0.1")
+        assert [r["status"] for r in results] == ["skipped", "rejected"]
+        assert [n["original"] for n in db_module.get_notifications()] == ["all good"]
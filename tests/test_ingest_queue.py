@@ -0,0 +1,87 @@
+import threading
+
+import pytest
+from unittest.mock import patch
+
+import bitvoker.ingest_queue as ingest_queue_module
+
+from bitvoker.ingest_queue import IngestQueue
+
+
+@pytest.fixture
+def processed():
+    calls = []
+
+    def fake_process_message(message, client_ip, context, fields=None, skip_ai=False, trace=None):
+        calls.append((message, skip_ai))
+        return {"original": message}
+
+    with (
+        patch.object(ingest_queue_module, "process_message", side_effect=fake_process_message),
+        patch.object(ingest_queue_module, "insert_notification"),
+    ):
+        yield calls
+
+
+def _full_queue(policy, max_size=2, block_timeout=0.05):
+    # not started, so nothing drains the queue
+    queue = IngestQueue(max_size=max_size, workers=1, policy=policy, block_timeout=block_timeout)
+    for i in range(max_size):
+        assert queue.submit(f"queued-{i}", "10.0.0.1", None) is True
+    return queue
+
+
+class TestIngestQueue:
+    def test_unknown_policy(self):
+        with pytest.raises(ValueError):
+            IngestQueue(policy="drop_everything")
+
+    def test_workers_process_queued_messages(self, processed):
+        queue = IngestQueue(max_size=10, workers=2)
+        queue.start()
+        for i in range(5):
+            queue.submit(f"message-{i}", "10.0.0.1", None)
+        queue.stop()
+        assert sorted(message for message, _ in processed) == [f"message-{i}" for i in range(5)]
+        assert queue.stats()["processed"] == 5
+        assert queue.stats()["depth"] == 0
+        assert queue.running is False
+
+    def test_drop_newest(self, processed):
+        queue = _full_queue("drop_newest")
+        assert queue.submit("late", "10.0.0.1", None) is False
+        stats = queue.stats()
+        assert stats["dropped_newest"] == 1
+        assert stats["depth"] == 2
+        assert [item[0] for item in queue._items] == ["queued-0", "queued-1"]
+
+    def test_drop_oldest(self, processed):
+        queue = _full_queue("drop_oldest")
+        assert queue.submit("late", "10.0.0.1", None) is True
+        assert queue.stats()["dropped_oldest"] == 1
+        assert [item[0] for item in queue._items] == ["queued-1", "late"]
+
+    def test_block_times_out(self, processed):
+        queue = _full_queue("block")
+        assert queue.submit("late", "10.0.0.1", None) is False
+        assert queue.stats()["block_timeouts"] == 1
+        assert queue.stats()["dropped"] == 1
+
+    def test_block_waits_for_room(self, processed):
+        queue = _full_queue("block", block_timeout=5)
+        result = []
+        sender = threading.Thread(target=lambda: result.append(queue.submit("late", "10.0.0.1", None)))
+        sender.start()
+        queue.start()
+        sender.join(timeout=5)
+        queue.stop()
+        assert result == [True]
+        assert queue.stats()["block_timeouts"] == 0
+        assert "late" in [message for message, _ in processed]
+
+    def test_ai_bypass_processes_inline_without_ai(self, processed):
+        queue = _full_queue("ai_bypass")
+        assert queue.submit("late", "10.0.0.1", None) is True
+        assert processed == [("late", True)]
+        assert queue.stats()["ai_bypassed"] == 1
+        assert queue.depth() == queue.stats()["depth"] == 2
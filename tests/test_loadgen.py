@@ -0,0 +1,121 @@
+import json
+import socketserver
+import threading
+import urllib.request
+
+import pytest
+
+from typing import List
+
+from bitvoker.loadgen import LoadGenerator, MetricsSampler, Sink, latency_summary, load_corpus, main
+
+
+class _ReadUntilClosed(socketserver.BaseRequestHandler):
+    received: List[str] = []
+
+    def handle(self):
+        chunks = []
+        while chunk := self.request.recv(4096):
+            chunks.append(chunk)
+        self.received.append(b"".join(chunks).decode())
+
+
+@pytest.fixture
+def listener():
+    _ReadUntilClosed.received = []
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _ReadUntilClosed)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+class TestLoadGenerator:
+    def test_render_with_token_and_marker(self):
+        sink = Sink("127.0.0.1", 0, "abcd1234")
+        generator = LoadGenerator("127.0.0.1", 1, ["disk {seq} on worker {worker}"], token="secret", sink=sink)
+        assert generator.render(7, 2) == b"TOKEN:secret:disk 7 on worker 2 [loadgen:abcd1234:7]"
+        sink.server.server_close()
+
+    def test_sends_every_message(self, listener):
+        port = listener.server_address[1]
+        generator = LoadGenerator("127.0.0.1", port, ["message {seq}"], connections=4, count=20)
+        report = generator.run()
+        assert report["sent"] == 20
+        assert report["error_count"] == 0
+        assert report["ack_latency"]["count"] == 20
+        assert sorted(_ReadUntilClosed.received, key=lambda m: int(m.split()[1])) == [f"message {i}" for i in range(20)]
+
+    def test_connection_errors_are_counted(self, listener):
+        port = listener.server_address[1]
+        listener.shutdown()
+        listener.server_close()
+        report = LoadGenerator("127.0.0.1", port, ["message"], connections=2, count=4).run()
+        assert report["sent"] == 0
+        assert report["error_count"] == 4
+
+    def test_sink_measures_end_to_end_latency(self, listener):
+        sink = Sink("127.0.0.1", 0, "abcd1234")
+        sink.start()
+        try:
+            generator = LoadGenerator("127.0.0.1", listener.server_address[1], ["m{seq}"], count=3, sink=sink)
+            generator.sent_at = {0: 0.0, 1: 0.0, 2: 0.0}
+            body = json.dumps({"message": "m0 [loadgen:abcd1234:0] m1 [loadgen:abcd1234:1] [loadgen:ffffffff:2]"})
+            request = urllib.request.Request(f"http://127.0.0.1:{sink.address[1]}/", data=body.encode(), method="POST")
+            urllib.request.urlopen(request).close()
+            generator._next_seq = 3
+            report = generator.report()
+        finally:
+            sink.stop()
+        assert report["delivered"] == 2
+        assert report["undelivered"] == 1
+
+
+class TestHelpers:
+    def test_latency_summary(self):
+        summary = latency_summary([0.001 * i for i in range(1, 101)])
+        assert summary["count"] == 100
+        assert summary["p50_ms"] == 51.0
+        assert summary["p99_ms"] == 99.0
+        assert summary["max_ms"] == 100.0
+
+    def test_load_corpus_escapes_braces(self, tmp_path):
+        corpus = tmp_path / "corpus.txt"
+        corpus.write_text('{"level": "error"}\n\nplain line\n')
+        messages = load_corpus(str(corpus))
+        assert [m.format_map({}) for m in messages] == ['{"level": "error"}', "plain line"]
+
+    def test_metrics_sampler_keeps_peaks(self, monkeypatch):
+        sampler = MetricsSampler("http://127.0.0.1/metrics")
+        pages = iter(["bitvoker_threads 12\nbitvoker_inflight_connections 3\n", "bitvoker_threads 40\n"])
+
+        class _Response:
+            def __init__(self, text):
+                self.text = text
+
+            def read(self):
+                return self.text.encode()
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *args):
+                pass
+
+        monkeypatch.setattr(urllib.request, "urlopen", lambda request, timeout: _Response(next(pages)))
+        sampler.sample()
+        sampler.sample()
+        assert sampler.peaks == {"bitvoker_threads": 40, "bitvoker_inflight_connections": 3}
+
+    def test_unknown_template_field_rejected_up_front(self, listener, capsys):
+        with pytest.raises(ValueError, match="unknown field 'host'"):
+            LoadGenerator("127.0.0.1", 1, ["message {seq} from {host}"])
+        with pytest.raises(SystemExit):
+            main(["--port", str(listener.server_address[1]), "--template", "message {host}"])
+        assert "unknown field 'host'" in capsys.readouterr().err
+        assert _ReadUntilClosed.received == []
+
+    def test_main_json_report(self, listener, capsys):
+        assert main(["--port", str(listener.server_address[1]), "-n", "5", "-c", "2", "--json"]) == 0
+        assert json.loads(capsys.readouterr().out)["sent"] == 5
@@ -1,6 +1,7 @@
 import pytest
 from unittest.mock import MagicMock, patch
 
+from bitvoker import metrics
 from bitvoker.config import Config
 from bitvoker.matcher import Match, MatchResults
 
@@ -104,6 +105,21 @@ class TestProcess:
         match = Match(base_config)
         assert match.process("10.0.0.1", "test") is None
 
+    def test_skip_ai_still_sends_original(self, base_config):
+        base_config.config_data["rules"][0]["notify"]["send_ai_text"]["enabled"] = True
+        match = Match(base_config)
+        with patch.object(match, "_get_ai_processed") as get_ai_processed:
+            result = match.process("10.0.0.1", "test message", skip_ai=True)
+        get_ai_processed.assert_not_called()
+        assert result.should_send_original is True
+        assert result.should_send_ai is False
+
+    def test_skip_ai_rejects_rule_matching_on_ai_text(self, base_config):
+        base_config.config_data["rules"][0]["notify"]["send_ai_text"]["enabled"] = True
+        base_config.config_data["rules"][0]["match"]["ai_text_regex"] = "critical"
+        match = Match(base_config)
+        assert match.process("10.0.0.1", "test message", skip_ai=True) is None
+
 
 class TestMatchResults:
     def test_default_values(self):
@@ -114,3 +130,196 @@ class TestMatchResults:
         assert result.original_text == ""
         assert result.should_send_ai is False
         assert result.should_send_original is False
+
+
+class TestRuleCompilation:
+    def test_unchanged_rules_reused(self, base_config):
+        base_config.config_data["rules"].append(
+            {
+                "name": "error-rule",
+                "enabled": True,
+                "preprompt": "",
+                "match": {"sources": [], "og_text_regex": "error", "ai_text_regex": None},
+                "notify": {
+                    "destinations": [],
+                    "send_og_text": {"enabled": True, "og_text_regex": None, "ai_text_regex": None},
+                    "send_ai_text": {"enabled": False, "og_text_regex": None, "ai_text_regex": None},
+                },
+            }
+        )
+        previous = Match(base_config)
+        base_config.config_data["rules"][1]["match"]["og_text_regex"] = "failure"
+        match = Match(base_config, previous=previous)
+        assert match.compiled_rules[0] is previous.compiled_rules[0]
+        assert match.compiled_rules[1] is not previous.compiled_rules[1]
+        assert match._find_matching_rule("10.0.0.1", "disk failure")["name"] == "error-rule"
+
+    def test_invalid_regex_disables_rule(self, base_config):
+        base_config.config_data["rules"][0]["match"]["og_text_regex"] = "(unclosed"
+        match = Match(base_config)
+        assert match.compiled_rules[0].error
+        assert match._find_matching_rule("10.0.0.1", "(unclosed") is None
+
+
+class TestRegexTimeout:
+    def _add_slow_rule(self, base_config, **matching):
+        base_config.config_data["matching"] = {"regex_timeout_ms": 10, **matching}
+        base_config.config_data["rules"].append(
+            {
+                "name": "slow-rule",
+                "enabled": True,
+                "preprompt": "",
+                # not caught by the static check, but exponential on a run of a's that does not end the line
+                "match": {"sources": [], "og_text_regex": "(a|aa)+$", "ai_text_regex": None},
+                "notify": {
+                    "destinations": [],
+                    "send_og_text": {"enabled": True, "og_text_regex": None, "ai_text_regex": None},
+                    "send_ai_text": {"enabled": False, "og_text_regex": None, "ai_text_regex": None},
+                },
+            }
+        )
+
+    def test_timeout_is_no_match_for_that_message(self, base_config):
+        self._add_slow_rule(base_config)
+        match = Match(base_config)
+        before = metrics.regex_timeouts.value("slow-rule")
+        assert match._find_matching_rule("10.0.0.1", "a" * 200 + "!")["name"] == "default-rule"
+        slow_rule = match.compiled_rules[1]
+        assert slow_rule.disabled is None
+        assert slow_rule.stats.to_dict()["timeouts"] == 1
+        assert metrics.regex_timeouts.value("slow-rule") == before + 1
+        assert match._find_matching_rule("10.0.0.1", "aa")["name"] == "slow-rule"
+
+    def test_sustained_timeouts_disable_until_enabled(self, base_config):
+        self._add_slow_rule(base_config, timeout_window=4, timeout_disable_ratio=0.5)
+        match = Match(base_config)
+        for _ in range(2):
+            match._find_matching_rule("10.0.0.1", "a" * 200 + "!")
+        slow_rule = match.compiled_rules[1]
+        assert "in 2 of 2 searches" in slow_rule.disabled
+        assert match.rule_stats()[1]["disabled"] is True
+        assert match._find_matching_rule("10.0.0.1", "aa")["name"] == "default-rule"
+        # stays disabled for reloads that leave the rule alone, until it is switched back on
+        reloaded = Match(base_config, previous=match)
+        assert reloaded.compiled_rules[1].disabled == slow_rule.disabled
+        assert reloaded.enable_rule("slow-rule") is True
+        assert reloaded.enable_rule("slow-rule") is False
+        assert reloaded._find_matching_rule("10.0.0.1", "aa")["name"] == "slow-rule"
+
+    def test_zero_ratio_never_disables(self, base_config):
+        self._add_slow_rule(base_config, timeout_window=1, timeout_disable_ratio=0)
+        match = Match(base_config)
+        for _ in range(3):
+            match._find_matching_rule("10.0.0.1", "a" * 200 + "!")
+        assert match.compiled_rules[1].disabled is None
+
+    def test_only_start_of_long_message_searched(self, base_config):
+        base_config.config_data["matching"] = {"regex_max_chars": 10}
+        base_config.config_data["rules"][0]["match"]["og_text_regex"] = "critical"
+        match = Match(base_config)
+        assert match._find_matching_rule("10.0.0.1", "critical disk") is not None
+        assert match._find_matching_rule("10.0.0.1", "x" * 20 + "critical") is None
+
+    def test_whole_message_searched_by_default(self, base_config):
+        base_config.config_data["rules"][0]["match"]["og_text_regex"] = "critical$"
+        match = Match(base_config)
+        assert match._find_matching_rule("10.0.0.1", "x" * 20000 + "critical") is not None
+
+    def test_dangerous_pattern_disabled_on_compile(self, base_config):
+        base_config.config_data["rules"][0]["match"]["og_text_regex"] = "(a+)+$"
+        match = Match(base_config)
+        assert "nests unbounded quantifiers" in match.compiled_rules[0].error
+
+
+class TestFieldsMatch:
+    def _add_fields_rule(self, base_config):
+        base_config.config_data["rules"].append(
+            {
+                "name": "ssh-errors",
+                "enabled": True,
+                "preprompt": "",
+                "match": {
+                    "sources": [],
+                    "og_text_regex": None,
+                    "ai_text_regex": None,
+                    "fields": {"severity": "^(error|critical)$", "app_name": "^sshd$"},
+                },
+                "notify": {
+                    "destinations": [],
+                    "send_og_text": {"enabled": True, "og_text_regex": None, "ai_text_regex": None},
+                    "send_ai_text": {"enabled": False, "og_text_regex": None, "ai_text_regex": None},
+                },
+            }
+        )
+
+    def test_fields_rule_wins_for_matching_fields(self, base_config):
+        self._add_fields_rule(base_config)
+        match = Match(base_config)
+        rule = match._find_matching_rule("10.0.0.1", "x", {"severity": "error", "app_name": "sshd"})
+        assert rule["name"] == "ssh-errors"
+
+    def test_fields_rule_skipped_without_fields(self, base_config):
+        self._add_fields_rule(base_config)
+        match = Match(base_config)
+        assert match._find_matching_rule("10.0.0.1", "x")["name"] == "default-rule"
+        rule = match._find_matching_rule("10.0.0.1", "x", {"severity": "info", "app_name": "sshd"})
+        assert rule["name"] == "default-rule"
+
+
+class TestRuleStats:
+    def _add_error_rule(self, base_config, sources=None):
+        base_config.config_data["rules"].append(
+            {
+                "name": "error-rule",
+                "enabled": True,
+                "preprompt": "",
+                "match": {"sources": sources or [], "og_text_regex": "error", "ai_text_regex": None},
+                "notify": {
+                    "destinations": [],
+                    "send_og_text": {"enabled": True, "og_text_regex": None, "ai_text_regex": None},
+                    "send_ai_text": {"enabled": False, "og_text_regex": None, "ai_text_regex": None},
+                },
+            }
+        )
+
+    def _stats(self, match):
+        return {r["name"]: r for r in match.rule_stats()}
+
+    def test_outcomes_counted(self, base_config):
+        self._add_error_rule(base_config)
+        match = Match(base_config)
+        match._find_matching_rule("10.0.0.1", "disk error")
+        match._find_matching_rule("10.0.0.1", "all good")
+        stats = self._stats(match)
+        assert stats["error-rule"]["evaluations"] == 2
+        assert stats["error-rule"]["matches"] == 1
+        assert stats["error-rule"]["regex_rejects"] == 1
+        assert stats["error-rule"]["selected"] == 1
+        assert stats["default-rule"]["matches"] == 2
+        assert stats["default-rule"]["selected"] == 1
+        assert stats["error-rule"]["regex_ms_total"] >= stats["error-rule"]["regex_ms_max"] >= 0
+
+    def test_source_rejects_skip_regex(self, base_config):
+        self._add_error_rule(base_config, sources=["10.0.0.2"])
+        match = Match(base_config)
+        match._find_matching_rule("10.0.0.1", "disk error")
+        stats = self._stats(match)["error-rule"]
+        assert stats["source_rejects"] == 1
+        assert stats["regex_ms_total"] == 0
+        assert stats["regex_ms_mean"] == 0
+
+    def test_stats_survive_reload_until_rule_edited(self, base_config):
+        self._add_error_rule(base_config)
+        previous = Match(base_config)
+        previous._find_matching_rule("10.0.0.1", "disk error")
+        base_config.config_data["rules"][1]["match"]["og_text_regex"] = "failure"
+        match = Match(base_config, previous=previous)
+        stats = self._stats(match)
+        assert stats["default-rule"]["evaluations"] == 1
+        assert stats["error-rule"]["evaluations"] == 0
+
+    def test_reset(self, base_config):
+        match = Match(base_config)
+        match._find_matching_rule("10.0.0.1", "x")
+        match.reset_rule_stats()
+        assert self._stats(match)["default-rule"]["evaluations"] == 0
@@ -0,0 +1,51 @@
+import pytest
+
+from bitvoker.metrics import Counter, Gauge, Histogram, Registry
+
+
+class TestMetrics:
+    def test_counter_render(self):
+        counter = Counter("test_total", "A test counter.", ("rule",))
+        counter.inc("errors")
+        counter.inc("errors", amount=2)
+        counter.inc('quote"d')
+        lines = counter.render()
+        assert lines[:2] == ["# HELP test_total A test counter.", "# TYPE test_total counter"]
+        assert 'test_total{rule="errors"} 3' in lines
+        assert 'test_total{rule="quote\\"d"} 1' in lines
+
+    def test_counter_label_count_mismatch(self):
+        counter = Counter("test_total", "A test counter.", ("rule",))
+        with pytest.raises(ValueError):
+            counter.inc()
+
+    def test_gauge_inc_dec_and_function(self):
+        gauge = Gauge("test_inflight", "A test gauge.")
+        gauge.inc()
+        gauge.inc()
+        gauge.dec()
+        assert gauge.value() == 1
+        gauge.set_function(lambda: 7)
+        assert "test_inflight 7" in gauge.render()
+
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = Histogram("test_seconds", "A test histogram.", ("stage",), buckets=(0.1, 1.0))
+        histogram.observe(0.05, "ai")
+        histogram.observe(0.5, "ai")
+        histogram.observe(5, "ai")
+        lines = histogram.render()
+        assert 'test_seconds_bucket{stage="ai",le="0.1"} 1' in lines
+        assert 'test_seconds_bucket{stage="ai",le="1"} 2' in lines
+        assert 'test_seconds_bucket{stage="ai",le="+Inf"} 3' in lines
+        assert 'test_seconds_sum{stage="ai"} 5.55' in lines
+        assert 'test_seconds_count{stage="ai"} 3' in lines
+        assert histogram.count("ai") == 3
+
+    def test_registry_render(self):
+        registry = Registry()
+        registry.register(Counter("first_total", "First.")).inc()
+        registry.register(Gauge("second", "Second.")).set(2)
+        text = registry.render()
+        assert text.endswith("\n")
+        assert "first_total 1" in text
+        assert "second 2" in text
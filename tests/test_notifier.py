@@ -23,12 +23,47 @@ class TestNotifierSetup:
         notifier.update_destinations([{"name": "new", "url": "json://localhost", "enabled": True}])
         assert len(notifier.apprise.servers) == 1
 
+    def test_update_keeps_unchanged_plugins(self):
+        notifier = Notifier(
+            [
+                {"name": "kept", "url": "json://localhost", "enabled": True},
+                {"name": "changed", "url": "json://localhost", "enabled": True},
+            ]
+        )
+        kept, changed = notifier.apprise.servers
+        notifier.update_destinations(
+            [
+                {"name": "kept", "url": "json://localhost", "enabled": True},
+                {"name": "changed", "url": "json://127.0.0.1", "enabled": True},
+            ]
+        )
+        assert notifier.apprise.servers[0] is kept
+        assert notifier.apprise.servers[1] is not changed
+
+    def test_update_drops_disabled_plugins(self):
+        notifier = Notifier([{"name": "test", "url": "json://localhost", "enabled": True}])
+        notifier.update_destinations([{"name": "test", "url": "json://localhost", "enabled": False}])
+        assert len(notifier.apprise.servers) == 0
+
 
 class TestNotifierSend:
     def test_send_with_no_servers(self):
         notifier = Notifier([])
-        notifier.send_message("test message")
+        assert notifier.send_message("test message") == {}
 
     def test_send_with_invalid_tags(self):
         notifier = Notifier([{"name": "test", "url": "json://localhost", "enabled": True}])
-        notifier.send_message("test", destination_names=["nonexistent"])
+        assert notifier.send_message("test", destination_names=["nonexistent"]) == {}
+
+    @patch("bitvoker.notifier.apprise.NotifyBase.notify", return_value=True)
+    def test_send_reports_per_destination_outcome(self, mock_notify):
+        notifier = Notifier(
+            [
+                {"name": "first", "url": "json://localhost", "enabled": True},
+                {"name": "second", "url": "json://127.0.0.1", "enabled": True},
+            ]
+        )
+        delivery = notifier.send_message("test", destination_names=["first"])
+        assert list(delivery) == ["first"]
+        assert delivery["first"]["success"] is True
+        assert delivery["first"]["latency_ms"] >= 0
@@ -0,0 +1,59 @@
+from bitvoker.config import ConfigSnapshot
+from bitvoker.pipeline import Pipeline
+
+
+def _snapshot(**changes):
+    config_data = {
+        "ai": {"provider": "meta_ai"},
+        "rules": [
+            {
+                "name": "default-rule",
+                "enabled": True,
+                "preprompt": "",
+                "match": {"sources": [], "og_text_regex": None, "ai_text_regex": None},
+                "notify": {
+                    "destinations": [],
+                    "send_og_text": {"enabled": True, "og_text_regex": None, "ai_text_regex": None},
+                    "send_ai_text": {"enabled": False, "og_text_regex": None, "ai_text_regex": None},
+                },
+            }
+        ],
+        "destinations": [{"name": "test-dest", "url": "json://localhost", "enabled": True}],
+    }
+    config_data.update(changes)
+    return ConfigSnapshot(config_data)
+
+
+class TestPipeline:
+    def test_empty_until_refreshed(self):
+        assert Pipeline().current() is None
+
+    def test_refresh_builds_context(self):
+        pipeline = Pipeline()
+        context = pipeline.refresh(_snapshot())
+        assert pipeline.current() is context
+        assert len(context.notifier.apprise.servers) == 1
+        assert context.match.process("10.0.0.1", "hello") is not None
+
+    def test_config_only_change_keeps_components(self):
+        pipeline = Pipeline()
+        first = pipeline.refresh(_snapshot())
+        second = pipeline.refresh(_snapshot(message_token="secret"), set())
+        assert second is not first
+        assert second.notifier is first.notifier
+        assert second.match is first.match
+        assert second.config.message_token == "secret"
+
+    def test_rule_change_keeps_notifier(self):
+        pipeline = Pipeline()
+        first = pipeline.refresh(_snapshot())
+        second = pipeline.refresh(_snapshot(), {"rules"})
+        assert second.notifier is first.notifier
+        assert second.match is not first.match
+
+    def test_previous_context_left_untouched(self):
+        pipeline = Pipeline()
+        first = pipeline.refresh(_snapshot())
+        pipeline.refresh(_snapshot(destinations=[]), {"destinations"})
+        assert len(first.notifier.apprise.servers) == 1
+        assert len(pipeline.current().notifier.apprise.servers) == 0
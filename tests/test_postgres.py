@@ -0,0 +1,128 @@
+import os
+import uuid
+from contextlib import contextmanager
+
+import pytest
+
+from bitvoker.postgres import POSTGRES_MIGRATIONS, PostgresStorage
+
+
+class FakeCursor:
+    def __init__(self, pool):
+        self.pool = pool
+        self.rowcount = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, query, params=None):
+        self.pool.executed.append((query, params))
+
+    def executemany(self, query, rows):
+        self.pool.batches.append((query, list(rows)))
+
+    def fetchall(self):
+        return self.pool.rows
+
+    def fetchone(self):
+        return self.pool.rows[0] if self.pool.rows else None
+
+
+class FakeConnection:
+    def __init__(self, pool):
+        self.pool = pool
+
+    def cursor(self):
+        return FakeCursor(self.pool)
+
+
+class FakePool:
+    def __init__(self):
+        self.executed = []
+        self.batches = []
+        self.rows = []
+        self.closed = False
+
+    @contextmanager
+    def connection(self):
+        yield FakeConnection(self)
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def fake_storage():
+    storage = PostgresStorage(pool=FakePool(), batch_size=3, flush_interval_seconds=60)
+    yield storage
+    storage.close()
+
+
+class TestPostgresBatching:
+    def test_inserts_are_buffered_until_batch_size(self, fake_storage):
+        fake_storage.insert_notification("2025-01-01 12:00:00", "a", "", "10.0.0.1")
+        fake_storage.insert_notification("2025-01-01 12:00:01", "b", "", "10.0.0.1")
+        assert fake_storage.pool.batches == []
+        fake_storage.insert_notification("2025-01-01 12:00:02", "c", "", "10.0.0.1")
+        assert len(fake_storage.pool.batches) == 1
+        query, rows = fake_storage.pool.batches[0]
+        assert "%s" in query and "?" not in query
+        assert [row[1] for row in rows] == ["a", "b", "c"]
+
+    def test_reads_flush_pending_inserts(self, fake_storage):
+        fake_storage.insert_notification("2025-01-01 12:00:00", "a", "", "10.0.0.1")
+        assert fake_storage.get_notifications(limit=10) == []
+        assert len(fake_storage.pool.batches) == 1
+
+    def test_close_flushes_and_closes_pool(self):
+        pool = FakePool()
+        storage = PostgresStorage(pool=pool, batch_size=100, flush_interval_seconds=60)
+        storage.insert_notification("2025-01-01 12:00:00", "a", "", "10.0.0.1")
+        storage.close()
+        assert len(pool.batches) == 1
+        assert pool.closed is True
+
+    def test_destination_filter_uses_jsonb(self, fake_storage):
+        fake_storage.get_notifications(limit=10, destination="slack", start_date="2025-01-01")
+        query, params = fake_storage.pool.executed[-1]
+        assert "jsonb_build_array(%s::text)" in query
+        assert "LEFT(timestamp, 10) >= %s" in query
+        assert params == ("2025-01-01", "slack", 10)
+
+
+class TestPostgresMigrations:
+    def test_applies_pending_migrations(self, fake_storage):
+        fake_storage.pool.rows = [(0,)]
+        fake_storage.init_db()
+        statements = [query for query, _ in fake_storage.pool.executed]
+        assert statements[0].startswith("SELECT pg_advisory_xact_lock")
+        assert any("CREATE TABLE IF NOT EXISTS notifications" in query for query in statements)
+        assert statements[-1].startswith("INSERT INTO schema_version")
+
+    def test_skips_applied_migrations(self, fake_storage):
+        fake_storage.pool.rows = [(len(POSTGRES_MIGRATIONS),)]
+        fake_storage.init_db()
+        statements = [query for query, _ in fake_storage.pool.executed]
+        assert not any("CREATE TABLE IF NOT EXISTS notifications" in query for query in statements)
+
+
+@pytest.mark.skipif(not os.environ.get("BITVOKER_TEST_POSTGRES_DSN"), reason="BITVOKER_TEST_POSTGRES_DSN not set")
+class TestPostgresIntegration:
+    @pytest.fixture
+    def storage(self):
+        pytest.importorskip("psycopg_pool")
+        storage = PostgresStorage(dsn=os.environ["BITVOKER_TEST_POSTGRES_DSN"], batch_size=2)
+        storage.init_db()
+        yield storage
+        storage.close()
+
+    def test_insert_and_get_notification(self, storage):
+        client = f"test-{uuid.uuid4()}"
+        storage.insert_notification("2025-01-01 12:00:00", "x" * 10000, "ai", client, matched_rule_name="r1")
+        results = storage.get_notifications(limit=10, client=client)
+        assert len(results) == 1
+        assert results[0]["original"] == "x" * 10000
+        assert results[0]["matched_rule_name"] == "r1"
@@ -0,0 +1,52 @@
+from unittest.mock import patch
+
+from bitvoker.pruner import Pruner
+
+
+def _retention(**overrides):
+    retention = {
+        "enabled": True,
+        "max_age_days": 30,
+        "max_rows": 0,
+        "rollup": True,
+        "batch_size": 100,
+        "interval_seconds": 3600,
+        "vacuum_rebuild": False,
+    }
+    retention.update(overrides)
+    return retention
+
+
+class TestPrunerRunOnce:
+    @patch("bitvoker.pruner.prune_notifications")
+    def test_disabled_retention_skips_prune(self, mock_prune):
+        assert Pruner().run_once(_retention(enabled=False)) == 0
+        mock_prune.assert_not_called()
+
+    @patch("bitvoker.pruner.prune_notifications")
+    def test_no_limits_skips_prune(self, mock_prune):
+        assert Pruner().run_once(_retention(max_age_days=0, max_rows=0)) == 0
+        mock_prune.assert_not_called()
+
+    @patch("bitvoker.pruner.prune_notifications", return_value=5)
+    def test_enabled_retention_prunes(self, mock_prune):
+        assert Pruner().run_once(_retention(max_rows=1000)) == 5
+        mock_prune.assert_called_once_with(max_age_days=30, max_rows=1000, batch_size=100, rollup=True)
+
+    @patch("bitvoker.pruner.rebuild_for_incremental_vacuum")
+    @patch("bitvoker.pruner.prune_notifications", return_value=0)
+    def test_vacuum_rebuild_only_when_asked(self, mock_prune, mock_rebuild):
+        Pruner().run_once(_retention())
+        mock_rebuild.assert_not_called()
+        Pruner().run_once(_retention(vacuum_rebuild=True))
+        mock_rebuild.assert_called_once_with()
+
+
+class TestPrunerLifecycle:
+    @patch("bitvoker.pruner.get_config_snapshot")
+    def test_start_and_stop(self, mock_snapshot):
+        mock_snapshot.return_value.get_retention_config.return_value = _retention(enabled=False)
+        pruner = Pruner()
+        pruner.start()
+        pruner.stop()
+        assert not pruner._thread.is_alive()
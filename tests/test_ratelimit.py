@@ -0,0 +1,79 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import bitvoker.ratelimit as ratelimit_module
+
+from bitvoker.api import app
+from bitvoker.config import ConfigSnapshot
+from bitvoker.ratelimit import TokenBuckets, rate_limits
+
+
+class TestTokenBuckets:
+    def test_burst_then_wait(self):
+        buckets = TokenBuckets()
+        assert [buckets.take("a", rate=1, burst=3, now=0) for _ in range(3)] == [0, 0, 0]
+        assert buckets.take("a", rate=1, burst=3, now=0) == pytest.approx(1.0)
+        assert buckets.take("b", rate=1, burst=3, now=0) == 0
+
+    def test_refill(self):
+        buckets = TokenBuckets()
+        buckets.take("a", rate=2, burst=1, now=0)
+        assert buckets.take("a", rate=2, burst=1, now=0.1) == pytest.approx(0.4)
+        assert buckets.take("a", rate=2, burst=1, now=0.6) == 0
+
+    def test_least_recent_client_evicted(self):
+        buckets = TokenBuckets(max_clients=2)
+        for client in ["a", "b", "a", "c"]:
+            buckets.take(client, rate=1, burst=1, now=0)
+        # b was evicted and starts over with a full bucket, c is still empty
+        assert buckets.take("b", rate=1, burst=1, now=0) == 0
+        assert buckets.take("c", rate=1, burst=1, now=0) > 0
+
+
+class TestRateLimitMiddleware:
+    @pytest.fixture
+    def client(self, monkeypatch):
+        rate_limits.clear()
+        config = ConfigSnapshot(
+            {
+                "rate_limit": {
+                    "requests_per_second": 0.001,
+                    "burst": 3,
+                    "login_attempts_per_minute": 2,
+                    "ingest_requests_per_second": 0.001,
+                    "ingest_burst": 4,
+                }
+            }
+        )
+        monkeypatch.setattr(ratelimit_module, "get_config_snapshot", lambda: config)
+        monkeypatch.delenv("BITVOKER_USERNAME", raising=False)
+        monkeypatch.delenv("BITVOKER_PASSWORD", raising=False)
+        yield TestClient(app)
+        rate_limits.clear()
+
+    def test_api_limited(self, client):
+        statuses = [client.get("/api/auth/status").status_code for _ in range(4)]
+        assert statuses == [200, 200, 200, 429]
+        response = client.get("/api/auth/status")
+        assert int(response.headers["retry-after"]) > 0
+        assert response.json() == {"error": "too many requests"}
+
+    def test_login_has_its_own_bucket(self, client):
+        credentials = {"username": "admin", "password": "guess"}
+        statuses = [client.post("/api/auth/login", json=credentials).status_code for _ in range(3)]
+        assert statuses == [200, 200, 429]
+        assert client.get("/api/auth/status").status_code == 200
+
+    def test_ingest_has_its_own_bucket(self, client):
+        statuses = [client.post("/api/ingest", json=[]).status_code for _ in range(5)]
+        assert statuses == [400, 400, 400, 400, 429]
+        assert client.get("/api/auth/status").status_code == 200
+
+    def test_web_ui_not_limited(self, client):
+        for _ in range(5):
+            assert client.get("/").status_code != 429
+
+    def test_disabled(self, client, monkeypatch):
+        config = ConfigSnapshot({"rate_limit": {"enabled": False, "burst": 1}})
+        monkeypatch.setattr(ratelimit_module, "get_config_snapshot", lambda: config)
+        assert all(client.get("/api/auth/status").status_code == 200 for _ in range(5))
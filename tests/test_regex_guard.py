@@ -0,0 +1,41 @@
+import pytest
+
+from bitvoker.regex_guard import UnsafePatternError, compile_pattern, pattern_problem, rule_patterns
+
+
+class TestPatternProblem:
+    @pytest.mark.parametrize(
+        "pattern",
+        [r"error|fail", r"\bservice-1\b.*(failed|error)", r"(?:\d+\.)*\d+", r"(a+b)+", r"[\w.]+@\w+(\.\w+)*"],
+    )
+    def test_safe_patterns(self, pattern):
+        assert pattern_problem(pattern) is None
+
+    @pytest.mark.parametrize("pattern", [r"(a+)+$", r"(\w+\s?)*$", r"((a+)b?)+", r"(.*)*x", r"(?:(?:a*))*"])
+    def test_nested_quantifiers(self, pattern):
+        assert "nests unbounded quantifiers" in pattern_problem(pattern)
+
+    def test_invalid_pattern(self):
+        assert pattern_problem("(unclosed").startswith("invalid regex '(unclosed'")
+
+
+class TestCompilePattern:
+    def test_flags(self):
+        assert compile_pattern("ERROR.end").search("error\nend")
+
+    def test_check_can_be_skipped(self):
+        with pytest.raises(UnsafePatternError):
+            compile_pattern(r"(a+)+$")
+        assert compile_pattern(r"(a+)+$", check=False).search("aaa")
+
+    def test_timeout(self):
+        with pytest.raises(TimeoutError):
+            compile_pattern(r"(a|aa)+$").search("a" * 200 + "!", timeout=0.01)
+
+
+def test_rule_patterns():
+    rule = {
+        "match": {"og_text_regex": "disk", "ai_text_regex": None, "fields": {"severity": "error", "host": None}},
+        "notify": {"send_og_text": {"og_text_regex": "full"}, "send_ai_text": {"ai_text_regex": "urgent"}},
+    }
+    assert rule_patterns(rule) == ["disk", "full", "urgent", "error"]
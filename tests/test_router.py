@@ -1,12 +1,26 @@
+import asyncio
+import logging
+
 import pytest
 from unittest.mock import MagicMock, patch
+from fastapi import HTTPException, Request
 from fastapi.testclient import TestClient
 
+import bitvoker.router as router_module
+import bitvoker.database as db_module
+
 from bitvoker.api import app
+from bitvoker.config import ConfigSnapshot
+from bitvoker.events import EventBroker
+from bitvoker.ratelimit import rate_limits
+from bitvoker.tracing import Trace, slow_traces
 
 
 @pytest.fixture
-def client():
+def client(tmp_path, monkeypatch):
+    monkeypatch.setattr(db_module, "_storage", db_module.SQLiteStorage(str(tmp_path / "test.db")))
+    db_module.init_db()
+    rate_limits.clear()
     return TestClient(app)
 
 
@@ -66,6 +80,34 @@ class TestProtectedEndpoints:
         response = client.get("/api/config", headers={"Authorization": f"Bearer {token}"})
         assert response.status_code == 200
 
+    def test_config_get_does_not_read_file(self, client, monkeypatch):
+        monkeypatch.delenv("BITVOKER_USERNAME", raising=False)
+        monkeypatch.delenv("BITVOKER_PASSWORD", raising=False)
+        client.get("/api/config")
+        with patch("bitvoker.config.Config.load_config", side_effect=AssertionError("config file read")):
+            response = client.get("/api/config")
+        assert response.status_code == 200
+
+    def test_config_update_runs_refresh(self, client, monkeypatch):
+        monkeypatch.delenv("BITVOKER_USERNAME", raising=False)
+        monkeypatch.delenv("BITVOKER_PASSWORD", raising=False)
+        with (
+            patch("bitvoker.router.Config") as config_cls,
+            patch("bitvoker.router.refresh_components") as refresh,
+        ):
+            config_cls.return_value.update_config.return_value = True
+            response = client.post("/api/config", json={"ai": {"provider": "meta_ai"}})
+        assert response.json() == {"success": True}
+        refresh.assert_called_once()
+
+    def test_config_update_rejects_invalid(self, client, monkeypatch):
+        monkeypatch.delenv("BITVOKER_USERNAME", raising=False)
+        monkeypatch.delenv("BITVOKER_PASSWORD", raising=False)
+        with patch("bitvoker.router.refresh_components") as refresh:
+            response = client.post("/api/config", json={"invalid": True})
+        assert response.status_code == 400
+        refresh.assert_not_called()
+
     def test_notifications_without_auth(self, client, monkeypatch):
         monkeypatch.delenv("BITVOKER_USERNAME", raising=False)
         monkeypatch.delenv("BITVOKER_PASSWORD", raising=False)
@@ -77,3 +119,284 @@ class TestProtectedEndpoints:
         monkeypatch.delenv("BITVOKER_PASSWORD", raising=False)
         response = client.get("/api/logs")
         assert response.status_code == 200
+
+
+def _record(level, message):
+    return logging.LogRecord("test", getattr(logging, level), __file__, 0, message, None, None)
+
+
+class TestMemoryLogHandler:
+    def test_ring_buffer_keeps_newest_entries(self):
+        handler = router_module.MemoryLogHandler(max_entries=3)
+        for i in range(5):
+            handler.emit(_record("INFO", f"line {i}"))
+        logs = handler.get_logs()
+        assert [log["message"] for log in logs] == ["line 2", "line 3", "line 4"]
+        assert [log["seq"] for log in logs] == [3, 4, 5]
+
+    def test_since_returns_only_new_entries(self):
+        handler = router_module.MemoryLogHandler()
+        for i in range(4):
+            handler.emit(_record("INFO", f"line {i}"))
+        assert [log["seq"] for log in handler.get_logs(since=2)] == [3, 4]
+        assert handler.get_logs(since=4) == []
+
+    def test_limit_keeps_newest(self):
+        handler = router_module.MemoryLogHandler()
+        for i in range(4):
+            handler.emit(_record("INFO", f"line {i}"))
+        assert [log["seq"] for log in handler.get_logs(limit=2)] == [3, 4]
+
+    def test_limit_after_cursor_keeps_oldest(self):
+        handler = router_module.MemoryLogHandler()
+        for i in range(10):
+            handler.emit(_record("INFO", f"line {i}"))
+        assert [log["seq"] for log in handler.get_logs(since=2, limit=3)] == [3, 4, 5]
+
+    def test_level_index_respects_rotation(self):
+        handler = router_module.MemoryLogHandler(max_entries=3)
+        handler.emit(_record("ERROR", "old error"))
+        for i in range(3):
+            handler.emit(_record("INFO", f"line {i}"))
+        handler.emit(_record("ERROR", "new error"))
+        assert [log["message"] for log in handler.get_logs(level="ERROR")] == ["new error"]
+        assert [log["message"] for log in handler.get_logs(level="INFO")] == ["line 1", "line 2"]
+
+    def test_logs_endpoint_incremental(self, client, monkeypatch):
+        monkeypatch.delenv("BITVOKER_USERNAME", raising=False)
+        monkeypatch.delenv("BITVOKER_PASSWORD", raising=False)
+        handler = router_module.MemoryLogHandler()
+        monkeypatch.setattr(router_module, "memory_log_handler", handler)
+        handler.emit(_record("INFO", "first"))
+        handler.emit(_record("WARNING", "second"))
+
+        data = client.get("/api/logs", params={"since": 1}).json()
+        assert [log["message"] for log in data["logs"]] == ["second"]
+        assert data["last_seq"] == 2
+
+        data = client.get("/api/logs", params={"level": "info", "limit": 5}).json()
+        assert [log["message"] for log in data["logs"]] == ["first"]
+
+    def test_logs_endpoint_limited_poll_loses_nothing(self, client, monkeypatch):
+        monkeypatch.delenv("BITVOKER_USERNAME", raising=False)
+        monkeypatch.delenv("BITVOKER_PASSWORD", raising=False)
+        handler = router_module.MemoryLogHandler()
+        monkeypatch.setattr(router_module, "memory_log_handler", handler)
+        for i in range(10):
+            handler.emit(_record("INFO", f"line {i}"))
+
+        seen, since = [], 2
+        while True:
+            data = client.get("/api/logs", params={"since": since, "limit": 3}).json()
+            if not data["logs"]:
+                break
+            seen += [log["seq"] for log in data["logs"]]
+            since = data["last_seq"]
+        assert seen == list(range(3, 11))
+
+
+class FakeStreamRequest:
+    def __init__(self, iterations):
+        self.iterations = iterations
+
+    async def is_disconnected(self):
+        self.iterations -= 1
+        return self.iterations < 0
+
+
+class TestLiveFeeds:
+    def test_notification_stream_resumes_from_cursor(self, client, monkeypatch):
+        for i in range(3):
+            db_module.insert_notification(f"2025-01-01 12:00:0{i}", f"msg {i}", "", "127.0.0.1")
+        first_id = db_module.get_notifications(limit=3)[-1]["id"]
+
+        async def collect():
+            stream = router_module._notification_stream(FakeStreamRequest(1), first_id)
+            return await anext(stream)
+
+        monkeypatch.setattr(router_module, "STREAM_KEEPALIVE_SECONDS", 0.01)
+        event = asyncio.run(collect())
+        assert event.startswith(f"id: {first_id + 1}\nevent: notification\n")
+        assert '"msg 1"' in event
+
+    def test_notification_stream_drains_backlog_in_batches(self, client, monkeypatch):
+        for i in range(5):
+            db_module.insert_notification(f"2025-01-01 12:00:0{i}", f"msg {i}", "", "127.0.0.1")
+        monkeypatch.setattr(router_module, "STREAM_BATCH_LIMIT", 2)
+        monkeypatch.setattr(router_module, "STREAM_KEEPALIVE_SECONDS", 0.01)
+
+        async def collect():
+            stream = router_module._notification_stream(FakeStreamRequest(1), 1)
+            return [event.split("\n")[0] async for event in stream if not event.startswith(":")]
+
+        assert asyncio.run(collect()) == [f"id: {i}" for i in range(2, 6)]
+
+    def test_log_stream_replays_backlog_after_cursor(self, monkeypatch):
+        handler = router_module.MemoryLogHandler()
+        monkeypatch.setattr(router_module, "memory_log_handler", handler)
+        monkeypatch.setattr(router_module, "STREAM_KEEPALIVE_SECONDS", 0.01)
+        handler.emit(_record("WARNING", "already seen"))
+        handler.emit(_record("WARNING", "live feed backlog entry"))
+
+        async def collect():
+            stream = router_module._log_stream(FakeStreamRequest(1), 1, None)
+            return [event async for event in stream if not event.startswith(":")]
+
+        events = asyncio.run(collect())
+        assert len(events) == 1
+        assert "live feed backlog entry" in events[0]
+
+    def test_log_stream_filters_level(self, monkeypatch):
+        handler = router_module.MemoryLogHandler()
+        monkeypatch.setattr(router_module, "memory_log_handler", handler)
+        monkeypatch.setattr(router_module, "STREAM_KEEPALIVE_SECONDS", 0.01)
+        handler.emit(_record("WARNING", "warning entry"))
+
+        async def collect():
+            stream = router_module._log_stream(FakeStreamRequest(1), 0, "ERROR")
+            return [event async for event in stream if not event.startswith(":")]
+
+        assert asyncio.run(collect()) == []
+
+    def test_log_stream_slow_client_loses_nothing(self, monkeypatch):
+        # the subscriber queue holds two events, five more lines are published before the client reads again
+        handler = router_module.MemoryLogHandler()
+        monkeypatch.setattr(router_module, "memory_log_handler", handler)
+        monkeypatch.setattr(router_module, "log_events", EventBroker(queue_size=2))
+        monkeypatch.setattr(router_module, "STREAM_KEEPALIVE_SECONDS", 0.01)
+        handler.emit(_record("INFO", "line 1"))
+
+        async def collect():
+            stream = router_module._log_stream(FakeStreamRequest(2), 0, None)
+            events = [await anext(stream)]
+            for i in range(2, 8):
+                handler.emit(_record("INFO", f"line {i}"))
+            await asyncio.sleep(0)
+            events += [event async for event in stream]
+            return [event.split("\n")[0] for event in events if not event.startswith(":")]
+
+        assert asyncio.run(collect()) == [f"id: {seq}" for seq in range(1, 8)]
+
+    def test_stream_requires_auth(self, client, monkeypatch):
+        monkeypatch.setenv("BITVOKER_USERNAME", "admin")
+        monkeypatch.setenv("BITVOKER_PASSWORD", "pass")
+        response = client.get("/api/logs/stream")
+        assert response.status_code == 401
+
+    def test_query_token_only_for_streams(self, client, monkeypatch):
+        monkeypatch.setenv("BITVOKER_USERNAME", "admin")
+        monkeypatch.setenv("BITVOKER_PASSWORD", "pass")
+        token = client.post("/api/auth/login", json={"username": "admin", "password": "pass"}).json()["token"]
+        assert client.get("/api/config", params={"token": token}).status_code == 401
+        request = Request({"type": "http", "headers": [], "query_string": f"token={token}".encode()})
+        router_module._check_auth(request, allow_query_token=True)
+        with pytest.raises(HTTPException):
+            router_module._check_auth(request)
+
+
+class TestIngestEndpoint:
+    def test_ingest_batch(self, client, monkeypatch):
+        monkeypatch.setattr(router_module, "check_ingest_token", lambda token: True)
+        response = client.post("/api/ingest", json=["first", {"message": "second"}])
+        assert response.status_code == 200
+        assert [r["index"] for r in response.json()["results"]] == [0, 1]
+        assert len(db_module.get_notifications()) == 2
+
+    def test_ingest_rejects_wrong_token(self, client, monkeypatch):
+        monkeypatch.setattr(router_module, "check_ingest_token", lambda token: False)
+        response = client.post("/api/ingest", content=b"hello", headers={"X-Message-Token": "wrong"})
+        assert response.status_code == 401
+
+    def test_ingest_rejects_empty_body(self, client):
+        response = client.post("/api/ingest", content=b"", headers={"Content-Type": "text/plain"})
+        assert response.status_code == 400
+
+    def test_ingest_rejects_oversized_batch(self, client, monkeypatch):
+        monkeypatch.setattr(router_module, "INGEST_MAX_BATCH", 2)
+        response = client.post("/api/ingest", json=["a", "b", "c"])
+        assert response.status_code == 413
+
+    def test_ingest_rejects_oversized_body(self, client, monkeypatch):
+        monkeypatch.setattr(router_module, "INGEST_MAX_BODY_BYTES", 8)
+        assert client.post("/api/ingest", content=b"x" * 9).status_code == 413
+        # a body sent without a length is cut off while it is read
+        assert client.post("/api/ingest", content=iter([b"x" * 5, b"x" * 5])).status_code == 413
+
+    def test_metrics(self, client, monkeypatch):
+        monkeypatch.setattr(router_module, "check_ingest_token", lambda token: True)
+        client.post("/api/ingest", json=["first"])
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain")
+        assert "# TYPE bitvoker_stage_duration_seconds histogram" in response.text
+        assert 'bitvoker_messages_received_total{listener="http"}' in response.text
+        assert 'bitvoker_stage_duration_seconds_count{stage="store"}' in response.text
+
+    def test_metrics_scrape_token(self, client, monkeypatch):
+        monkeypatch.setenv("BITVOKER_USERNAME", "admin")
+        monkeypatch.setenv("BITVOKER_PASSWORD", "pass")
+        config = ConfigSnapshot({"metrics": {"scrape_token": "scrape-secret"}})
+        monkeypatch.setattr(router_module, "get_config_snapshot", lambda: config)
+        assert client.get("/metrics").status_code == 401
+        assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+        assert client.get("/metrics", headers={"Authorization": "Bearer scrape-secret"}).status_code == 200
+        # the scrape token is only good for the metrics
+        assert client.get("/api/config", headers={"Authorization": "Bearer scrape-secret"}).status_code == 401
+
+    def test_traces(self, client, monkeypatch):
+        trace = Trace("10.0.0.1")
+        trace.add_span("ai", trace.started, trace.started + 2)
+        slow_traces.record(trace.finish(rule="errors", status="sent"))
+        response = client.get("/api/traces")
+        assert response.status_code == 200
+        assert trace.trace_id in [t["trace_id"] for t in response.json()["traces"]]
+        assert client.get(f"/api/traces/{trace.trace_id}").json()["spans"][0]["name"] == "ai"
+        assert client.get("/api/traces/missing").status_code == 404
+
+    def test_rule_stats(self, client, monkeypatch):
+        context = MagicMock()
+        context.match.rule_stats.return_value = [
+            {"name": "cheap", "evaluations": 5, "matches": 5, "regex_ms_total": 0.1},
+            {"name": "costly", "evaluations": 5, "matches": 0, "regex_ms_total": 9.0},
+        ]
+        monkeypatch.setattr(router_module.pipeline, "current", lambda: context)
+        response = client.get("/api/rules/stats")
+        assert response.status_code == 200
+        assert [r["name"] for r in response.json()["rules"]] == ["costly", "cheap"]
+        assert client.post("/api/rules/stats/reset").json() == {"status": "reset"}
+        context.match.reset_rule_stats.assert_called_once()
+
+    def test_enable_rule(self, client, monkeypatch):
+        context = MagicMock()
+        context.match.enable_rule.side_effect = lambda name: name == "slow"
+        monkeypatch.setattr(router_module.pipeline, "current", lambda: context)
+        assert client.post("/api/rules/slow/enable").json() == {"status": "enabled"}
+        assert client.post("/api/rules/other/enable").status_code == 404
+
+    def test_rules_backtest(self, client, monkeypatch):
+        db_module.insert_notification("2025-01-01 10:00:00", "disk error", "", "10.0.0.1")
+        config = client.get("/api/config").json()
+        config["rules"] = [
+            {
+                "name": "errors",
+                "enabled": True,
+                "preprompt": "",
+                "match": {"sources": [], "og_text_regex": "error", "ai_text_regex": None},
+                "notify": {
+                    "destinations": [],
+                    "send_og_text": {"enabled": True, "og_text_regex": None, "ai_text_regex": None},
+                    "send_ai_text": {"enabled": False, "og_text_regex": None, "ai_text_regex": None},
+                },
+            }
+        ]
+        response = client.post("/api/rules/backtest", json={"config": config})
+        assert response.status_code == 200
+        assert response.json()["rules"][0]["selected"] == 1
+        config["rules"][0]["match"]["og_text_regex"] = "(a+)+$"
+        assert client.post("/api/rules/backtest", json={"config": config}).status_code == 400
+
+    def test_ingest_stats(self, client):
+        response = client.get("/api/ingest/stats")
+        assert response.status_code == 200
+        queue = response.json()["queue"]
+        assert {"depth", "max_size", "policy", "dropped_newest", "dropped_oldest", "ai_bypassed"} <= set(queue)
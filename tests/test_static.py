@@ -0,0 +1,100 @@
+import gzip
+
+import pytest
+from fastapi.testclient import TestClient
+
+import bitvoker.router as router_module
+
+from bitvoker.api import app
+from bitvoker.static import IMMUTABLE_CACHE, REVALIDATE_CACHE, StaticIndex, _accepted_encodings
+
+SCRIPT = b"console.log('bitvoker');\n" * 200
+
+
+@pytest.fixture
+def build_dir(tmp_path):
+    (tmp_path / "static" / "js").mkdir(parents=True)
+    (tmp_path / "index.html").write_bytes(b"<html><body><div id='root'></div></body></html>")
+    (tmp_path / "static" / "js" / "main.3f2a9c1b.js").write_bytes(SCRIPT)
+    (tmp_path / "static" / "js" / "main.3f2a9c1b.js.br").write_bytes(b"prebuilt brotli")
+    (tmp_path / "favicon.ico").write_bytes(b"\x00\x01" * 10)
+    return tmp_path
+
+
+@pytest.fixture
+def index(build_dir):
+    return StaticIndex(build_dir)
+
+
+class TestStaticIndex:
+    def test_files_indexed(self, index):
+        assert sorted(index.assets) == ["favicon.ico", "index.html", "static/js/main.3f2a9c1b.js"]
+
+    def test_cache_headers(self, index):
+        assert index.get("static/js/main.3f2a9c1b.js").cache_control == IMMUTABLE_CACHE
+        assert index.get("index.html").cache_control == REVALIDATE_CACHE
+        assert index.get("favicon.ico").cache_control == REVALIDATE_CACHE
+
+    def test_variants(self, index):
+        script = index.get("static/js/main.3f2a9c1b.js")
+        assert gzip.decompress(script.variants["gzip"]) == SCRIPT
+        assert script.variants["br"] == b"prebuilt brotli"
+        # too small to be worth compressing
+        assert index.get("favicon.ico").variants == {"br": None, "gzip": None}
+
+    def test_missing_build(self, tmp_path):
+        assert StaticIndex(tmp_path / "missing").get("index.html") is None
+
+
+class TestAssetResponse:
+    def test_prefers_brotli(self, index):
+        response = index.get("static/js/main.3f2a9c1b.js").response("gzip, deflate, br")
+        assert response.headers["content-encoding"] == "br"
+        assert response.body == b"prebuilt brotli"
+
+    def test_gzip(self, index):
+        response = index.get("static/js/main.3f2a9c1b.js").response("gzip, br;q=0")
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.headers["vary"] == "Accept-Encoding"
+
+    def test_identity(self, index):
+        response = index.get("static/js/main.3f2a9c1b.js").response("")
+        assert "content-encoding" not in response.headers
+        assert response.body == SCRIPT
+
+    def test_not_modified(self, index):
+        page = index.get("index.html")
+        etag = page.response().headers["etag"]
+        response = page.response("", etag)
+        assert response.status_code == 304
+        assert response.body == b""
+        assert page.response("", '"stale"').status_code == 200
+
+
+def test_accepted_encodings():
+    assert _accepted_encodings("gzip;q=0.5, br;q=0, identity") == {"gzip", "identity"}
+
+
+class TestServeReact:
+    @pytest.fixture
+    def client(self, index, monkeypatch):
+        monkeypatch.setattr(router_module, "static_index", index)
+        return TestClient(app)
+
+    def test_index(self, client):
+        response = client.get("/")
+        assert response.status_code == 200
+        assert response.headers["cache-control"] == REVALIDATE_CACHE
+        assert client.get("/", headers={"If-None-Match": response.headers["etag"]}).status_code == 304
+
+    def test_asset(self, client):
+        response = client.get("/static/js/main.3f2a9c1b.js", headers={"Accept-Encoding": "gzip"})
+        assert response.headers["cache-control"] == IMMUTABLE_CACHE
+        assert response.headers["content-encoding"] == "gzip"
+        assert response.content == SCRIPT
+
+    def test_client_side_routes_get_index(self, client):
+        assert b"root" in client.get("/settings").content
+
+    def test_paths_outside_build_never_served(self, client):
+        assert b"root" in client.get("/../../etc/passwd").content
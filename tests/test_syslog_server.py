@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+
+from unittest.mock import MagicMock
+
+from bitvoker.syslog_server import SyslogListener, parse_syslog
+
+
+class TestParseSyslog:
+    def test_rfc5424(self):
+        fields = parse_syslog(
+            '<34>1 2003-10-11T22:14:15.003Z mymachine.example.com su - ID47 [exampleSDID@32473 iut="3"] su failed'
+        )
+        assert fields["format"] == "rfc5424"
+        assert fields["facility"] == "auth"
+        assert fields["severity"] == "critical"
+        assert fields["hostname"] == "mymachine.example.com"
+        assert fields["app_name"] == "su"
+        assert fields["procid"] == ""
+        assert fields["msgid"] == "ID47"
+        assert fields["structured_data"] == '[exampleSDID@32473 iut="3"]'
+        assert fields["message"] == "su failed"
+
+    def test_rfc5424_without_structured_data(self):
+        fields = parse_syslog("<165>1 2003-08-24T05:14:15.000003-07:00 192.0.2.1 myproc 8710 - - %% It's time")
+        assert fields["severity"] == "notice"
+        assert fields["facility"] == "local4"
+        assert fields["procid"] == "8710"
+        assert fields["message"] == "%% It's time"
+
+    def test_rfc3164(self):
+        fields = parse_syslog("<13>Oct 11 22:14:15 router sshd[1234]: Failed password for root")
+        assert fields["format"] == "rfc3164"
+        assert fields["hostname"] == "router"
+        assert fields["app_name"] == "sshd"
+        assert fields["procid"] == "1234"
+        assert fields["severity"] == "notice"
+        assert fields["message"] == "Failed password for root"
+
+    def test_pri_only(self):
+        fields = parse_syslog("<11>something broke")
+        assert fields["format"] == "pri"
+        assert fields["severity"] == "error"
+        assert fields["message"] == "something broke"
+
+    def test_not_syslog(self):
+        assert parse_syslog("plain message") is None
+        assert parse_syslog("<999>out of range") is None
+
+
+class TestSyslogListener:
+    def test_submit_before_start(self):
+        with pytest.raises(RuntimeError, match="not started"):
+            SyslogListener().submit(b"<13>early", "10.0.0.1")
+
+    def test_drops_when_queue_full(self):
+        async def scenario():
+            listener = SyslogListener(queue_size=1)
+            listener.queue = asyncio.Queue(maxsize=1)
+            listener.submit(b"<13>first", "10.0.0.1")
+            listener.submit(b"<13>second", "10.0.0.1")
+            return listener.stats()
+
+        assert asyncio.run(scenario()) == {"received": 2, "dropped": 1, "queue_depth": 1, "queue_size": 1}
+
+    def test_tcp_framing(self):
+        async def scenario():
+            listener = SyslogListener()
+            listener.queue = asyncio.Queue()
+            reader = asyncio.StreamReader()
+            reader.feed_data(b"<13>newline framed\n11 <13>counted<13>unterminated")
+            reader.feed_eof()
+            writer = MagicMock()
+            writer.get_extra_info.return_value = ("10.0.0.1", 514)
+            await listener._handle_stream(reader, writer)
+            return [listener.queue.get_nowait() for _ in range(listener.queue.qsize())]
+
+        assert asyncio.run(scenario()) == [
+            ("<13>newline framed", "10.0.0.1"),
+            ("<13>counted", "10.0.0.1"),
+            ("<13>unterminated", "10.0.0.1"),
+        ]
+
+    def test_oversized_line_dropped(self):
+        async def scenario():
+            listener = SyslogListener()
+            listener.queue = asyncio.Queue()
+            reader = asyncio.StreamReader(limit=16)
+            reader.feed_data(b"<13>" + b"x" * 64 + b"\n")
+            reader.feed_eof()
+            await listener._handle_stream(reader, MagicMock())
+            return listener.stats()
+
+        stats = asyncio.run(scenario())
+        assert stats["dropped"] == 1
+        assert stats["queue_depth"] == 0
@@ -0,0 +1,95 @@
+from unittest.mock import MagicMock
+
+from bitvoker.config import ConfigSnapshot
+from bitvoker.handler import process_message
+from bitvoker.pipeline import PipelineContext
+from bitvoker.matcher import MatchResults
+from bitvoker.tracing import SlowTraceRing, Trace, activate, current_trace, record_span, slow_traces, span
+
+
+def _context(tracing):
+    match_result = MatchResults()
+    match_result.original_text = "disk full"
+    match_result.matched_rule_name = "errors"
+    match_result.should_send_original = True
+    match = MagicMock()
+    match.process.return_value = match_result
+    notifier = MagicMock()
+    notifier.send_message.return_value = {"dest": {"success": True, "latency_ms": 1.0}}
+    return PipelineContext(ConfigSnapshot({"tracing": tracing}), notifier, match)
+
+
+class TestSpans:
+    def test_span_without_trace_is_noop(self):
+        assert current_trace() is None
+        with span("match") as attributes:
+            attributes["rule"] = "errors"
+        record_span("ai", 0.0, 1.0)
+
+    def test_spans_recorded_on_active_trace(self):
+        trace = Trace("10.0.0.1")
+        with activate(trace):
+            with span("match") as attributes:
+                attributes["rule"] = "errors"
+            record_span("destination", trace.started, trace.started + 0.25, destination="slack")
+        assert current_trace() is None
+        assert [s["name"] for s in trace.spans] == ["match", "destination"]
+        assert trace.spans[0]["rule"] == "errors"
+        assert trace.spans[1]["duration_ms"] == 250.0
+
+    def test_to_dict(self):
+        trace = Trace("10.0.0.1", trace_id="abc").finish(rule="errors", status="sent")
+        data = trace.to_dict()
+        assert data["trace_id"] == "abc"
+        assert data["rule"] == "errors"
+        assert data["duration_ms"] >= 0
+        assert data["spans"] == []
+
+
+class TestSlowTraceRing:
+    def _trace(self, duration_ms):
+        trace = Trace("10.0.0.1")
+        trace.duration_ms = duration_ms
+        return trace
+
+    def test_slowest_first_and_bounded(self):
+        ring = SlowTraceRing(size=3)
+        for duration in [10, 50, 20, 40]:
+            ring.record(self._trace(duration))
+        assert [t["duration_ms"] for t in ring.slowest()] == [50, 40, 20]
+        assert [t["duration_ms"] for t in ring.slowest(limit=1)] == [50]
+        assert [t["duration_ms"] for t in ring.slowest(min_duration_ms=30)] == [50, 40]
+
+    def test_resize_keeps_newest(self):
+        ring = SlowTraceRing(size=3)
+        traces = [self._trace(d) for d in [1, 2, 3]]
+        for trace in traces:
+            ring.record(trace)
+        ring.resize(2)
+        assert ring.get(traces[0].trace_id) is None
+        assert ring.get(traces[2].trace_id)["duration_ms"] == 3
+
+
+class TestProcessMessageTracing:
+    def setup_method(self):
+        slow_traces.clear()
+
+    def test_slow_message_recorded_and_persisted(self):
+        context = _context({"slow_threshold_ms": 0, "persist": True})
+        trace = Trace("10.0.0.1")
+        record = process_message("disk full", "10.0.0.1", context, trace=trace)
+        assert record["trace"]["trace_id"] == trace.trace_id
+        assert [s["name"] for s in record["trace"]["spans"]] == ["match", "delivery"]
+        assert slow_traces.get(trace.trace_id)["rule"] == "errors"
+
+    def test_fast_message_not_recorded(self):
+        context = _context({"slow_threshold_ms": 60000, "persist": True})
+        record = process_message("disk full", "10.0.0.1", context)
+        assert "trace" not in record
+        assert slow_traces.slowest() == []
+
+    def test_tracing_disabled(self):
+        context = _context({"enabled": False, "slow_threshold_ms": 0, "persist": True})
+        record = process_message("disk full", "10.0.0.1", context)
+        assert "trace" not in record
+        assert slow_traces.slowest() == []
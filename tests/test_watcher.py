@@ -0,0 +1,88 @@
+import time
+
+import yaml
+import pytest
+from unittest.mock import MagicMock, patch
+
+from bitvoker.config import Config, get_config_snapshot
+from bitvoker.refresher import changed_components
+from bitvoker.watcher import ConfigWatcher
+
+
+@pytest.fixture
+def config_file(tmp_path):
+    config_path = tmp_path / "config.yaml"
+    config_data = {
+        "ai": {"provider": "meta_ai"},
+        "message_token": "",
+        "rules": [],
+        "destinations": [{"name": "test-dest", "url": "json://localhost", "enabled": True}],
+    }
+    with open(config_path, "w") as f:
+        yaml.safe_dump(config_data, f)
+    Config(config_path=str(config_path))
+    return str(config_path)
+
+
+def _write(config_file, **changes):
+    with open(config_file) as f:
+        config_data = yaml.safe_load(f)
+    config_data.update(changes)
+    with open(config_file, "w") as f:
+        yaml.safe_dump(config_data, f)
+
+
+class TestChangedComponents:
+    def test_maps_sections_to_components(self):
+        assert changed_components(["destinations", "message_token", "rules"]) == ["destinations", "rules"]
+
+    def test_sections_without_components(self):
+        assert changed_components(["retention"]) == []
+
+
+class TestConfigWatcherReload:
+    @patch("bitvoker.watcher.refresh_components")
+    def test_refreshes_only_changed_components(self, mock_refresh, config_file):
+        _write(config_file, ai={"provider": "ollama", "ollama": {"url": "http://localhost:11434", "model": "m"}})
+        app = MagicMock()
+        assert ConfigWatcher(app, config_file).reload() == ["ai"]
+        mock_refresh.assert_called_once_with(app, ["ai"])
+        assert get_config_snapshot(config_file).ai_config["provider"] == "ollama"
+
+    @patch("bitvoker.watcher.refresh_components")
+    def test_unchanged_content_skips_refresh(self, mock_refresh, config_file):
+        _write(config_file)
+        assert ConfigWatcher(MagicMock(), config_file).reload() == []
+        mock_refresh.assert_not_called()
+
+    @patch("bitvoker.watcher.refresh_components")
+    def test_invalid_config_keeps_snapshot(self, mock_refresh, config_file):
+        previous = get_config_snapshot(config_file)
+        _write(config_file, rules="not a list")
+        assert ConfigWatcher(MagicMock(), config_file).reload() is None
+        assert get_config_snapshot(config_file) is previous
+        mock_refresh.assert_not_called()
+
+    @patch("bitvoker.watcher.refresh_components")
+    def test_malformed_yaml_ignored(self, mock_refresh, config_file):
+        with open(config_file, "w") as f:
+            f.write("ai: [unclosed")
+        assert ConfigWatcher(MagicMock(), config_file).reload() is None
+        mock_refresh.assert_not_called()
+
+
+class TestConfigWatcherPolling:
+    @patch("bitvoker.watcher.refresh_components")
+    def test_change_picked_up_after_debounce(self, mock_refresh, config_file):
+        watcher = ConfigWatcher(MagicMock(), config_file, poll_interval=0.02, debounce=0.05)
+        watcher.start()
+        try:
+            time.sleep(0.05)
+            _write(config_file, message_token="secret")
+            deadline = time.monotonic() + 2
+            while get_config_snapshot(config_file).message_token != "secret" and time.monotonic() < deadline:
+                time.sleep(0.02)
+        finally:
+            watcher.stop()
+        assert get_config_snapshot(config_file).message_token == "secret"
+        mock_refresh.assert_called_once_with(watcher.app, [])
@@ -8,6 +8,8 @@ import Settings from './components/Settings/Settings';
 import Logs from './components/Logs/Logs';
 import Login from './components/Login/Login';
 
+const MAX_FEED_ENTRIES = 1000;
+
 function App() {
     const [activeTab, setActiveTab] = useState(localStorage.getItem('activeTab') || 'dashboard');
     const [themeMode, setThemeMode] = useState(localStorage.getItem('theme') || 'dark');
@@ -16,6 +18,8 @@ function App() {
 
     const [notifications, setNotifications] = useState([]);
     const [logs, setLogs] = useState([]);
+    // the newest id / seq each snapshot covered, the live feed resumes right after it
+    const [feedCursors, setFeedCursors] = useState({ notifications: null, logs: null });
 
     const [isLoading, setIsLoading] = useState({
         notifications: false,
@@ -49,6 +53,42 @@ function App() {
         }
     }, [activeTab, themeMode, token, authRequired]);
 
+    const liveFeed = activeTab === 'dashboard' ? 'notifications' : activeTab === 'logs' ? 'logs' : null;
+    const liveCursor = liveFeed ? feedCursors[liveFeed] : null;
+
+    useEffect(() => {
+        if (authRequired && !token) return;
+        // waits for the snapshot, then picks up from its newest entry so nothing arriving in between is missed
+        if (liveFeed === null || liveCursor === null) return;
+
+        const path = `${liveFeed}/stream`;
+        const params = new URLSearchParams({ since: liveCursor });
+        if (token) params.set('token', token);
+        const source = new EventSource(`${API_BASE}/${path}?${params}`);
+
+        source.addEventListener('notification', (event) => {
+            const notif = JSON.parse(event.data);
+            setNotifications(prev => {
+                if (prev.some(n => n.id === notif.id)) return prev;
+                return [notif, ...prev].slice(0, MAX_FEED_ENTRIES);
+            });
+        });
+        source.addEventListener('log', (event) => {
+            const entry = JSON.parse(event.data);
+            setLogs(prev => {
+                if (prev.some(l => l.seq === entry.seq)) return prev;
+                return [...prev, entry].slice(-MAX_FEED_ENTRIES);
+            });
+        });
+        source.onerror = () => {
+            if (source.readyState === EventSource.CLOSED) {
+                console.error(`live feed ${path} closed`);
+            }
+        };
+
+        return () => source.close();
+    }, [liveFeed, liveCursor, token, authRequired]);
+
     const handleAuthError = (res) => {
         if (res.status === 401) {
             setToken('');
@@ -65,6 +105,8 @@ function App() {
             .then(data => {
                 if (data && data.notifications) {
                     setNotifications(data.notifications);
+                    const newest = data.notifications.reduce((max, n) => Math.max(max, n.id), 0);
+                    setFeedCursors(prev => ({ ...prev, notifications: newest }));
                 }
             })
             .catch(err => {
@@ -83,6 +125,7 @@ function App() {
             .then(data => {
                 if (data && data.logs) {
                     setLogs(data.logs);
+                    setFeedCursors(prev => ({ ...prev, logs: data.last_seq || 0 }));
                 }
             })
             .catch(err => {
@@ -112,12 +155,6 @@ function App() {
     const handleTabChange = (event, newValue) => {
         setActiveTab(newValue);
         localStorage.setItem('activeTab', newValue);
-
-        if (newValue === 'dashboard') {
-            fetchNotifications();
-        } else if (newValue === 'logs') {
-            fetchLogs();
-        }
     };
 
     if (authRequired === null) return null;
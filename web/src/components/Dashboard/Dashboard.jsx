@@ -1,4 +1,4 @@
-import React, {useEffect} from 'react';
+import React from 'react';
 import {
     Box,
     Paper,
@@ -18,13 +18,6 @@ const WrappedCell = styled('div')({
 
 function Dashboard({notifications = [], config = {}, onRefresh}) {
 
-    useEffect(() => {
-        const intervalId = setInterval(() => {
-            if (onRefresh) onRefresh();
-        }, 20000);
-        return () => clearInterval(intervalId);
-    }, [onRefresh]);
-
     const columns = [
         {
             field: 'timestamp',
@@ -44,6 +37,16 @@ function Dashboard({notifications = [], config = {}, onRefresh}) {
             headerName: 'Client IP',
             width: 120,
         },
+        {
+            field: 'rule',
+            headerName: 'Rule',
+            width: 140,
+        },
+        {
+            field: 'status',
+            headerName: 'Status',
+            width: 110,
+        },
         {
             field: 'original',
             headerName: 'Original Message',
@@ -63,9 +66,11 @@ function Dashboard({notifications = [], config = {}, onRefresh}) {
     ];
 
     const rows = notifications.map((notif, index) => ({
-        id: index,
+        id: notif.id ?? index,
         timestamp: notif.timestamp,
         client: notif.client || 'N/A',
+        rule: notif.matched_rule_name || '',
+        status: notif.status || '',
         original: notif.original || notif.message || '',
         ai: notif.ai || '',
     }));
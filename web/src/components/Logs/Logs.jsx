@@ -1,4 +1,4 @@
-import React, {useEffect} from 'react';
+import React from 'react';
 import {
     Box,
     Paper,
@@ -16,13 +16,6 @@ const WrappedCell = styled('div')({
 
 function Logs({logs = [], onRefresh}) {
 
-    useEffect(() => {
-        const intervalId = setInterval(() => {
-            if (onRefresh) onRefresh();
-        }, 20000);
-        return () => clearInterval(intervalId);
-    }, [onRefresh]);
-
     const getLogLevelStyle = (level, theme) => {
         switch (level) {
             case 'DEBUG':
@@ -75,8 +68,8 @@ function Logs({logs = [], onRefresh}) {
     ];
 
     const rows = logs.map((log, index) => ({
-        id: index,
-        ...log
+        ...log,
+        id: log.seq ?? index,
     }));
 
     return (
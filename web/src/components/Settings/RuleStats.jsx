@@ -0,0 +1,135 @@
+import React, {useState, useEffect, useCallback} from 'react';
+import {Box, Button, Typography} from '@mui/material';
+import {DataGrid} from '@mui/x-data-grid';
+import RefreshIcon from '@mui/icons-material/Refresh';
+import RestartAltIcon from '@mui/icons-material/RestartAlt';
+
+const statColumns = [
+    {field: 'name', headerName: 'Rule', flex: 1, minWidth: 160},
+    {field: 'evaluations', headerName: 'Evaluated', type: 'number', width: 110},
+    {field: 'matches', headerName: 'Matched', type: 'number', width: 100},
+    {field: 'selected', headerName: 'Selected', type: 'number', width: 100},
+    {field: 'source_rejects', headerName: 'Source Rejects', type: 'number', width: 130},
+    {field: 'regex_rejects', headerName: 'Regex Rejects', type: 'number', width: 125},
+    {field: 'regex_ms_total', headerName: 'Regex Total (ms)', type: 'number', width: 145},
+    {field: 'regex_ms_mean', headerName: 'Regex Mean (ms)', type: 'number', width: 145},
+    {field: 'regex_ms_max', headerName: 'Regex Max (ms)', type: 'number', width: 135},
+    {field: 'timeouts', headerName: 'Timeouts', type: 'number', width: 100},
+    {field: 'error', headerName: 'Disabled Because', flex: 1, minWidth: 200},
+];
+
+function RuleStats({token}) {
+    const [rules, setRules] = useState([]);
+    const [loading, setLoading] = useState(false);
+    const [error, setError] = useState('');
+
+    const authHeaders = useCallback(() => {
+        const headers = {'Content-Type': 'application/json'};
+        if (token) headers['Authorization'] = `Bearer ${token}`;
+        return headers;
+    }, [token]);
+
+    const fetchStats = useCallback(async () => {
+        try {
+            setLoading(true);
+            const response = await fetch('/api/rules/stats', {headers: authHeaders()});
+            if (!response.ok) {
+                throw new Error(`Server responded with ${response.status}`);
+            }
+            const data = await response.json();
+            setRules(data.rules || []);
+            setError('');
+        } catch (err) {
+            console.error('Error loading rule statistics:', err);
+            setError(`Failed to load rule statistics: ${err.message}`);
+        } finally {
+            setLoading(false);
+        }
+    }, [authHeaders]);
+
+    const resetStats = async () => {
+        try {
+            const response = await fetch('/api/rules/stats/reset', {method: 'POST', headers: authHeaders()});
+            if (!response.ok) {
+                throw new Error(`Server responded with ${response.status}`);
+            }
+            await fetchStats();
+        } catch (err) {
+            console.error('Error resetting rule statistics:', err);
+            setError(`Failed to reset rule statistics: ${err.message}`);
+        }
+    };
+
+    const enableRule = async (name) => {
+        try {
+            const response = await fetch(`/api/rules/${encodeURIComponent(name)}/enable`, {
+                method: 'POST',
+                headers: authHeaders(),
+            });
+            if (!response.ok) {
+                throw new Error(`Server responded with ${response.status}`);
+            }
+            await fetchStats();
+        } catch (err) {
+            console.error('Error enabling rule:', err);
+            setError(`Failed to enable rule: ${err.message}`);
+        }
+    };
+
+    const columns = [
+        ...statColumns,
+        {
+            field: 'actions',
+            headerName: '',
+            width: 100,
+            sortable: false,
+            renderCell: (params) =>
+                params.row.disabled ? (
+                    <Button size="small" onClick={() => enableRule(params.row.name)}>
+                        Enable
+                    </Button>
+                ) : null,
+        },
+    ];
+
+    useEffect(() => {
+        fetchStats();
+    }, [fetchStats]);
+
+    return (
+        <Box>
+            <Box sx={{display: 'flex', alignItems: 'center', gap: 1, mb: 1}}>
+                <Typography variant="body2" color="text.secondary" sx={{flexGrow: 1}}>
+                    {error || 'rules costing the most regex time come first, rules that never match are dimmed'}
+                </Typography>
+                <Button size="small" startIcon={<RefreshIcon/>} onClick={fetchStats}>
+                    Refresh
+                </Button>
+                <Button size="small" startIcon={<RestartAltIcon/>} onClick={resetStats}>
+                    Reset
+                </Button>
+            </Box>
+            <DataGrid
+                rows={rules}
+                columns={columns}
+                getRowId={(row) => row.name}
+                getRowClassName={(params) =>
+                    params.row.error || (params.row.evaluations > 0 && params.row.matches === 0) ? 'rule-idle' : ''
+                }
+                loading={loading}
+                autoHeight
+                density="compact"
+                disableRowSelectionOnClick
+                initialState={{pagination: {paginationModel: {pageSize: 10}}}}
+                pageSizeOptions={[10, 25, 100]}
+                sx={{
+                    '& .rule-idle': {
+                        opacity: 0.6,
+                    },
+                }}
+            />
+        </Box>
+    );
+}
+
+export default RuleStats;
@@ -9,6 +9,7 @@ import AIProvider from './AIProvider';
 import RuleEditor from './RuleEditor';
 import DestinationEditor from './DestinationEditor';
 import DownloadConfig from './DownloadConfig';
+import RuleStats from './RuleStats';
 
 const StyledPaper = styled(Paper)(({ theme }) => ({
     padding: '20px',
@@ -178,6 +179,13 @@ function Settings({ token }) {
                 />
             </StyledPaper>
 
+            <StyledPaper>
+                <Typography variant="h6" component="h2" sx={{mb: 2}}>
+                    Rule Statistics
+                </Typography>
+                <RuleStats token={token}/>
+            </StyledPaper>
+
             <Box sx={{display: 'flex', gap: 2, mt: 3}}>
                 <Button
                     variant="contained"